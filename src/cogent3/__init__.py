@@ -15,8 +15,11 @@ from cogent3.app import available_apps
 from cogent3.core.alignment import (
     Alignment,
     ArrayAlignment,
+    IndexedSequenceCollection,
     SequenceCollection,
+    aln_from_index_arrays,
 )
+from cogent3.core.binary_alignment import BINARY_SUFFIX, load_binary_alignment
 from cogent3.core.genetic_code import available_codes, get_code
 # note that moltype has to be imported last, because it sets the moltype in
 # the objects created by the other modules.
@@ -36,8 +39,10 @@ from cogent3.evolve.fast_distance import (
     get_distance_calculator,
 )
 from cogent3.evolve.models import available_models, get_model
+from cogent3.parse.fasta import iter_fasta_indices
+from cogent3.parse.fasta_index import IndexedFasta
 from cogent3.parse.newick import parse_string as newick_parse_string
-from cogent3.parse.sequence import FromFilenameParser
+from cogent3.parse.sequence import FromFilenameParser, format_from_filename
 from cogent3.parse.table import autogen_reader, load_delimited
 from cogent3.parse.tree_xml import parse_string as tree_xml_parse_string
 from cogent3.util.misc import get_format_suffixes, open_
@@ -90,6 +95,9 @@ version = __version__
 version_info = tuple([int(v) for v in version.split(".") if v.isdigit()])
 
 
+# format suffixes parsed by iter_fasta_indices when loading an ArrayAlignment
+_FASTA = {"fasta", "fa", "faa", "fna", "mfa"}
+
 warn_env = "COGENT3_WARNINGS"
 
 if warn_env in os.environ:
@@ -205,6 +213,7 @@ def load_unaligned_seqs(
     label_to_name=None,
     parser_kw=None,
     info=None,
+    lazy=False,
     **kw,
 ):
     """
@@ -222,6 +231,12 @@ def load_unaligned_seqs(
         function for converting original name into another name.
     parser_kw : dict
         optional arguments for the parser
+    lazy : bool
+        if True, returns an IndexedSequenceCollection whose sequences are
+        read from file only when accessed. Requires an uncompressed FASTA
+        file, which is indexed in memory (see
+        cogent3.parse.fasta_index.IndexedFasta). Sequence names are the same
+        as for eager loading.
 
     Returns
     -------
@@ -231,6 +246,18 @@ def load_unaligned_seqs(
     for other_kw in ("constructor_kw", "kw"):
         other_kw = kw.pop(other_kw, None) or {}
         kw.update(other_kw)
+
+    if lazy:
+        if format_from_filename(filename, format) not in _FASTA or parser_kw:
+            raise ValueError("lazy loading only supported for FASTA files")
+        return IndexedSequenceCollection(
+            IndexedFasta(filename),
+            moltype=moltype,
+            label_to_name=label_to_name,
+            info=info,
+            **kw,
+        )
+
     data = list(FromFilenameParser(filename, format, **parser_kw))
     return make_unaligned_seqs(
         data,
@@ -250,6 +277,7 @@ def load_aligned_seqs(
     label_to_name=None,
     parser_kw=None,
     info=None,
+    mmap=False,
     **kw,
 ):
     """
@@ -269,6 +297,10 @@ def load_aligned_seqs(
         function for converting original name into another name.
     parser_kw : dict
         optional arguments for the parser
+    mmap : bool
+        applies to the binary alignment format (suffix 'c3aln', see
+        cogent3.core.binary_alignment). If True, the returned ArrayAlignment
+        is backed by a numpy.memmap of the file.
 
     Returns
     -------
@@ -278,7 +310,37 @@ def load_aligned_seqs(
     for other_kw in ("constructor_kw", "kw"):
         other_kw = kw.pop(other_kw, None) or {}
         kw.update(other_kw)
-    data = list(FromFilenameParser(filename, format, **parser_kw))
+    if format_from_filename(filename, format) == BINARY_SUFFIX:
+        if parser_kw or kw:
+            unused = ", ".join(sorted(parser_kw) + sorted(kw))
+            raise ValueError(f"{unused} not supported by the {BINARY_SUFFIX} format")
+        aln = load_binary_alignment(
+            filename,
+            mmap=mmap,
+            moltype=moltype,
+            info=info,
+            label_to_name=label_to_name,
+        )
+        return aln if array_align else aln.to_type(array_align=False)
+    elif mmap:
+        raise ValueError(
+            f"mmap requires the '{BINARY_SUFFIX}' format, see "
+            "cogent3.core.binary_alignment.write_binary_alignment"
+        )
+
+    format = format_from_filename(filename, format)
+    if array_align and moltype is not None and not parser_kw and format in _FASTA:
+        # sequences are converted directly into alphabet index arrays
+        moltype = get_moltype(moltype)
+        try:
+            alphabet = moltype.alphabets.degen_gapped
+        except AttributeError:
+            alphabet = moltype.alphabet
+        data = iter_fasta_indices(filename, alphabet)
+        kw["conversion_f"] = aln_from_index_arrays
+    else:
+        data = list(FromFilenameParser(filename, format, **parser_kw))
+
     return make_aligned_seqs(
         data,
         array_align=array_align,
@@ -11,7 +11,7 @@ cdef extern from "Python.h":
 cdef extern from "math.h":
     double log (double x)
 
-version_info = (3, 2)
+version_info = (3, 3)
 __version__ = "('2019', '12', '6a')"
 
 cdef double SCALE_STEP, MIN_FLOAT_VALUE
@@ -35,7 +35,7 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
         Long2D state_directions, Double2D T, 
         Double2D xgap_scores, Double2D ygap_scores, Double3D match_scores, 
         rows, UChar3D track, track_enc, int viterbi, int use_logs=0, int local=False, 
-        int use_scaling=True):
+        int use_scaling=True, Long1D band_low=None, Long1D band_high=None):
     
     """The ultimate in 2D Pyrex dynamic programming - Forward or Viterbi 
     algorithm, with doubles or with slower but practically unoverflowable 
@@ -47,6 +47,10 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     rather than alignments.  This code expects alignments (which can be single
     sequences) represented as POGs (ie: DAGs).
     
+    If band_low and band_high are provided only cells band_low[i] <= j <
+    band_high[i] of each row are calculated, cells outside that band are
+    treated as impossible, and track is indexed by j - band_low[i].
+    
     Limitations
        - HMM states must be in a sensible order: M and X, then Y, then END.
     """
@@ -60,6 +64,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     cdef int bin, x, y, bin_count, max_x, max_y
     cdef int current_row_index, source_row_index
     cdef int source_row_index_cache[256] # MAX_XCOUNT
+    cdef long source_low_cache[256]
+    cdef long source_high_cache[256]
+    cdef int banded, j_start, j_end, track_offset, track_width
     cdef int i_link_count, j_link_count
 
     cdef int dx, dy
@@ -104,6 +111,11 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     
     assert j_low >= 0 and j_high > j_low and j_high <= row_length
     
+    banded = band_low is not None
+    if banded:
+        checkArray1D(band_low, &row_count)
+        checkArray1D(band_high, &row_count)
+    
     (pog1, pog2) = preds
     (j_sources, j_sources_offsets) = pog2.as_combined_array()
     j_link_count = 0
@@ -129,8 +141,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     else:
         impossible = 0.0
 
+    track_width = 0 if banded else row_length
     if viterbi and track is not None and track_enc is not None:
-        checkArray3D(track, &row_count, &row_length, &N)
+        checkArray3D(track, &row_count, &track_width, &N)
         (tcode_x, tcode_y, tcode_s) = track_enc
     else:
         track = None
@@ -158,6 +171,22 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
             prev_i = i_sources[a+i_sources_start]
             source_row_index_cache[a+1] = plan[prev_i]
         
+        j_start = j_low
+        j_end = j_high
+        track_offset = 0
+        if banded:
+            source_low_cache[0] = band_low[i]
+            source_high_cache[0] = band_high[i]
+            for a from 0 <= a < a_count:
+                prev_i = i_sources[a+i_sources_start]
+                source_low_cache[a+1] = band_low[prev_i]
+                source_high_cache[a+1] = band_high[prev_i]
+            track_offset = band_low[i]
+            j_start = max(j_low, band_low[i])
+            j_end = min(j_high, band_high[i])
+            if track is not None and band_high[i] - track_offset > track_width:
+                raise ValueError("band is wider than track")
+        
         if i == 0:
             mantissas[current_row_index, 0, 0] = (0.0 if use_logs else 1.0)       
             if use_scaling:
@@ -167,8 +196,8 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
             if use_scaling:
                 exponents[current_row_index, 0, 0] = MIN_SCALE             
         
-        j_sources_end = j_sources_offsets[j_low]
-        for j from j_low <= j < j_high:              
+        j_sources_end = j_sources_offsets[j_start]
+        for j from j_start <= j < j_end:              
             j_sources_start = j_sources_end
             j_sources_end = j_sources_offsets[j+1]
             
@@ -207,6 +236,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                                 prev_j = j_sources[b-1+j_sources_start]
                             else:
                                 prev_j = j
+                            if banded and not (source_low_cache[a] <= prev_j
+                                    < source_high_cache[a]):
+                                continue
                             min_prev_state = (prev_j > 0)
                             for prev_state from min_prev_state <= prev_state < N:
                                 exponent = exponents[source_row_index, prev_j, prev_state]
@@ -269,6 +301,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                                 prev_j = j_sources[b-1+j_sources_start]
                             else:
                                 prev_j = j
+                            if banded and not (source_low_cache[a] <= prev_j
+                                    < source_high_cache[a]):
+                                continue
                             min_prev_state = (prev_j > 0)
                             for prev_state from min_prev_state <= prev_state < N:
                                 mantissa = mantissas[source_row_index, prev_j, prev_state]
@@ -286,7 +321,7 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                 if viterbi:
                     mantissa = max_mantissa
                     if track is not None:
-                        track[i, j, state] = (        
+                        track[i, j - track_offset, state] = (        
                             (pointer_a << tcode_x) |  
                             (pointer_b << tcode_y) |
                             (pointer_state << tcode_s))
@@ -13,7 +13,7 @@ cdef extern from "Python.h":
 cdef extern from "math.h":
     double log (double x)
 
-version_info = (3, 2)
+version_info = (3, 3)
 __version__ = "('2019', '12', '6a')"
 
 cdef double SCALE_STEP, MIN_FLOAT_VALUE
@@ -37,7 +37,7 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
         Long2D state_directions, Double2D T, 
         Double2D xgap_scores, Double2D ygap_scores, Double3D match_scores, 
         rows, UChar3D track, track_enc, int viterbi, int use_logs=0, int local=False, 
-        int use_scaling=True):
+        int use_scaling=True, Long1D band_low=None, Long1D band_high=None):
     
     """The faster, sequence only (no POG) version.  Forward or Viterbi 
     algorithm, with doubles or with slower but practically unoverflowable 
@@ -45,6 +45,10 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     popular addition-of-logs version.  All this with any possible pair HMM 
     transition matrix.
         
+    If band_low and band_high are provided only cells band_low[i] <= j <
+    band_high[i] of each row are calculated, cells outside that band are
+    treated as impossible, and track is indexed by j - band_low[i].
+        
     Limitations
        - HMM states must be in a sensible order: M and X, then Y, then END.
     """
@@ -58,6 +62,7 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     cdef int bin, x, y, bin_count, max_x, max_y
     cdef int current_row_index, source_row_index
     cdef int source_i
+    cdef int banded, in_band, j_start, j_end, track_offset, track_width
 
     cdef int dx, dy
     cdef int tcode_x, tcode_y, tcode_s
@@ -97,6 +102,11 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     
     assert j_low >= 0 and j_high > j_low and j_high <= row_length
     
+    banded = band_low is not None
+    if banded:
+        checkArray1D(band_low, &row_count)
+        checkArray1D(band_high, &row_count)
+    
     (mantissas, exponents) = rows
     tmp_rows = 0
     checkArray3D(mantissas, &tmp_rows, &row_length, &N)
@@ -109,8 +119,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
     else:
         impossible = 0.0
 
+    track_width = 0 if banded else row_length
     if viterbi and track is not None and track_enc is not None:
-        checkArray3D(track, &row_count, &row_length, &N)
+        checkArray3D(track, &row_count, &track_width, &N)
         (tcode_x, tcode_y, tcode_s) = track_enc
     else:
         track = None
@@ -132,7 +143,17 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
         #for prev_state from 1 <= prev_state < N:
         #    current_row_data[0, prev_state] = impossible
         
-        for j from j_low <= j < j_high:
+        j_start = j_low
+        j_end = j_high
+        track_offset = 0
+        if banded:
+            track_offset = band_low[i]
+            j_start = max(j_low, band_low[i])
+            j_end = min(j_high, band_high[i])
+            if track is not None and band_high[i] - track_offset > track_width:
+                raise ValueError("band is wider than track")
+        
+        for j from j_start <= j < j_end:
             
             for dest_state from 0 <= dest_state < dest_states:
                 state = state_directions[dest_state, 0]
@@ -154,6 +175,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                 if prev_j < 0:
                     continue
                 
+                in_band = not banded or (
+                    band_low[source_i] <= prev_j < band_high[source_i])
+                
                 min_prev_state = 1
                 a = dx
                 b = dy
@@ -165,7 +189,9 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                     pointer_a = a
                     pointer_b = b
                     
-                if use_scaling:
+                if not in_band:
+                    pass
+                elif use_scaling:
                             sub_partial_sum = 0.0
                             for prev_state from min_prev_state <= prev_state < N:
                                 exponent = exponents[source_row_index, prev_j, prev_state]
@@ -236,7 +262,7 @@ def calc_rows(Long1D plan, Long1D seq1_index, Long1D seq2_index,
                 if viterbi:
                     mantissa = max_mantissa
                     if track is not None:
-                        track[i, j, state] = (        
+                        track[i, j - track_offset, state] = (        
                             (pointer_a << tcode_x) |  
                             (pointer_b << tcode_y) |
                             (pointer_state << tcode_s))
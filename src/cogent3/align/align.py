@@ -110,5 +110,9 @@ def local_pairwise(s1, s2, S, d, e, return_score=False):
     return classic_align_pairwise(s1, s2, S, d, e, True, return_score=return_score)
 
 
-def global_pairwise(s1, s2, S, d, e, return_score=False):
-    return classic_align_pairwise(s1, s2, S, d, e, False, return_score=return_score)
+def global_pairwise(s1, s2, S, d, e, return_score=False, band=None):
+    """band, if provided, is the width (an int) or a pairwise.DPBand that
+    limits the alignment to a band of the dynamic programming grid"""
+    return classic_align_pairwise(
+        s1, s2, S, d, e, False, return_score=return_score, band=band
+    )
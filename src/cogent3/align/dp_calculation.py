@@ -57,7 +57,7 @@ class FloatWithAttrs(float):
             setattr(self, n, v)
 
 
-def Edge(seq1, seq2, length, bin_data, switch=1.0, bprobs=None):
+def Edge(seq1, seq2, length, bin_data, switch=1.0, bprobs=None, band=None):
     # one sequence pair in, potentialy, a tree
     bins = len(bin_data)
     pair = pairwise.Pair(seq1, seq2)
@@ -72,7 +72,7 @@ def Edge(seq1, seq2, length, bin_data, switch=1.0, bprobs=None):
         R = SiteClassTransitionMatrix(switch, bprobs)
         TM = R.nestTransitionMatricies(tms)
     assert min(TM.Matrix.flat) >= 0, bin_data
-    return EP.make_pair_HMM(TM)
+    return EP.make_pair_HMM(TM, band=band)
 
 
 class BinData(object):
@@ -123,8 +123,8 @@ class _GetAlign:
 class EdgeSumAndAlignDefn(CalculationDefn):
     name = "pair"
 
-    def calc(self, pog1, pog2, length1, length2, bin):
-        edge = Edge(pog1, pog2, length1 + length2, [bin])
+    def calc(self, pog1, pog2, length1, length2, band, bin):
+        edge = Edge(pog1, pog2, length1 + length2, [bin], band=band or None)
         edge.getaln = _GetAlign(edge, length1, length2)
         return edge
 
@@ -132,8 +132,10 @@ class EdgeSumAndAlignDefn(CalculationDefn):
 class EdgeSumAndAlignDefnWithBins(CalculationDefn):
     name = "pair"
 
-    def calc(self, pog1, pog2, length1, length2, switch, bprobs, *bin_data):
-        edge = Edge(pog1, pog2, length1 + length2, bin_data, switch, bprobs)
+    def calc(self, pog1, pog2, length1, length2, band, switch, bprobs, *bin_data):
+        edge = Edge(
+            pog1, pog2, length1 + length2, bin_data, switch, bprobs, band or None
+        )
 
         def _getaln():
             ratio = length1 / (length1 + length2)
@@ -144,7 +146,7 @@ class EdgeSumAndAlignDefnWithBins(CalculationDefn):
         return edge
 
 
-def _recursive_defns(edge, subst, leaf, edge_defn_constructor, bin_args):
+def _recursive_defns(edge, subst, leaf, band, edge_defn_constructor, bin_args):
     """A defn which calculates a fwd score with an .edge
     attribute which can provide a viterbi alignment which can be
     provided to a similar defn"""
@@ -155,7 +157,7 @@ def _recursive_defns(edge, subst, leaf, edge_defn_constructor, bin_args):
             args.append(leaf.select_from_dimension("edge", child.name))
         else:
             (child_defn, scores2) = _recursive_defns(
-                child, subst, leaf, edge_defn_constructor, bin_args
+                child, subst, leaf, band, edge_defn_constructor, bin_args
             )
             child_defn = ViterbiPogDefn(child_defn)
             scores.extend(scores2)
@@ -164,6 +166,7 @@ def _recursive_defns(edge, subst, leaf, edge_defn_constructor, bin_args):
     assert len(child_names) == 2, child_names
     child_lengths = subst["length"].across_dimension("edge", child_names)
     args.extend(child_lengths)
+    args.append(band)
     args.extend(bin_args)
     edge_defn = edge_defn_constructor(*args)
     # fwd = FwdDefn(edge_defn)
@@ -178,6 +181,8 @@ def make_forward_tree_defn(
     indel = make_indel_model_defn(with_indel_params, kn)
     subst = subst_model.make_fundamental_param_controller_defns(bin_names)
     leaf = NonParamDefn("leaf", dimensions=("edge",))
+    # False for the full DP grid, else a width or pairwise.DPBand
+    band = NonParamDefn("dp_band", default=False)
 
     if len(bin_names) > 1:
         switch = ProbabilityParamDefn("bin_switch", dimensions=["locus"])
@@ -199,7 +204,7 @@ def make_forward_tree_defn(
     edge_args.extend(bin_data)
 
     (top, scores) = _recursive_defns(
-        tree, subst, leaf, edge_defn_constructor, edge_args
+        tree, subst, leaf, band, edge_defn_constructor, edge_args
     )
     defn = FwdDefn(top)
     # defn = SumDefn(*scores)
@@ -18,6 +18,7 @@ from cogent3.util.modules import ExpectedImportError, importVersionedModule
 from cogent3.util.warning import deprecated, discontinued
 
 from .indel_positions import leaf2pog
+from .pycompare import dotplot
 
 
 def _importedPyrexAligningModule(name):
@@ -123,6 +124,8 @@ def py_calc_rows(
     local=False,
     use_scaling=False,
     use_logs=False,
+    band_low=None,
+    band_high=None,
 ):
     """Pure python version of the dynamic programming algorithms
     Forward and Viterbi.  Works on sequences and POGs.  Unli"""
@@ -140,6 +143,7 @@ def py_calc_rows(
         neutral_score = 1.0
         impossible = 0.0
     best_score = impossible
+    banded = band_low is not None
     for i in range(i_low, i_high):
         x = x_index[i]
         i_sources = preds[0][i]
@@ -147,7 +151,12 @@ def py_calc_rows(
         current_row[:, 0] = impossible
         if i == 0 and not local:
             current_row[0, 0] = neutral_score
-        for j in range(j_low, j_high):
+        (j_start, j_end, track_offset) = (j_low, j_high, 0)
+        if banded:
+            track_offset = band_low[i]
+            j_start = max(j_low, band_low[i])
+            j_end = min(j_high, band_high[i])
+        for j in range(j_start, j_end):
             y = y_index[j]
             j_sources = preds[1][j]
             for (state, bin, dx, dy) in state_directions:
@@ -160,6 +169,10 @@ def py_calc_rows(
                 for (a, prev_i) in enumerate([[i], i_sources][dx]):
                     source_row = rows[plan[prev_i]]
                     for (b, prev_j) in enumerate([[j], j_sources][dy]):
+                        if banded and not (
+                            band_low[prev_i] <= prev_j < band_high[prev_i]
+                        ):
+                            continue
                         source_posn = source_row[prev_j]
                         for prev_state in source_states:
                             prev_value = source_posn[prev_state]
@@ -191,7 +204,9 @@ def py_calc_rows(
                 else:
                     current_row[j, state] = cumulative_score * d_score
                 if track is not None:
-                    track[i, j, state] = (numpy.array(pointer) << track_enc).sum()
+                    track[i, j - track_offset, state] = (
+                        numpy.array(pointer) << track_enc
+                    ).sum()
                 if (i == i_high - 1 and j == j_high - 1 and not local) or (
                     local and dx and dy and current_row[j, state] > best_score
                 ):
@@ -296,8 +311,9 @@ class Pair(object):
         ]
         return Pair(*children)
 
-    def _decode_state(self, track, encoding, posn, pstate):
-        coded = int(track[posn[0], posn[1], pstate])
+    def _decode_state(self, track, encoding, posn, pstate, band_low=None):
+        offset = 0 if band_low is None else band_low[posn[0]]
+        coded = int(track[posn[0], posn[1] - offset, pstate])
         (a, b, state) = encoding.decode(coded)
         if state >= track.shape[-1]:
             raise ArithmeticError("Error state in traceback")
@@ -313,11 +329,13 @@ class Pair(object):
             next = numpy.array([x, y], int)
         return (next, (a, b), state)
 
-    def traceback(self, track, encoding, posn, state, skip_last=False):
+    def traceback(self, track, encoding, posn, state, skip_last=False, band_low=None):
         result = []
         started = False
         while 1:
-            (nposn, (a, b), nstate) = self._decode_state(track, encoding, posn, state)
+            (nposn, (a, b), nstate) = self._decode_state(
+                track, encoding, posn, state, band_low
+            )
             if state:
                 result.append((state, posn, (a > 0, b > 0)))
             if started and state == 0:
@@ -801,9 +819,19 @@ class PairEmissionProbs(object):
         backward - run algorithm in reverse order.
         """
         (state_directions, T) = TM
+        band = dp_options.band
+        if cells is not None or backward or dp_options.backward:
+            # a band only restricts forward calculations over the whole grid
+            band = None
+        if band is not None:
+            (band_low, band_high) = band.bounds(self.pair)
+            track_width = (band_high - band_low).max()
         if dp_options.viterbi and cells is None:
             encoder = self.pair.get_pointer_encoding(len(T))
-            problem_dimensions = self.pair.size + [len(T)]
+            if band is None:
+                problem_dimensions = self.pair.size + [len(T)]
+            else:
+                problem_dimensions = [self.pair.size[0], track_width, len(T)]
             problem_size = numpy.product(problem_dimensions)
             memory = problem_size * encoder.bytes / 10 ** 6
             if dp_options.local:
@@ -811,7 +839,8 @@ class PairEmissionProbs(object):
             elif cells is not None:
                 msg = "Posterior probs"
             elif (
-                self.pair.size[0] - 2 >= 3
+                band is None
+                and self.pair.size[0] - 2 >= 3
                 and not backward
                 and problem_size > HIRSCHBERG_LIMIT
             ):
@@ -830,6 +859,8 @@ class PairEmissionProbs(object):
             viterbi=dp_options.viterbi,
             local=dp_options.local,
         )
+        if band is not None:
+            kw.update(band_low=band_low, band_high=band_high)
 
         if dp_options.backward:
             backward = not backward
@@ -907,7 +938,12 @@ class PairEmissionProbs(object):
                 result = score
             else:
                 tb = self.pair.traceback(
-                    track, encoder, maxpos, state, skip_last=not dp_options.local
+                    track,
+                    encoder,
+                    maxpos,
+                    state,
+                    skip_last=not dp_options.local,
+                    band_low=kw.get("band_low"),
                 )
                 result = (score, tb)
         return result
@@ -925,9 +961,9 @@ class PairEmissionProbs(object):
         leaf = edge.as_leaf(plh[0])  # like profile
         return AlignablePOG(leaf, pog, children)
 
-    def make_pair_HMM(self, transition_matrix, finite=False):
+    def make_pair_HMM(self, transition_matrix, finite=False, band=None):
         # whether TM includes Begin and End states
-        return PairHMM(self, transition_matrix, finite=finite)
+        return PairHMM(self, transition_matrix, finite=finite, band=band)
 
 
 class BinData(object):
@@ -977,8 +1013,121 @@ class ReversiblePairEmissionProbs(object):
             ep = self._makePairEmissionProbs(ratio=ratio)
         return ep.get_alignable(a_p)
 
-    def make_pair_HMM(self, transition_matrix):
-        return PairHMM(self, transition_matrix)
+    def make_pair_HMM(self, transition_matrix, band=None):
+        return PairHMM(self, transition_matrix, band=band)
+
+
+def _chained_anchors(segments):
+    """(x, y) positions from the highest scoring series of co-linear
+    segments, each ((x1, y1), (x2, y2)) as produced by dotplot"""
+    if not segments:
+        return []
+    segments = numpy.array(sorted(segments), int)
+    (starts, ends) = (segments[:, 0], segments[:, 1])
+    scores = (ends[:, 0] - starts[:, 0]).astype(float)
+    prior = numpy.full(len(segments), -1)
+    for k in range(1, len(segments)):
+        follows = (starts[:k] < starts[k]).all(axis=1)
+        follows &= (ends[:k] < ends[k]).all(axis=1)
+        if follows.any():
+            candidates = numpy.where(follows, scores[:k], -numpy.inf)
+            prior[k] = candidates.argmax()
+            scores[k] += candidates[prior[k]]
+
+    chain = []
+    k = scores.argmax()
+    while k >= 0:
+        chain.append(k)
+        k = prior[k]
+
+    anchors = []
+    for k in reversed(chain):
+        for (x, y) in (starts[k], ends[k] - 1):
+            if anchors:
+                # move along the diagonal past any overlap with the prior
+                shift = max(anchors[-1][0] - x, anchors[-1][1] - y) + 1
+                (x, y) = (x + max(shift, 0), y + max(shift, 0))
+                if x >= ends[k][0]:
+                    continue
+            anchors.append((x, y))
+    return anchors
+
+
+class DPBand(object):
+    """Limits dynamic programming to cells within width of a path through
+    the grid, so that time and traceback memory are proportional to the
+    length of the sequences rather than the product of their lengths.
+
+    The path is the diagonal, or else passes through anchors, (x, y) pairs
+    of positions expected to be aligned. If seed_length is provided anchors
+    are instead chosen from co-linear runs of seed_length identical residues
+    between the first sequence of each alignable, as found by dotplot."""
+
+    def __init__(self, width, anchors=None, seed_length=None):
+        assert width >= 0, width
+        assert seed_length is None or 0 < seed_length < 100, seed_length
+        self.width = int(width)
+        self.anchors = tuple((int(x), int(y)) for (x, y) in anchors or ())
+        self.seed_length = seed_length
+
+    def __repr__(self):
+        return "%s(width=%s, anchors=%s, seed_length=%s)" % (
+            type(self).__name__,
+            self.width,
+            len(self.anchors),
+            self.seed_length,
+        )
+
+    def __hash__(self):
+        return hash((self.width, self.anchors, self.seed_length))
+
+    def __eq__(self, other):
+        return isinstance(other, DPBand) and hash(self) == hash(other)
+
+    def get_anchors(self, pair):
+        """(x, y) positions the band must pass through"""
+        if not self.seed_length:
+            return self.anchors
+        try:
+            seqs = [str(child.aligneds[0][1]) for child in pair.children]
+        except AttributeError:
+            return self.anchors
+
+        # gaps in one must not match gaps in the other
+        seqs[1] = seqs[1].replace("-", "#")
+        motif_len = pair.alphabet.get_motif_len()
+        # diagonals further away can only be reached through wide gaps
+        limit = abs(len(seqs[0]) - len(seqs[1])) + 10 * self.width * motif_len
+        segments = dotplot(
+            *seqs,
+            self.seed_length,
+            self.seed_length,
+            band=limit,
+            show_progress=False,
+        )
+        anchors = _chained_anchors(segments)
+        return [(x // motif_len, y // motif_len) for (x, y) in anchors]
+
+    def bounds(self, pair):
+        """arrays of the first and one past the last column of each row of
+        the DP grid for pair"""
+        (M, N) = pair.size
+        path = [(0, 0)]
+        for (x, y) in self.get_anchors(pair):
+            (x, y) = (x + 1, y + 1)  # row 0 is before the first position
+            if path[-1][0] < x < M - 2 and path[-1][1] < y < N - 2:
+                path.append((x, y))
+        path.append((M - 2, N - 2))
+        (xs, ys) = numpy.array(path).T
+        centre = numpy.interp(numpy.arange(M - 1), xs, ys)
+        low = numpy.clip(numpy.floor(centre - self.width), 0, N - 2).astype(int)
+        high = numpy.clip(numpy.ceil(centre + self.width) + 1, 1, N - 1).astype(int)
+        # each row must reach the first cell of the next
+        high[:-1] = numpy.maximum(high[:-1], low[1:] + 1)
+        # the last row only holds the END state
+        low = numpy.append(low, N - 1)
+        high = numpy.append(high, N)
+        return (low, high)
 
 
 class DPFlags(object):
@@ -990,6 +1139,7 @@ class DPFlags(object):
         use_cost_function=True,
         use_scaling=None,
         backward=False,
+        band=None,
     ):
         if use_logs is None:
             use_logs = viterbi and not use_scaling
@@ -1004,6 +1154,9 @@ class DPFlags(object):
         self.use_scaling = bool(use_scaling)
         self.viterbi = bool(viterbi)
         self.backward = bool(backward)
+        if band is not None and not isinstance(band, DPBand):
+            band = DPBand(band)
+        self.band = band
         self.as_tuple = tuple(
             n
             for n in [
@@ -1018,23 +1171,28 @@ class DPFlags(object):
         )
 
     def __repr__(self):
-        return "%s(%s)" % (type(self).__name__, ", ".join(self.as_tuple))
+        flags = list(self.as_tuple)
+        if self.band is not None:
+            flags.append(repr(self.band))
+        return "%s(%s)" % (type(self).__name__, ", ".join(flags))
 
     def __hash__(self):
-        return hash(self.as_tuple)
+        return hash((self.as_tuple, self.band))
 
     def __eq__(self, other):
-        return self.as_tuple == other.as_tuple
+        return (self.as_tuple, self.band) == (other.as_tuple, other.band)
 
 
 class PairHMM(object):
-    def __init__(self, emission_probs, transition_matrix, finite=False):
+    def __init__(self, emission_probs, transition_matrix, finite=False, band=None):
         self.emission_probs = emission_probs
         self.transition_matrix = transition_matrix
         self._transition_matrix = adapt_pair_tm(transition_matrix, finite=finite)
+        self.band = band  # the default for dynamic programming
         self.results = {}
 
     def _getDPResult(self, **kw):
+        kw["band"] = kw.get("band", self.band)
         dp_options = DPFlags(**kw)
         if dp_options not in self.results:
             self.results[dp_options] = self.emission_probs.dp(
@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 
+import multiprocessing
 
-from cogent3 import make_tree
+import numpy
+
+from cogent3 import make_tree, make_unaligned_seqs
+from cogent3.cluster.UPGMA import upgma
 from cogent3.core.info import Info
 from cogent3.evolve.distance import EstimateDistances
+from cogent3.evolve.fast_distance import get_kmer_distances
 from cogent3.phylo import nj as NJ
+from cogent3.util import parallel
 from cogent3.util import progress_display as UI
 
 
@@ -17,6 +23,91 @@ __maintainer__ = "Peter Maxwell"
 __email__ = "pm67nz@gmail.com"
 __status__ = "Production"
 
+_tree_align_state = {}
+
+
+def _init_tree_align(model, tree, seqs, constants, mprobs):
+    """stores what is shared by all subtrees for this worker process"""
+    _tree_align_state.update(
+        model=model, tree=tree, seqs=seqs, constants=constants, mprobs=mprobs
+    )
+
+
+def _tree_align_lf(model, tree, constants):
+    """returns a likelihood function for progressive alignment on tree"""
+    lf = model.make_likelihood_function(tree, aligned=False)
+    with lf.updates_postponed():
+        for param, val in constants.items():
+            lf.set_param_rule(param, value=val, is_constant=True)
+    return lf
+
+
+def _set_leaves(lf, seqs, mprobs, pogs=None):
+    """sets the tips of lf to sequences or POGs, with motif probabilities
+    from all sequences rather than from those at these tips"""
+    with lf.updates_postponed():
+        if seqs:
+            lf.set_sequences(seqs)
+        for name, pog in (pogs or {}).items():
+            lf.set_param_rule("leaf", edge=name, value=pog, is_constant=True)
+        if lf.mprobs_from_alignment:
+            lf.set_motif_probs(mprobs, is_constant=True, auto=True)
+
+
+def _align_clade(name):
+    """returns the progressive alignment, as a POG, of the named subtree"""
+    state = _tree_align_state
+    clade = state["tree"].get_node_matching_name(name).deepcopy()
+    clade.length = None  # now the root
+    lf = _tree_align_lf(state["model"], clade, state["constants"])
+    seqs = {n: state["seqs"][n] for n in clade.get_tip_names()}
+    _set_leaves(lf, seqs, state["mprobs"])
+    return lf.get_log_likelihood().edge.getaln()
+
+
+def _independent_clades(tree, num):
+    """returns names of up to num disjoint subtrees, each with at least two
+    tips, made by repeatedly splitting the one with the most tips"""
+    clades = [tree]
+    while len(clades) < num:
+        sizes = [len(clade.get_tip_names()) for clade in clades]
+        if max(sizes) <= 2:
+            break
+        largest = clades[sizes.index(max(sizes))]
+        clades.remove(largest)
+        clades.extend(largest.children)
+    return [clade.name for clade in clades if not clade.istip()]
+
+
+def _parallel_log_likelihood(model, tree, seqs, constants, par_kw):
+    """returns the log likelihood for progressive alignment on tree, with
+    independent subtrees aligned concurrently in worker processes and the
+    remaining, upper, part of the tree aligned here using their POGs"""
+    counts = [model.convert_sequence(s, n).get_motif_counts() for n, s in seqs.items()]
+    counts = numpy.sum(counts, 0)
+    mprobs = counts / (1.0 * sum(counts))
+    max_workers = par_kw.get("max_workers") or multiprocessing.cpu_count()
+    clades = _independent_clades(tree, 2 * max_workers)
+    completed = parallel.as_completed(
+        _align_clade,
+        clades,
+        initializer=_init_tree_align,
+        initargs=(model, tree, seqs, constants, mprobs),
+        **par_kw,
+    )
+    upper = tree.deepcopy()
+    pogs = {}
+    for index, pog in completed:
+        pogs[clades[index]] = pog
+        clade = upper.get_node_matching_name(clades[index])
+        while clade.children:
+            clade.pop()
+
+    lf = _tree_align_lf(model, upper, constants)
+    tips = {n: seqs[n] for n in upper.get_tip_names() if n not in pogs}
+    _set_leaves(lf, tips, mprobs, pogs=pogs)
+    return lf.get_log_likelihood()
+
 
 @UI.display_wrap
 def TreeAlign(
@@ -28,15 +119,19 @@ def TreeAlign(
     ui=None,
     ests_from_pairwise=True,
     param_vals=None,
+    band=None,
+    guide_kmers=None,
+    parallel=False,
+    par_kw=None,
 ):
     """Returns a multiple alignment and tree.
 
     Uses the provided substitution model and a tree for determining the
     progressive order. If a tree is not provided a Neighbour Joining tree is
     constructed from pairwise distances estimated from pairwise aligning the
-    sequences. If running in parallel, only the distance estimation is
-    parallelised and only the master CPU returns the alignment and tree, other
-    CPU's return None, None.
+    sequences, or with guide_kmers, a UPGMA tree from k-mer distances. If
+    running under MPI, only the distance estimation is parallelised and only
+    the master CPU returns the alignment and tree, other CPU's return None, None.
 
     Parameters
     ----------
@@ -52,6 +147,20 @@ def TreeAlign(
     param_vals
         named key, value pairs for model parameters. These
         override ests_from_pairwise.
+    band
+        width, or a pairwise.DPBand, limiting each progressive pairwise
+        alignment to a band of its dynamic programming grid
+    guide_kmers : bool or int
+        if no tree provided, the guide tree is estimated from the k-mers
+        shared between the unaligned sequences rather than from pairwise
+        alignments. An int specifies the k-mer size. The model parameters
+        are then not estimated (see get_kmer_distances).
+    parallel : bool
+        independent subtrees of the guide tree are aligned concurrently by a
+        pool of worker processes, the remainder of the tree is then aligned
+        using their results. The alignment is the same as when run serially.
+    par_kw : dict or None
+        arguments passed to parallel.as_completed, e.g. max_workers
 
     """
     _exclude_params = ["mprobs", "rate", "bin_switch"]
@@ -78,6 +187,13 @@ def TreeAlign(
     elif two_seqs:
         tree = make_tree(tip_names=seqs.names)
         ests_from_pairwise = False
+    elif guide_kmers:
+        k = None if guide_kmers is True else guide_kmers
+        if isinstance(seqs, dict):
+            seqs = make_unaligned_seqs(seqs, moltype=model.moltype)
+        dists = get_kmer_distances(seqs, k=k, moltype=model.moltype)
+        tree = upgma(dists)
+        ests_from_pairwise = False
     else:
         if ests_from_pairwise:
             est_params = [
@@ -95,9 +211,6 @@ def TreeAlign(
         dists = dcalc.get_pairwise_distances().to_dict()
         tree = NJ.nj(dists)
 
-    LF = model.make_likelihood_function(
-        tree.bifurcating(name_unnamed=True), aligned=False
-    )
     if ests_from_pairwise and not param_vals:
         # we use the median to avoid the influence of outlier pairs
         param_vals = {}
@@ -105,14 +218,21 @@ def TreeAlign(
             numbers = dcalc.get_param_values(param)
             param_vals[param] = numbers.median
 
+    constants = dict(param_vals, indel_rate=indel_rate, indel_length=indel_length)
+    if band is not None:
+        constants["dp_band"] = band
+
     ui.display("Doing %s alignment" % ["progressive", "pairwise"][two_seqs])
-    with LF.updates_postponed():
-        for param, val in list(param_vals.items()):
-            LF.set_param_rule(param, value=val, is_constant=True)
-        LF.set_param_rule("indel_rate", value=indel_rate, is_constant=True)
-        LF.set_param_rule("indel_length", value=indel_length, is_constant=True)
+    if parallel and not two_seqs:
+        if not isinstance(seqs, dict):
+            seqs = seqs.named_seqs
+        lnL = _parallel_log_likelihood(
+            model, tree.bifurcating(name_unnamed=True), seqs, constants, par_kw or {}
+        )
+    else:
+        LF = _tree_align_lf(model, tree.bifurcating(name_unnamed=True), constants)
         LF.set_sequences(seqs)
-    lnL = LF.get_log_likelihood()
+        lnL = LF.get_log_likelihood()
     edge = lnL.edge
     align = edge.get_viterbi_path().get_alignment()
     param_vals.update(
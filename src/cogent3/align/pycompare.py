@@ -2,6 +2,8 @@
 # Very slow.  See compare.pyx
 
 
+import numpy
+
 import cogent3.util.progress_display as UI
 
 from cogent3.util.modules import ExpectedImportError, importVersionedModule
@@ -84,3 +86,184 @@ def dotplot(seq1, seq2, window, threshold, min_gap_length=0, band=None, ui=None)
     for diag_segments in ui.imap(one_diagonal, diagonals, noun="offset"):
         result.extend(diag_segments)
     return result
+
+
+# by default, seeds are lengthened until their word hits number no more than
+# this, which bounds the memory and time seeded_dotplot takes
+MAX_SEED_HITS = 2 ** 20
+
+
+def _word_codes(seq, k, lookup, base):
+    """returns an integer code for the word of length k at each position"""
+    seq = lookup.take(numpy.frombuffer(seq, dtype=numpy.uint8))
+    num = len(seq) - k + 1
+    codes = numpy.zeros(max(num, 0), dtype=numpy.uint64)
+    for i in range(k if num > 0 else 0):
+        # wraps around on overflow, making this a hash
+        codes *= base
+        codes += seq[i : i + num]
+    return codes
+
+
+def _word_index(seq1, seq2, k):
+    """returns the positions of the words of seq1 in sorted order and, for
+    each word of seq2, the index of its first match in that order and the
+    number of its matches"""
+    states = numpy.unique(numpy.frombuffer(seq1 + seq2, dtype=numpy.uint8))
+    lookup = numpy.zeros(256, dtype=numpy.uint64)
+    lookup[states] = numpy.arange(len(states))
+    base = max(len(states), 2)
+    if k * numpy.log2(base) >= 64:
+        base = 1000003  # an odd multiplier mixes all states into a hash
+    codes1 = _word_codes(seq1, k, lookup, base)
+    codes2 = _word_codes(seq2, k, lookup, base)
+
+    order = numpy.argsort(codes1, kind="stable")
+    sorted1 = codes1[order]
+    left = numpy.searchsorted(sorted1, codes2, side="left")
+    counts = numpy.searchsorted(sorted1, codes2, side="right") - left
+    return order, left, counts
+
+
+def word_hits(seq1, seq2, k):
+    """returns arrays of the positions in seq1 and seq2 of identical words
+
+    Parameters
+    ----------
+    seq1, seq2 : bytes
+        the sequences
+    k : int
+        word length
+
+    Notes
+    -----
+    Words of seq1 are sorted once, making a seed index that each word of seq2
+    is looked up in. Words are coded exactly when possible, otherwise hashed,
+    in which case some returned pairs are not identical.
+    """
+    order, left, counts = _word_index(seq1, seq2, k)
+    total = counts.sum()
+    pos2 = numpy.repeat(numpy.arange(len(counts)), counts)
+    # offsets of each hit within the block of its seq2 word
+    offsets = numpy.arange(total) - numpy.repeat(counts.cumsum() - counts, counts)
+    pos1 = order[numpy.repeat(left, counts) + offsets]
+    return pos1, pos2
+
+
+@UI.display_wrap
+def seeded_dotplot(
+    seq1,
+    seq2,
+    window,
+    threshold,
+    min_gap_length=0,
+    band=None,
+    seed_length=None,
+    ui=None,
+):
+    """A list of line segments covering the window-mers with identical
+    matches >= threshold, found by extending identical words
+
+    Parameters
+    ----------
+    seq1, seq2 : str or bytes
+        the sequences
+    window, threshold, min_gap_length, band
+        as for dotplot
+    seed_length : int, "auto" or None
+        length of the identical words the segments are extended from. Windows
+        with threshold matches always include a run of matches of a certain
+        length. If seed_length is no longer than that, the result is identical
+        to that of dotplot. Longer seeds are faster, but miss windows without
+        such a word. "auto" uses the longer of that run length and the word
+        length at which chance hits are about as numerous as sequence
+        positions, which suits long sequences. Defaults to the run length,
+        lengthened, up to the "auto" length, while the words have more than
+        MAX_SEED_HITS hits.
+
+    Notes
+    -----
+    Only the stretches of diagonals within a window of a word hit are
+    scanned, so the time taken scales with the number of hits rather than
+    the product of the sequence lengths.
+    """
+    if threshold < 1:
+        # every window matches, so there are no seeds to find
+        return dotplot(
+            seq1, seq2, window, threshold, min_gap_length, band, show_progress=False
+        )
+
+    if isinstance(seq1, str):
+        seq1 = seq1.encode("utf8")
+
+    if isinstance(seq2, str):
+        seq2 = seq2.encode("utf8")
+
+    (len1, len2) = len(seq1), len(seq2)
+    if seed_length in (None, "auto"):
+        # a window's mismatches split its matches into at most this many runs
+        runs = max(window - threshold, 0) + 1
+        exact = -(-threshold // runs)
+        num_states = len(set(seq1 + seq2))
+        longest = exact
+        if num_states > 1 and len1 and len2:
+            chance = numpy.log(len1 * len2 / (len1 + len2)) / numpy.log(num_states)
+            longest = max(exact, int(numpy.ceil(chance)))
+        if seed_length == "auto":
+            seed_length = longest
+        else:
+            seed_length = exact
+            while (
+                seed_length < longest
+                and _word_index(seq1, seq2, seed_length)[2].sum() > MAX_SEED_HITS
+            ):
+                seed_length += 1
+
+    pos1, pos2 = word_hits(seq1, seq2, seed_length)
+    diagonals = pos2 - pos1
+    if band is not None:
+        keep = (diagonals >= -min(len1, band)) & (diagonals <= min(len2, band))
+        (pos1, diagonals) = pos1[keep], diagonals[keep]
+
+    if len(pos1) == 0:
+        return []
+
+    order = numpy.lexsort((pos1, diagonals))
+    (pos1, diagonals) = pos1[order], diagonals[order]
+    # hits further apart than this can not contribute to the same segment,
+    # nor to segments near enough to be joined
+    new = numpy.ones(len(pos1), dtype=bool)
+    new[1:] = (diagonals[1:] != diagonals[:-1]) | (
+        pos1[1:] - pos1[:-1] > 2 * window + min_gap_length
+    )
+    starts = numpy.flatnonzero(new)
+    ends = numpy.append(starts[1:], len(pos1)) - 1
+    diagonals = diagonals[starts]
+    # the stretch of each diagonal, in seq1 coordinates, to be scanned
+    lo = numpy.maximum(numpy.maximum(0, -diagonals), pos1[starts] - window)
+    hi = numpy.minimum(numpy.minimum(len1, len2 - diagonals), pos1[ends] + window + 1)
+    regions = list(zip(diagonals.tolist(), lo.tolist(), hi.tolist()))
+
+    def some_regions(regions):
+        result = []
+        for (dia, start, end) in regions:
+            segs = segments_from_diagonal(
+                seq1[start:end],
+                seq2[start + dia : end + dia],
+                window,
+                threshold,
+                min_gap_length,
+                0,
+            )
+            result.extend(
+                ((start + i, start + i + dia), (start + j, start + j + dia))
+                for (i, j) in segs
+            )
+        return result
+
+    step = max(len(regions) // 100, 1)
+    chunks = [regions[i : i + step] for i in range(0, len(regions), step)]
+    result = []
+    for chunk_segments in ui.imap(some_regions, chunks, noun="region block"):
+        result.extend(chunk_segments)
+    return result
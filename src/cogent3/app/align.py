@@ -1,6 +1,8 @@
 import warnings
 
-from cogent3 import make_tree
+import numpy
+
+from cogent3 import make_aligned_seqs, make_tree
 from cogent3.align import (
     global_pairwise,
     make_dna_scoring_dict,
@@ -8,8 +10,11 @@ from cogent3.align import (
 )
 from cogent3.align.progressive import TreeAlign
 from cogent3.app import dist
+from cogent3.cluster.UPGMA import upgma
 from cogent3.core.moltype import get_moltype
+from cogent3.evolve.fast_distance import get_kmer_distances
 from cogent3.evolve.models import get_model
+from cogent3.util import parallel
 
 from .composable import (
     ALIGNED_TYPE,
@@ -31,22 +36,25 @@ __email__ = "Gavin.Huttley@anu.edu.au"
 __status__ = "Alpha"
 
 
-class _GapInRef:
-    """assumes first element of series is reference, returns True if that matches
-    gap_state"""
+_align_to_ref_state = {}
 
-    def __init__(self, moltype, gap):
-        self.gap_state = moltype.alphabet.to_indices(gap)[0]
-        self.func = self._ref_gap if gap == "-" else self._array_ref_gap
 
-    def _ref_gap(self, x):
-        return x[0] != self.gap_state
+def _init_align_to_ref(ref_seq, kwargs):
+    """stores the reference and aligner settings for this worker process"""
+    _align_to_ref_state.update(ref_seq=ref_seq, kwargs=kwargs)
 
-    def _array_ref_gap(self, x):
-        return x.flatten()[0] != self.gap_state
 
-    def __call__(self, x):
-        return self.func(x)
+def _aligned_to_ref(seq):
+    """returns seq as aligned to the reference, excluding positions where
+    the reference has a gap"""
+    ref_seq = _align_to_ref_state["ref_seq"]
+    result = global_pairwise(ref_seq, seq, **_align_to_ref_state["kwargs"])
+    gap_state = result.moltype.alphabet.to_indices(result.moltype.gap)[0]
+    # as we're going to be using a pairwise distance that excludes gaps
+    # eliminating positions with deletions in the reference
+    keep = result.array_seqs[0] != gap_state
+    seq = str(result.get_gapped_seq(result.names[1])).encode("utf8")
+    return numpy.frombuffer(seq, dtype=numpy.uint8)[keep].tobytes().decode("utf8")
 
 
 class align_to_ref(ComposableSeq):
@@ -64,6 +72,9 @@ class align_to_ref(ComposableSeq):
         insertion_penalty=20,
         extension_penalty=2,
         moltype="dna",
+        band=None,
+        parallel=False,
+        par_kw=None,
     ):
         """
         Parameters
@@ -79,6 +90,16 @@ class align_to_ref(ComposableSeq):
             penalty for gap extension
         moltype : str
             molecular type
+        band : int or DPBand
+            limits each pairwise alignment to cells of the dynamic programming
+            grid within this width of the diagonal, or within a DPBand (see
+            cogent3.align.pairwise), e.g. DPBand(20, seed_length=12) follows
+            k-mer seed matches. Defaults to the full grid.
+        parallel : bool
+            sequences are aligned to the reference by a pool of worker
+            processes, each of which receives the reference once
+        par_kw : dict or None
+            arguments passed to parallel.as_completed, e.g. max_workers
         """
         super(align_to_ref, self).__init__(
             input_types=self._input_types,
@@ -95,7 +116,7 @@ class align_to_ref(ComposableSeq):
             else make_generic_scoring_dict(10, self._moltype)
         )
         self._kwargs = dict(
-            S=S, d=insertion_penalty, e=extension_penalty, return_score=False
+            S=S, d=insertion_penalty, e=extension_penalty, return_score=False, band=band
         )
         if ref_seq.lower() == "longest":
             self.func = self.align_to_longest
@@ -103,7 +124,8 @@ class align_to_ref(ComposableSeq):
             self.func = self.align_to_named_seq
             self._ref_name = ref_seq
 
-        self._gap_state = None  # can be character or int, depends on aligner
+        self._parallel = parallel
+        self._par_kw = par_kw or {}
 
     def align_to_longest(self, seqs):
         """returns alignment to longest seq"""
@@ -122,30 +144,32 @@ class align_to_ref(ComposableSeq):
             seqs = seqs.to_moltype(self._moltype)
 
         ref_seq = seqs.get_seq(self._ref_name)
-        aligned = None
-        kwargs = self._kwargs.copy()
-        no_ref_gap = None
-
-        for i in range(seqs.num_seqs):
-            seq = seqs.seqs[i]
-            if seq.name == self._ref_name:
-                continue
-
-            result = global_pairwise(ref_seq, seq, **kwargs)
-            if no_ref_gap is None:
-                no_ref_gap = _GapInRef(result.moltype, seqs.moltype.gap)
-
-            # as we're going to be using a pairwise distance that excludes gaps
-            # eliminating positions with deletions in the reference
-            result = result.filtered(no_ref_gap)
-            if aligned is None:
-                aligned = result
-                continue
-
-            aligned = aligned.add_from_ref_aln(result)
-
-        # default to ArrayAlign
-        new = aligned.to_type(array_align=True)
+        others = [seq for seq in seqs.seqs if seq.name != self._ref_name]
+        initargs = (ref_seq, self._kwargs.copy())
+        if self._parallel:
+            completed = parallel.as_completed(
+                _aligned_to_ref,
+                others,
+                initializer=_init_align_to_ref,
+                initargs=initargs,
+                **self._par_kw,
+            )
+        else:
+            _init_align_to_ref(*initargs)
+            completed = enumerate(map(_aligned_to_ref, others))
+
+        aligned = [None] * len(others)
+        try:
+            for index, aligned_seq in completed:
+                aligned[index] = aligned_seq
+        finally:
+            _align_to_ref_state.clear()
+
+        # every sequence is now in the coordinates of the ungapped reference,
+        # so the alignment is built once
+        data = [(self._ref_name, str(ref_seq))]
+        data.extend((seq.name, aligned[i]) for i, seq in enumerate(others))
+        new = make_aligned_seqs(data, moltype=seqs.moltype, array_align=True)
         return new
 
 
@@ -167,6 +191,7 @@ class progressive_align(ComposableSeq):
         indel_length=1e-1,
         indel_rate=1e-10,
         distance="percent",
+        band=None,
     ):
         """
         Parameters
@@ -198,7 +223,13 @@ class progressive_align(ComposableSeq):
             the distance measure for building a guide tree. Default is 'percent',
             the proportion of differences. This is applicable for any moltype,
             and sequences with very high percent identity. For more diverged
-            sequences we recommend 'paralinear'.
+            sequences we recommend 'paralinear'. If 'kmer', the guide tree is
+            a UPGMA tree from k-mer distances between the unaligned sequences,
+            avoiding the crude alignment.
+        band : int or DPBand
+            limits each progressive pairwise alignment, and the crude
+            alignment made for a guide tree, to a band of the dynamic
+            programming grid. See align_to_ref.
         """
         super(progressive_align, self).__init__(
             input_types=self._input_types,
@@ -224,11 +255,14 @@ class progressive_align(ComposableSeq):
         self._moltype = moltype
         self._unique_guides = unique_guides
         self._distance = distance
+        self._band = band
         if callable(guide_tree):
             self._make_tree = guide_tree
             guide_tree = None  # callback takes precedence
+        elif distance == "kmer":
+            self._make_tree = None
         else:
-            al_to_ref = align_to_ref(moltype=self._moltype)
+            al_to_ref = align_to_ref(moltype=self._moltype, band=band)
             dist_calc = dist.fast_slow_dist(
                 distance=self._distance, moltype=self._moltype
             )
@@ -250,14 +284,19 @@ class progressive_align(ComposableSeq):
             tree=self._guide_tree,
             param_vals=self._param_vals,
             show_progress=False,
+            band=band,
         )
 
         self.func = self.multiple_align
 
     def _build_guide(self, seqs):
-        crude_aligner = align_to_ref(moltype=self._moltype)
-        aln = crude_aligner(seqs)
-        tree = self._make_tree(aln)
+        if self._make_tree is None:
+            dists = get_kmer_distances(seqs, moltype=self._moltype)
+            tree = scale_branches()(upgma(dists))
+        else:
+            crude_aligner = align_to_ref(moltype=self._moltype, band=self._band)
+            aln = crude_aligner(seqs)
+            tree = self._make_tree(aln)
         if self._scalar != 1:
             scaler = scale_branches(scalar=self._scalar)
             tree = scaler(tree)
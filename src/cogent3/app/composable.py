@@ -3,15 +3,19 @@ import json
 import os
 import pathlib
 import re
+import sys
 import time
 import traceback
 
+import numpy
 import scitrack
 
 from cogent3 import make_aligned_seqs, make_unaligned_seqs
 from cogent3.core.alignment import SequenceCollection
+from cogent3.util import parallel as PAR
 from cogent3.util import progress_display as UI
 from cogent3.util.misc import get_object_provenance, open_
+from cogent3.util.table import Table
 
 from .data_store import (
     IGNORE,
@@ -25,6 +29,11 @@ from .data_store import (
 )
 
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 __author__ = "Gavin Huttley"
 __copyright__ = "Copyright 2007-2019, The Cogent Project"
 __credits__ = ["Gavin Huttley"]
@@ -61,6 +70,16 @@ def _get_source(source):
     return result
 
 
+def _peak_rss():
+    """peak resident set size of this process in MB, None if unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return peak / scale
+
+
 def _get_origin(origin):
     if type(origin) == str:
         result = origin
@@ -208,6 +227,8 @@ class Composable(ComposableType):
         self._checkpointable = False
         self._load_checkpoint = None
         self._formatted = ["type='%s'" % self._type]
+        self._profiling = False
+        self._profile_records = None
 
     def __str__(self):
         txt = "" if not self.input else str(self.input)
@@ -330,6 +351,11 @@ class Composable(ComposableType):
 
         if not val:
             return val
+
+        profiling = self.profiling
+        if profiling:
+            start, rss = time.perf_counter(), _peak_rss()
+
         result = self._trapped_call(self.func, val, *args, **kwargs)
         if not result and type(result) != NotCompleted:
             msg = (
@@ -341,8 +367,100 @@ class Composable(ComposableType):
             origin = str(self)
             result = NotCompleted("BUG", origin, msg, source=val)
 
+        if profiling:
+            seconds = time.perf_counter() - start
+            rss_delta = None if rss is None else _peak_rss() - rss
+            self._profile_records.append(
+                (_get_source(val), seconds, rss_delta, type(result) != NotCompleted)
+            )
+
         return result
 
+    def _composed(self):
+        """returns the apps in the composed function, first to last"""
+        apps = []
+        app = self
+        while app is not None:
+            apps.append(app)
+            app = app.input
+        return apps[::-1]
+
+    @property
+    def profiling(self):
+        """whether calls to apps in the composed function are being profiled
+
+        When True, every app in the composed function records, per call,
+        the data source, elapsed time, change in peak RSS and whether the
+        result was a NotCompleted. Setting the value discards existing
+        records. See profile_table().
+        """
+        return getattr(self, "_profiling", False)
+
+    @profiling.setter
+    def profiling(self, on):
+        for app in self._composed():
+            app._profiling = bool(on)
+            app._profile_records = [] if on else None
+
+    def profile_table(self, per_member=False):
+        """returns a Table of profiling statistics for the composed function
+
+        Parameters
+        ----------
+        per_member : bool
+            if True, one row per app per call. Otherwise, one row per app
+            with the call count, NotCompleted rate, total time, latency
+            percentiles and largest change in peak RSS.
+        """
+        rows = []
+        for app in self._composed():
+            name = app.__class__.__name__
+            records = getattr(app, "_profile_records", None) or []
+            if per_member:
+                rows.extend([name] + list(record) for record in records)
+                continue
+
+            if records:
+                sources, seconds, rss, completed = zip(*records)
+                seconds = numpy.array(seconds)
+                p50, p95 = numpy.percentile(seconds, [50, 95])
+                rss = [r for r in rss if r is not None]
+                rss = max(rss) if rss else None
+                not_completed = 1 - sum(completed) / len(completed)
+                rows.append(
+                    [
+                        name,
+                        len(records),
+                        not_completed,
+                        seconds.sum(),
+                        seconds.mean(),
+                        p50,
+                        p95,
+                        seconds.max(),
+                        rss,
+                    ]
+                )
+            else:
+                rows.append([name, 0, None, 0.0, None, None, None, None, None])
+
+        if per_member:
+            header = ["app", "source", "seconds", "peak_rss_delta_MB", "completed"]
+            title = "profile per member"
+        else:
+            header = [
+                "app",
+                "calls",
+                "not_completed_rate",
+                "total_seconds",
+                "mean_seconds",
+                "p50_seconds",
+                "p95_seconds",
+                "max_seconds",
+                "peak_rss_delta_MB",
+            ]
+            title = "profile"
+        return Table(header=header, rows=rows, title=title, missing_data="None")
+
     @property
     def input(self):
         return self._in
@@ -372,6 +490,31 @@ class Composable(ComposableType):
         self._out = None
         self._load_checkpoint = None
 
+    def _log_outcome(self, LOGGER, member, outcome):
+        """records input and output of a single data store member"""
+        # ensure member is a DataStoreMember instance
+        if not isinstance(member, DataStoreMember):
+            member = SingleReadDataStore(member)[0]
+
+        LOGGER.log_message(member, label="input")
+        if member.md5:
+            LOGGER.log_message(member.md5, label="input md5sum")
+        mem_id = self.data_store.make_relative_identifier(member.name)
+        if outcome:
+            member = self.data_store.get_member(mem_id)
+            LOGGER.log_message(member, label="output")
+            LOGGER.log_message(member.md5, label="output md5sum")
+        else:
+            # we have a NotCompletedResult
+            try:
+                # db data stores support storage
+                self.data_store.write_incomplete(mem_id, outcome.to_rich_dict())
+            except AttributeError:
+                pass
+            LOGGER.log_message(
+                f"{outcome.origin} : {outcome.message}", label=outcome.type
+            )
+
     @UI.display_wrap
     def apply_to(
         self,
@@ -381,6 +524,10 @@ class Composable(ComposableType):
         par_kw=None,
         logger=True,
         cleanup=False,
+        max_in_flight=None,
+        write_batch=None,
+        keep_results=True,
+        profile=False,
         ui=None,
     ):
         """invokes self composable function on the provided data store
@@ -407,6 +554,20 @@ class Composable(ComposableType):
         cleanup : bool
             after copying of log files into the data store, they are deleted
             from their original location
+        max_in_flight : int or None
+            if parallel, the maximum number of members submitted to workers
+            and not yet written. Members are submitted individually, largest
+            first, and written in order of completion. Worker count is set by
+            par_kw['max_workers']. Not applicable with MPI.
+        write_batch : int or None
+            number of records a writer accumulates before committing them
+            to disk, where the data store supports it (tinydb, sqlitedb).
+        keep_results : bool
+            if False, only NotCompleted results are retained
+        profile : bool
+            if True, each app in the composed function is profiled, including
+            those run in worker processes. The summary is written to the log,
+            see profile_table() for retrieving the results.
 
         Returns
         -------
@@ -414,7 +575,9 @@ class Composable(ComposableType):
         Notes
         -----
         If run in parallel, this instance serves as the master object and
-        aggregates results.
+        aggregates results. Throughput and the time spent in each stage of
+        the run are recorded in the apply_to_timings attribute and, if
+        logging, in the log.
         """
         if isinstance(dstore, str):
             dstore = [dstore]
@@ -444,8 +607,13 @@ class Composable(ComposableType):
         if LOGGER:
             LOGGER.log_message(str(self), label="composable function")
             LOGGER.log_versions(["cogent3"])
-        results = []
-        i = 0
+
+        if write_batch and hasattr(self, "data_store"):
+            try:
+                self.data_store.write_cache_size = write_batch
+            except AttributeError:
+                pass
+
         process = self.input if self.input else self
         if self.input:
             # As we will be explicitly calling the input object, we disconnect
@@ -455,57 +623,139 @@ class Composable(ComposableType):
             process.output = None
             self.input = None
 
-        # with a tinydb dstore, this also excludes data that failed to complete
+        if profile:
+            # records from each call are returned with the result, so they
+            # are gathered even if process is run in other processes
+            stages = process._composed()
+            profiled = [[] for _ in stages]
+            func = _profiled_call(process)
+            # profiling is only on for this run
+            profiled_apps = stages + ([] if process is self else [self])
+            was_profiling = [app.profiling for app in profiled_apps]
+            for app in profiled_apps:
+                app._profiling = True
+            self._profile_records = []
+        else:
+            func = process
+
+        # with a db dstore, this also excludes data that failed to complete
         todo = [m for m in dstore if not self.job_done(m)]
 
-        for result in ui.imap(
-            process, todo, parallel=parallel, par_kw=par_kw, mininterval=mininterval
-        ):
-            outcome = result if process is self else self(result)
-            results.append(outcome)
-            if LOGGER:
-                member = dstore[i]
-                # ensure member is a DataStoreMember instance
-                if not isinstance(member, DataStoreMember):
-                    member = SingleReadDataStore(member)[0]
-
-                LOGGER.log_message(member, label="input")
-                if member.md5:
-                    LOGGER.log_message(member.md5, label="input md5sum")
-                mem_id = self.data_store.make_relative_identifier(member.name)
-                if outcome:
-                    member = self.data_store.get_member(mem_id)
-                    LOGGER.log_message(member, label="output")
-                    LOGGER.log_message(member.md5, label="output md5sum")
-                else:
-                    # we have a NotCompletedResult
-                    try:
-                        # tinydb supports storage
-                        self.data_store.write_incomplete(mem_id, outcome.to_rich_dict())
-                    except AttributeError:
-                        pass
-                    LOGGER.log_message(
-                        f"{outcome.origin} : {outcome.message}", label=outcome.type
-                    )
-
-            i += 1
+        par_kw = par_kw or {}
+        scheduled = parallel and max_in_flight is not None and not par_kw.get("use_mpi")
+        if scheduled:
+            # heaviest first, so long running members don't finish last
+            order = sorted(
+                range(len(todo)), key=lambda i: _member_size(todo[i]), reverse=True
+            )
+            ui.mininterval = mininterval
+            results = ui.series(
+                PAR.as_completed(
+                    func,
+                    [todo[i] for i in order],
+                    max_workers=par_kw.get("max_workers"),
+                    max_in_flight=max_in_flight,
+                ),
+                count=len(todo),
+            )
+            results = ((order[i], result) for i, result in results)
+        else:
+            results = enumerate(
+                ui.imap(
+                    func,
+                    todo,
+                    parallel=parallel,
+                    par_kw=par_kw,
+                    mininterval=mininterval,
+                )
+            )
+
+        timings = dict(process=0.0, write=0.0, log=0.0)
+        outcomes = []
+        tick = time.time()
+        try:
+            for index, result in results:
+                now = time.time()
+                timings["process"] += now - tick
+                tick = now
+                if profile:
+                    result, records = result
+                    for stage_records, new in zip(profiled, records):
+                        stage_records.extend(new)
+                outcome = result if process is self else self(result)
+                now = time.time()
+                timings["write"] += now - tick
+                tick = now
+                if keep_results or not outcome:
+                    outcomes.append((index, outcome))
+                if LOGGER:
+                    self._log_outcome(LOGGER, todo[index], outcome)
+                    now = time.time()
+                    timings["log"] += now - tick
+                    tick = now
+        finally:
+            if profile:
+                for app, was in zip(profiled_apps, was_profiling):
+                    app._profiling = was
+
+        # restore input order
+        outcomes.sort(key=lambda x: x[0])
+        results = [outcome for _, outcome in outcomes]
 
         finish = time.time()
         taken = finish - start
+        timings["total"] = taken
+        timings["num_members"] = len(todo)
+        timings["members_per_second"] = len(todo) / taken if taken else 0.0
+        self.apply_to_timings = timings
+        if profile:
+            for app, records in zip(stages, profiled):
+                app._profile_records = records
+
+        # now reconnect input
+        if process is not self:
+            self = process + self
+
         if LOGGER:
             LOGGER.log_message(f"{taken}", label="TIME TAKEN")
+            LOGGER.log_message(
+                ", ".join(f"{k}={v}" for k, v in timings.items()), label="TIMINGS"
+            )
+            if profile:
+                LOGGER.log_message(
+                    self.profile_table().to_string(format="tsv"), label="PROFILE"
+                )
             LOGGER.shutdown()
             log_file_path = str(log_file_path)
             self.data_store.add_file(log_file_path, cleanup=cleanup, keep_suffix=True)
             self.data_store.close()
 
-        # now reconnect input
-        if process is not self:
-            self = process + self
-
         return results
 
 
+class _profiled_call:
+    """calls a composed function, returning the result and the profiling
+    records for each app in it"""
+
+    def __init__(self, process):
+        self.process = process
+
+    def __call__(self, val):
+        apps = self.process._composed()
+        for app in apps:
+            app._profile_records = []
+        result = self.process(val)
+        return result, [app._profile_records for app in apps]
+
+
+def _member_size(member):
+    """size of the file corresponding to a data store member, 0 if unknown"""
+    try:
+        return os.path.getsize(str(member))
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
 class ComposableTabular(Composable):
     _type = "tabular"
 
@@ -612,8 +862,10 @@ class _checkpointable(Composable):
         super(_checkpointable, self).__init__(**kwargs)
         self._formatted_params()
 
-        if data_path.endswith(".tinydb") and not self.__class__.__name__.endswith("db"):
-            raise ValueError("tinydb suffix reserved for write_db")
+        if data_path.endswith((".tinydb", ".sqlitedb")) and not (
+            self.__class__.__name__.endswith("db")
+        ):
+            raise ValueError("tinydb and sqlitedb suffixes reserved for write_db")
 
         self._checkpointable = True
         if_exists = if_exists.lower()
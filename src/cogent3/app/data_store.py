@@ -4,8 +4,10 @@ import os
 import pathlib
 import re
 import shutil
+import sqlite3
 import weakref
 import zipfile
+import zlib
 
 from collections import defaultdict
 from fnmatch import fnmatch, translate
@@ -19,6 +21,7 @@ from tinydb import Query, TinyDB
 from tinydb.middlewares import CachingMiddleware
 from tinydb.storages import JSONStorage
 
+from cogent3.util.binary import from_binary, is_binary, to_binary
 from cogent3.util.deserialise import deserialise_not_completed
 from cogent3.util.misc import (
     atomic_write,
@@ -705,7 +708,94 @@ def _db_lockid(path):
     return lockid
 
 
-class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
+class _DbSummaries:
+    """summaries of records in a database data store, requires incomplete,
+    members and logs properties and a _lock_pid() method"""
+
+    @property
+    def summary_incomplete(self):
+        """returns a table summarising incomplete results"""
+        types = defaultdict(list)
+        indices = "type", "origin"
+        for member in self.incomplete:
+            record = member.read()
+            record = deserialise_not_completed(record)
+            key = tuple(getattr(record, k, None) for k in indices)
+            types[key].append([record.message, record.source])
+
+        header = list(indices) + ["message", "num", "source"]
+        rows = []
+        for record in types:
+            messages, sources = list(zip(*types[record]))
+            messages = list(sorted(set(messages)))
+            if len(messages) > 3:
+                messages = messages[:3] + ["..."]
+
+            if len(sources) > 3:
+                sources = sources[:3] + ("...",)
+
+            row = list(record) + [
+                ", ".join(messages),
+                len(types[record]),
+                ", ".join(sources),
+            ]
+            rows.append(row)
+
+        table = Table(header=header, rows=rows, title="incomplete records")
+        return table
+
+    @property
+    def summary_logs(self):
+        """returns a table summarising log files"""
+        rows = []
+        for record in self.logs:
+            data = record.read().splitlines()
+            first = data.pop(0).split("\t")
+            row = [first[0], record.name]
+            data = [r.split("\t")[-1].split(" : ", maxsplit=1) for r in data]
+            data = dict(data)
+            row.extend(
+                [
+                    data["python"],
+                    data["user"],
+                    data["command_string"],
+                    data["composable function"],
+                ]
+            )
+            rows.append(row)
+        table = Table(
+            header=["time", "name", "python version", "who", "command", "composable"],
+            rows=rows,
+            title="summary of log files",
+        )
+        return table
+
+    @property
+    def describe(self):
+        """returns tables describing content types"""
+        lock_id = self._lock_pid()
+        if lock_id:
+            title = (
+                f"Locked db store. Locked to pid={lock_id}, current pid={os.getpid()}"
+            )
+        else:
+            title = "Unlocked db store."
+        num_incomplete = len(self.incomplete)
+        num_complete = len(self.members)
+        num_logs = len(self.logs)
+        summary = Table(
+            header=["record type", "number"],
+            rows=[
+                ["completed", num_complete],
+                ["incomplete", num_incomplete],
+                ["logs", num_logs],
+            ],
+            title=title,
+        )
+        return summary
+
+
+class ReadOnlyTinyDbDataStore(_DbSummaries, ReadOnlyDataStoreBase):
     """A TinyDB based json data store"""
 
     store_suffix = "tinydb"
@@ -715,6 +805,18 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
         super(ReadOnlyTinyDbDataStore, self).__init__(*args, **kwargs)
         self._db = None
         self._finish = None
+        self._write_cache_size = 50
+
+    @property
+    def write_cache_size(self):
+        """number of records inserted before they're written to disk"""
+        return self._write_cache_size
+
+    @write_cache_size.setter
+    def write_cache_size(self, size):
+        self._write_cache_size = size
+        if self._db is not None:
+            self._db.storage.WRITE_CACHE_SIZE = size
 
     def __contains__(self, identifier):
         """whether identifier has been stored here"""
@@ -736,7 +838,7 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
     def db(self):
         if self._db is None:
             storage = CachingMiddleware(JSONStorage)
-            storage.WRITE_CACHE_SIZE = 50  # todo support for user specifying
+            storage.WRITE_CACHE_SIZE = self._write_cache_size
             self._db = TinyDB(self.source, storage=storage)
             name = self.__class__.__name__
             if "readonly" in name.lower():
@@ -779,6 +881,9 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
             self._db.insert(dict(identifier="LOCK", pid=os.getpid()))
             self._db.storage.flush()
 
+    def _lock_pid(self):
+        return _db_lockid(self.source)
+
     @property
     def locked(self):
         """returns lock pid or None if unlocked or pid matches self"""
@@ -812,38 +917,6 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
             incomplete.append(member)
         return incomplete
 
-    @property
-    def summary_incomplete(self):
-        """returns a table summarising incomplete results"""
-        types = defaultdict(list)
-        indices = "type", "origin"
-        for member in self.incomplete:
-            record = member.read()
-            record = deserialise_not_completed(record)
-            key = tuple(getattr(record, k, None) for k in indices)
-            types[key].append([record.message, record.source])
-
-        header = list(indices) + ["message", "num", "source"]
-        rows = []
-        for record in types:
-            messages, sources = list(zip(*types[record]))
-            messages = list(sorted(set(messages)))
-            if len(messages) > 3:
-                messages = messages[:3] + ["..."]
-
-            if len(sources) > 3:
-                sources = sources[:3] + ("...",)
-
-            row = list(record) + [
-                ", ".join(messages),
-                len(types[record]),
-                ", ".join(sources),
-            ]
-            rows.append(row)
-
-        table = Table(header=header, rows=rows, title="incomplete records")
-        return table
-
     @property
     def members(self):
         if not self._members:
@@ -918,56 +991,6 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
             logfiles.append(member)
         return logfiles
 
-    @property
-    def summary_logs(self):
-        """returns a table summarising log files"""
-        rows = []
-        for record in self.logs:
-            data = record.read().splitlines()
-            first = data.pop(0).split("\t")
-            row = [first[0], record.name]
-            data = [r.split("\t")[-1].split(" : ", maxsplit=1) for r in data]
-            data = dict(data)
-            row.extend(
-                [
-                    data["python"],
-                    data["user"],
-                    data["command_string"],
-                    data["composable function"],
-                ]
-            )
-            rows.append(row)
-        table = Table(
-            header=["time", "name", "python version", "who", "command", "composable"],
-            rows=rows,
-            title="summary of log files",
-        )
-        return table
-
-    @property
-    def describe(self):
-        """returns tables describing content types"""
-        lock_id = _db_lockid(self.source)
-        if lock_id:
-            title = (
-                f"Locked db store. Locked to pid={lock_id}, current pid={os.getpid()}"
-            )
-        else:
-            title = "Unlocked db store."
-        num_incomplete = len(self.incomplete)
-        num_complete = len(self.members)
-        num_logs = len(self.logs)
-        summary = Table(
-            header=["record type", "number"],
-            rows=[
-                ["completed", num_complete],
-                ["incomplete", num_incomplete],
-                ["logs", num_logs],
-            ],
-            title=title,
-        )
-        return summary
-
 
 class WritableTinyDbDataStore(ReadOnlyTinyDbDataStore, WritableDataStoreBase):
     def __init__(self, *args, **kwargs):
@@ -1070,3 +1093,414 @@ class WritableTinyDbDataStore(ReadOnlyTinyDbDataStore, WritableDataStoreBase):
             path.unlink()
 
         return m
+
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(data, compress):
+    """returns data compressed using the named method"""
+    if not compress:
+        return data
+    if compress == "zlib":
+        return zlib.compress(data)
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _decompress(data, compress):
+    """returns decompressed data"""
+    if not compress:
+        return data
+    if compress == "zlib":
+        return zlib.decompress(data)
+    if zstandard is None:
+        raise ImportError("zstandard required to read zstd compressed records")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+_SQLITE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS records (
+        id INTEGER PRIMARY KEY,
+        identifier TEXT NOT NULL UNIQUE,
+        completed INTEGER NOT NULL,
+        compression TEXT NOT NULL DEFAULT '',
+        data BLOB NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS completed_index ON records (completed)",
+    "CREATE TABLE IF NOT EXISTS lock (pid INTEGER NOT NULL)",
+)
+
+
+def _sqlite_lockid(path):
+    """returns pid in the lock table or None"""
+    if not os.path.exists(path):
+        return None
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        got = db.execute("SELECT pid FROM lock").fetchone()
+    except sqlite3.OperationalError:
+        got = None
+    db.close()
+    return None if got is None else got[0]
+
+
+class ReadOnlySqliteDataStore(_DbSummaries, ReadOnlyDataStoreBase):
+    """A SQLite based json data store
+
+    Lookups by identifier use an index, and the database is used in
+    write-ahead-log mode so readers do not block a writer.
+    """
+
+    store_suffix = "sqlitedb"
+
+    def __init__(self, *args, **kwargs):
+        kwargs["suffix"] = "json"
+        super(ReadOnlySqliteDataStore, self).__init__(*args, **kwargs)
+        self._db = None
+        self._finish = None
+
+    def __repr__(self):
+        txt = super().__repr__()
+        num = self.db.execute(
+            "SELECT COUNT(*) FROM records WHERE completed = 0"
+        ).fetchone()[0]
+        if num > 0:
+            txt = f"{txt}, {num}x incomplete"
+        return txt
+
+    def _connect(self):
+        db = sqlite3.connect(f"file:{self.source}?mode=ro", uri=True)
+        return db
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._connect()
+            # closes the connection, even if close() is never called
+            self._finish = weakref.finalize(self, self._close, self._db)
+        return self._db
+
+    def __del__(self):
+        self.close()
+
+    @classmethod
+    def _close(cls, db):
+        db.close()
+
+    def close(self):
+        """closes the data store"""
+        if self._db is None:
+            return
+        # does nothing if the finalizer has already run, e.g. at exit
+        self._finish()
+        self._db = None
+
+    def _lock_pid(self):
+        return _sqlite_lockid(self.source)
+
+    @property
+    def locked(self):
+        """whether the database is locked by a writer"""
+        return self._lock_pid() is not None
+
+    def _members_matching(self, pattern, completed=None, limit=None):
+        """returns DataStoreMember for records whose identifier glob matches
+        pattern"""
+        sql = "SELECT id, identifier FROM records WHERE identifier GLOB ?"
+        args = [pattern]
+        if completed is not None:
+            sql += " AND completed = ?"
+            args.append(int(completed))
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [
+            DataStoreMember(identifier, self, id=id_)
+            for id_, identifier in self.db.execute(sql, args)
+        ]
+
+    @property
+    def members(self):
+        if not self._members:
+            pattern = f"*.{self.suffix}" if self.suffix else "*"
+            self._members = self._members_matching(
+                pattern, completed=True, limit=self.limit
+            )
+        return self._members
+
+    @property
+    def incomplete(self):
+        """returns database records with completed=False"""
+        return self._members_matching("*", completed=False)
+
+    @property
+    def logs(self):
+        """returns all records with a .log suffix"""
+        return self._members_matching("*.log")
+
+    def _get_id(self, identifier):
+        """returns the row id for identifier, None if absent"""
+        identifier = self.get_relative_identifier(identifier)
+        got = self.db.execute(
+            "SELECT id FROM records WHERE identifier = ?", (str(identifier),)
+        ).fetchone()
+        return None if got is None else got[0]
+
+    def __contains__(self, identifier):
+        """whether identifier has been stored here"""
+        if isinstance(identifier, DataStoreMember):
+            return identifier.parent is self
+        return self._get_id(identifier) is not None
+
+    def get_member(self, identifier):
+        """returns DataStoreMember"""
+        identifier = self.get_relative_identifier(identifier)
+        id_ = self._get_id(identifier)
+        if id_ is None:
+            return None
+        return DataStoreMember(identifier, self, id=id_)
+
+    @extend_docstring_from(ReadOnlyDataStoreBase.get_absolute_identifier, pre=True)
+    def get_absolute_identifier(self, identifier, from_relative=True):
+        """For sqlite, this is the same as the relative identifier"""
+        return self.get_relative_identifier(identifier)
+
+    @extend_docstring_from(ReadOnlyDataStoreBase.get_relative_identifier)
+    def get_relative_identifier(self, identifier):
+        if isinstance(identifier, DataStoreMember) and identifier.parent is self:
+            return identifier
+
+        identifier = Path(identifier)
+        identifier = identifier.name
+        return identifier
+
+    def _read_bytes(self, identifier):
+        """returns the decompressed bytes of the stored record"""
+        id_ = getattr(identifier, "id", None)
+        if getattr(identifier, "parent", None) is not self or id_ is None:
+            id_ = self._get_id(identifier)
+        got = self.db.execute(
+            "SELECT compression, data FROM records WHERE id = ?", (id_,)
+        ).fetchone()
+        if got is None:
+            raise KeyError(f"'{identifier}' not in {self.source}")
+        compression, data = got
+        return _decompress(data, compression)
+
+    @staticmethod
+    def _decode(data):
+        if is_binary(data):
+            return from_binary(data)
+        return json.loads(data.decode("utf-8"))
+
+    def open(self, identifier):
+        return self._decode(self._read_bytes(identifier))
+
+    def read(self, identifier):
+        data = self._read_bytes(identifier)
+        decoded = self._decode(data)
+        if self._md5 and isinstance(decoded, str):
+            self._checksums[str(identifier)] = get_text_hexdigest(decoded)
+        elif self._md5:
+            # binary records are checksummed as stored
+            self._checksums[str(identifier)] = get_text_hexdigest(data)
+
+        return decoded
+
+    @extend_docstring_from(ReadOnlyDataStoreBase.md5)
+    def md5(self, member, force=True):
+        md5_setting = self._md5  # for restoring automatic md5 calc setting
+        member = str(self.get_relative_identifier(member))
+        if force and member not in self._checksums:
+            self._md5 = True
+            _ = self.read(member)
+
+        result = self._checksums.get(member, None)
+        self._md5 = md5_setting
+        return result
+
+
+class WritableSqliteDataStore(ReadOnlySqliteDataStore, WritableDataStoreBase):
+    """A SQLite based json data store
+
+    Writes are committed in batches of write_cache_size records. Records can
+    be compressed using zlib or, if the zstandard package is installed, zstd.
+    Records are serialised as json or, if serialiser='binary', using the
+    cogent3.util.binary encoding.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if_exists = kwargs.pop("if_exists", RAISE)
+        create = kwargs.pop("create", None)
+        compress = kwargs.pop("compress", None)
+        serialiser = kwargs.pop("serialiser", None)
+        ReadOnlySqliteDataStore.__init__(self, *args, **kwargs)
+        self.compress = compress
+        self.serialiser = serialiser
+        # number of records inserted before they're committed
+        self.write_cache_size = 50
+        self._pending = 0
+        WritableDataStoreBase.__init__(self, if_exists=if_exists, create=create)
+        self.lock()
+
+    @property
+    def compress(self):
+        """compression applied to stored records, None, 'zlib' or 'zstd'"""
+        return self._compress
+
+    @compress.setter
+    def compress(self, compress):
+        compress = (compress or "").lower()
+        if compress not in ("", "zlib", "zstd"):
+            raise ValueError(f"unknown compression {compress!r}")
+        if compress == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        self._compress = compress
+        self._persistent["compress"] = compress or None
+
+    @property
+    def serialiser(self):
+        """serialisation of stored records, 'json' or 'binary'"""
+        return self._serialiser
+
+    @serialiser.setter
+    def serialiser(self, serialiser):
+        serialiser = (serialiser or "json").lower()
+        if serialiser not in ("json", "binary"):
+            raise ValueError(f"unknown serialiser {serialiser!r}")
+        self._serialiser = serialiser
+        self._persistent["serialiser"] = serialiser
+
+    def _connect(self):
+        db = sqlite3.connect(self.source)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SQLITE_SCHEMA:
+            db.execute(statement)
+        db.commit()
+        return db
+
+    def _source_create_delete(self, if_exists, create):
+        if _sqlite_lockid(self.source):
+            return
+
+        exists = os.path.exists(self.source)
+        dirname = os.path.dirname(self.source)
+        if exists and if_exists == RAISE:
+            raise RuntimeError(f"'{self.source}' exists")
+        elif exists and if_exists == OVERWRITE:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.source + suffix):
+                    os.remove(self.source + suffix)
+        elif dirname and not os.path.exists(dirname) and not create:
+            raise RuntimeError(f"'{dirname}' does not exist")
+
+        if create and dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+    def lock(self):
+        """if writable, and not locked, locks the database to this pid"""
+        if not self.locked:
+            self.db.execute("INSERT INTO lock (pid) VALUES (?)", (os.getpid(),))
+            self.db.commit()
+
+    def unlock(self, force=False):
+        """remove a lock if pid matches. If force, ignores pid."""
+        pid = self._lock_pid()
+        if pid is not None and (pid == os.getpid() or force):
+            self.db.execute("DELETE FROM lock")
+            self.commit()
+
+    def commit(self):
+        """commits pending writes"""
+        if self._db is not None:
+            self._db.commit()
+        self._pending = 0
+
+    @classmethod
+    def _close(cls, db):
+        # commits pending writes and removes a lock held by this process
+        db.execute("DELETE FROM lock WHERE pid = ?", (os.getpid(),))
+        db.commit()
+        db.close()
+
+    def close(self):
+        """commits pending writes, unlocks and closes the data store"""
+        self._pending = 0
+        super(WritableSqliteDataStore, self).close()
+
+    def _insert(self, identifier, data, completed):
+        relative_id = str(self.get_relative_identifier(identifier))
+        id_ = self._get_id(relative_id)
+        if id_ is not None:
+            return DataStoreMember(relative_id, self, id=id_)
+
+        if self.serialiser == "binary":
+            data = to_binary(data)
+        else:
+            data = make_record_for_json(relative_id, data, completed)["data"]
+            data = data.encode("utf-8")
+        data = _compress(data, self.compress)
+        cursor = self.db.execute(
+            "INSERT INTO records (identifier, completed, compression, data) "
+            "VALUES (?, ?, ?, ?)",
+            (relative_id, int(completed), self.compress, data),
+        )
+        self._pending += 1
+        if self._pending >= self.write_cache_size:
+            self.commit()
+
+        member = DataStoreMember(relative_id, self, id=cursor.lastrowid)
+        if completed and relative_id.endswith(self.suffix) and self._members:
+            self._members.append(member)
+        return member
+
+    @extend_docstring_from(WritableDataStoreBase.write)
+    def write(self, identifier, data):
+        return self._insert(identifier, data, True)
+
+    def write_incomplete(self, identifier, not_completed):
+        """stores an incomplete result object"""
+        return self._insert(identifier, not_completed, False)
+
+    def add_file(self, path, make_unique=True, keep_suffix=True, cleanup=False):
+        """
+        Parameters
+        ----------
+        path : str
+            location of file to be added to the data store
+        keep_suffix : bool
+            new path will retain the suffix of the provided file
+        make_unique : bool
+            a successive number will be added to the name before the suffix
+            until the name is unique
+        cleanup : bool
+            delete the original
+        """
+        relativeid = self.make_relative_identifier(path)
+        relativeid = Path(relativeid)
+        path = Path(path)
+        if keep_suffix:
+            relativeid = str(relativeid).replace(
+                relativeid.suffix, "".join(path.suffixes)
+            )
+            relativeid = Path(relativeid)
+
+        suffixes = "".join(relativeid.suffixes)
+        new = str(relativeid)
+        num = 0
+        while make_unique and new in self:
+            num += 1
+            new = str(relativeid).replace(suffixes, f"-{num}{suffixes}")
+
+        data = path.read_text()
+        m = self.write(new, data)
+
+        if cleanup:
+            path.unlink()
+
+        return m
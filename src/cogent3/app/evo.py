@@ -1,11 +1,15 @@
 import os
 
+from math import sqrt
+
+from scitrack import get_text_hexdigest
 from tqdm import tqdm
 
 from cogent3 import load_tree, make_tree
 from cogent3.core.tree import TreeNode
 from cogent3.evolve.models import get_model
 from cogent3.util import misc, parallel
+from cogent3.util.deserialise import deserialise_object
 
 from .composable import (
     ALIGNED_TYPE,
@@ -87,7 +91,9 @@ class model(ComposableModel):
         opt_args
             arguments for the numerical optimiser, e.g.
             dict(max_restarts=5, tolerance=1e-6, max_evaluations=1000,
-            limit_action='ignore')
+            limit_action='ignore'). Use local_method='lbfgs' for the
+            gradient based local optimiser, which typically requires far
+            fewer likelihood evaluations than the default (Powell).
         split_codons : bool
             if True, incoming alignments are split into the 3 frames and each
             frame is fit separately
@@ -101,6 +107,14 @@ class model(ComposableModel):
         Calling an instance with an alignment returns a model_result instance
         with the optimised likelihood function. In the case of split_codons,
         the result object has a separate entry for each.
+
+        Notes
+        -----
+        Each alignment is fit with its own likelihood function, since the
+        result retains it. Constructing one is a small part of a fit, which
+        is dominated by numerical optimisation. To evaluate many alignments
+        at fixed parameter values in one stacked calculation, use the
+        get_log_likelihoods() method of a likelihood function.
         """
         super(model, self).__init__(
             input_types=self._input_types,
@@ -326,6 +340,35 @@ class hypothesis(ComposableHypothesis):
         return result
 
 
+# objects shared by all bootstrap replicates fitted in a process
+_bootstrap_state = {}
+
+
+def _init_bootstrap(hyp, null, source):
+    """stores the hypothesis and null model for this worker process"""
+    _bootstrap_state.update(hyp=hyp, null=null, source=source)
+
+
+def _bootstrap_replicate(rep_num):
+    """returns the hypothesis result for an alignment simulated from the
+    null, or None if fitting failed"""
+    sim_aln = _bootstrap_state["null"].simulate_alignment()
+    sim_aln.info.source = "%s - simalign %d" % (_bootstrap_state["source"], rep_num)
+
+    try:
+        sym_result = _bootstrap_state["hyp"](sim_aln)
+    except ValueError:
+        sym_result = None
+    return sym_result
+
+
+def _p_value_stderr(observed, null_dist):
+    """returns the estimated p-value and its standard error"""
+    num = len(null_dist)
+    p = (sum(lr >= observed for lr in null_dist) + 1) / (num + 1)
+    return p, sqrt(p * (1 - p) / num)
+
+
 class bootstrap(ComposableHypothesis):
     """Parametric bootstrap for a provided hypothesis. Returns a bootstrap_result."""
 
@@ -333,7 +376,51 @@ class bootstrap(ComposableHypothesis):
     _output_types = (RESULT_TYPE, BOOTSTRAP_RESULT_TYPE, SERIALISABLE_TYPE)
     _data_types = ("ArrayAlignment", "Alignment")
 
-    def __init__(self, hyp, num_reps, parallel=False, verbose=False):
+    def __init__(
+        self,
+        hyp,
+        num_reps,
+        parallel=False,
+        verbose=False,
+        checkpoint=None,
+        precision=None,
+        min_reps=10,
+        par_kw=None,
+    ):
+        """
+        Parameters
+        ----------
+        hyp : hypothesis
+            the hypothesis app
+        num_reps : int
+            maximum number of synthetic data sets
+        parallel : bool
+            replicates are fitted by a pool of worker processes, each of which
+            receives the hypothesis and null model once
+        verbose : bool
+            display progress
+        checkpoint : writable data store or None
+            each replicate result is written to this as it completes.
+            Replicates already present for the same source and hypothesis
+            are loaded instead of being repeated, so an interrupted run can
+            be resumed. Alignments without an info.source are identified by
+            their sequences.
+        precision : float or None
+            stop once the standard error of the estimated p-value is no
+            greater than precision
+        min_reps : int
+            minimum number of replicates before stopping early
+        par_kw : dict or None
+            arguments passed to parallel.as_completed, e.g. max_workers
+
+        Notes
+        -----
+        The hypothesis builds its likelihood functions afresh for every
+        replicate, in parallel too, so only the transfer of the apps to
+        the workers is saved. Building them is a small part of a fit, which
+        is dominated by numerical optimisation, and the replicate results
+        retain them.
+        """
         super(bootstrap, self).__init__(
             input_types=self._input_types,
             output_types=self._output_types,
@@ -344,17 +431,35 @@ class bootstrap(ComposableHypothesis):
         self._num_reps = num_reps
         self._verbose = verbose
         self._parallel = parallel
+        self._checkpoint = checkpoint
+        self._precision = precision
+        self._min_reps = max(min_reps, 1)
+        self._par_kw = par_kw or {}
         self.func = self.run
 
-    def _fit_sim(self, rep_num):
-        sim_aln = self._null.simulate_alignment()
-        sim_aln.info.source = "%s - simalign %d" % (self._inpath, rep_num)
-
-        try:
-            sym_result = self._hyp(sim_aln)
-        except ValueError:
-            sym_result = None
-        return sym_result
+    def _checkpoint_prefix(self, aln):
+        """returns the start of the checkpoint identifiers for aln, which
+        distinguishes the alignment and hypothesis"""
+        if aln.info.source:
+            prefix = self._checkpoint.make_relative_identifier(aln.info.source)
+            prefix = prefix[: -len(self._checkpoint.suffix) - 1]
+        else:
+            prefix = get_text_hexdigest(aln.to_fasta())[:12]
+        # the null is formatted by name only within the hypothesis
+        hyp = f"{self._hyp}\n{getattr(self._hyp, 'null', '')}"
+        return f"{prefix}-{get_text_hexdigest(hyp)[:12]}"
+
+    def _checkpoint_id(self, rep_num):
+        """returns the checkpoint identifier for a replicate"""
+        return f"{self._id_prefix}-rep{rep_num}.{self._checkpoint.suffix}"
+
+    def _settled(self, result):
+        """whether the p-value estimate has reached the requested precision"""
+        null_dist = result.null_dist
+        if self._precision is None or len(null_dist) < self._min_reps:
+            return False
+        _, stderr = _p_value_stderr(result.observed.LR, null_dist)
+        return stderr <= self._precision
 
     def run(self, aln):
         result = bootstrap_result(aln.info.source)
@@ -367,13 +472,54 @@ class bootstrap(ComposableHypothesis):
         self._null = obs.null
         self._inpath = aln.info.source
 
-        map_fun = map if not self._parallel else parallel.imap
-        sym_results = [r for r in map_fun(self._fit_sim, range(self._num_reps)) if r]
-        for sym_result in sym_results:
-            if not sym_result:
-                continue
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            self._id_prefix = self._checkpoint_prefix(aln)
+        todo = []
+        for rep_num in range(self._num_reps):
+            identifier = checkpoint is not None and self._checkpoint_id(rep_num)
+            if identifier and identifier in checkpoint:
+                data = checkpoint.read(identifier)
+                result.add_to_null(deserialise_object(data))
+            else:
+                todo.append(rep_num)
+
+        if self._settled(result):
+            return result
+
+        initargs = (self._hyp, self._null, self._inpath)
+        if self._parallel:
+            completed = parallel.as_completed(
+                _bootstrap_replicate,
+                todo,
+                initializer=_init_bootstrap,
+                initargs=initargs,
+                **self._par_kw,
+            )
+        else:
+            _init_bootstrap(*initargs)
+            completed = enumerate(map(_bootstrap_replicate, todo))
+
+        sym_results = completed
+        if self._verbose:
+            sym_results = tqdm(completed, total=len(todo))
+
+        try:
+            for index, sym_result in sym_results:
+                if not sym_result:
+                    continue
 
-            result.add_to_null(sym_result)
+                if checkpoint is not None:
+                    identifier = self._checkpoint_id(todo[index])
+                    checkpoint.write(identifier, sym_result.to_json())
+
+                result.add_to_null(sym_result)
+                if self._settled(result):
+                    break
+        finally:
+            if self._parallel:
+                completed.close()
+            _bootstrap_state.clear()
 
         return result
 
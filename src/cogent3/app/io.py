@@ -40,9 +40,11 @@ from .data_store import (
     RAISE,
     SKIP,
     ReadOnlyDirectoryDataStore,
+    ReadOnlySqliteDataStore,
     ReadOnlyTinyDbDataStore,
     ReadOnlyZippedDataStore,
     SingleReadDataStore,
+    WritableSqliteDataStore,
     WritableTinyDbDataStore,
     load_record_from_json,
     make_record_for_json,
@@ -93,9 +95,10 @@ def get_data_store(base_path, suffix=None, limit=None, verbose=False):
         the number of matches to return
     Returns
     -------
-    ReadOnlyDirectoryDataStore or ReadOnlyZippedDataStore
+    ReadOnlyDirectoryDataStore, ReadOnlyZippedDataStore,
+    ReadOnlyTinyDbDataStore or ReadOnlySqliteDataStore
     """
-    if base_path.endswith("tinydb"):
+    if base_path.endswith(("tinydb", "sqlitedb")):
         suffix = "json"
 
     if suffix is None:
@@ -109,6 +112,8 @@ def get_data_store(base_path, suffix=None, limit=None, verbose=False):
     zipped = zipfile.is_zipfile(base_path)
     if base_path.endswith("tinydb"):
         klass = ReadOnlyTinyDbDataStore
+    elif base_path.endswith("sqlitedb"):
+        klass = ReadOnlySqliteDataStore
     elif zipped:
         klass = ReadOnlyZippedDataStore
     else:
@@ -120,6 +125,14 @@ def get_data_store(base_path, suffix=None, limit=None, verbose=False):
 class _seq_loader:
     def __init__(self):
         self.func = self.load
+        self._lazy = False
+
+    def _load_lazy(self, path):
+        """returns lazily loaded sequences, or None if path is not suitable"""
+        try:
+            return _load_unaligned_seqs(str(path), moltype=self.moltype, lazy=True)
+        except (ValueError, OSError):
+            return None
 
     def load(self, path):
         """returns alignment"""
@@ -129,6 +142,10 @@ class _seq_loader:
         except AttributeError:
             abs_path = str(path)
 
+        seqs = self._load_lazy(abs_path) if self._lazy else None
+        if seqs is not None:
+            return seqs.degap()
+
         if type(path) == str:
             # we use a data store as it's read() handles compression
             path = SingleReadDataStore(path)[0]
@@ -185,7 +202,7 @@ class load_unaligned(ComposableSeq, _seq_loader):
     _output_types = (SEQUENCE_TYPE, SERIALISABLE_TYPE)
     _data_types = ("DataStoreMember", "str", "Path")
 
-    def __init__(self, moltype=None, format="fasta"):
+    def __init__(self, moltype=None, format="fasta", lazy=False):
         """
         Parameters
         ----------
@@ -193,6 +210,10 @@ class load_unaligned(ComposableSeq, _seq_loader):
             molecular type, string or instance
         format : str
             sequence file format
+        lazy : bool
+            if True, uncompressed FASTA files are indexed and the returned
+            collection only reads sequences from file when they are accessed.
+            Other inputs are loaded as usual.
         """
         super(ComposableSeq, self).__init__(
             input_types=self._input_types,
@@ -205,6 +226,7 @@ class load_unaligned(ComposableSeq, _seq_loader):
             moltype = get_moltype(moltype)
         self.moltype = moltype
         self._parser = PARSERS[format.lower()]
+        self._lazy = lazy and self._parser is PARSERS["fasta"]
 
 
 class load_tabular(ComposableTabular):
@@ -515,8 +537,8 @@ class write_json(_checkpointable):
 
 
 class load_db(Composable):
-    """Loads json serialised cogent3 objects from a TinyDB file. 
-    Returns whatever object type was stored."""
+    """Loads json or binary serialised cogent3 objects from a TinyDB or SQLite
+    data store. Returns whatever object type was stored."""
 
     _type = "output"
 
@@ -530,11 +552,11 @@ class load_db(Composable):
         self.func = self.read
 
     def read(self, identifier):
-        """returns object deserialised from a TinyDb"""
+        """returns object deserialised from a db data store"""
         id_ = getattr(identifier, "id", None)
         if id_ is None:
             msg = (
-                f"{identifier} not connected to a TinyDB. "
+                f"{identifier} not connected to a TinyDB or SQLite data store. "
                 "If a json file path, use io.load_json()"
             )
             raise TypeError(msg)
@@ -553,7 +575,8 @@ class load_db(Composable):
 
 
 class write_db(_checkpointable):
-    """Writes json serialised objects to a TinyDB instance."""
+    """Writes json, or binary, serialised objects to a TinyDB or SQLite data
+    store."""
 
     _type = "output"
 
@@ -561,8 +584,45 @@ class write_db(_checkpointable):
     _output_types = (IDENTIFIER_TYPE, SERIALISABLE_TYPE)
 
     def __init__(
-        self, data_path, name_callback=None, create=False, if_exists=SKIP, suffix="json"
+        self,
+        data_path,
+        name_callback=None,
+        create=False,
+        if_exists=SKIP,
+        suffix="json",
+        compress=None,
+        serialiser="json",
     ):
+        """
+        Parameters
+        ----------
+        data_path
+            path to the data store. If it ends with '.sqlitedb', a SQLite
+            data store is used, otherwise a TinyDB.
+        name_callback
+            function that takes the data object and returns a base
+            file name
+        create : bool
+            whether to create the data_path reference
+        if_exists : str
+            behaviour if output exists. Either 'skip', 'raise' (raises an
+            exception), 'overwrite', 'ignore'
+        suffix : str
+            suffix of stored records
+        compress : str
+            compression of stored records, only applies to SQLite. Either
+            'zlib' or 'zstd' (requires the zstandard package).
+        serialiser : str
+            serialisation of stored records, either 'json' or 'binary'. The
+            latter stores numerical data as raw buffers giving smaller stores
+            that are faster to load. Only applies to SQLite.
+        """
+        sqlite = str(data_path).endswith(f".{WritableSqliteDataStore.store_suffix}")
+        if compress and not sqlite:
+            raise ValueError("compress only supported by SQLite data stores")
+        if serialiser != "json" and not sqlite:
+            raise ValueError("serialiser only supported by SQLite data stores")
+        writer_class = WritableSqliteDataStore if sqlite else WritableTinyDbDataStore
         super(write_db, self).__init__(
             input_types=self._input_types,
             output_types=self._output_types,
@@ -571,8 +631,13 @@ class write_db(_checkpointable):
             create=create,
             if_exists=if_exists,
             suffix=suffix,
-            writer_class=WritableTinyDbDataStore,
+            writer_class=writer_class,
         )
+        if compress:
+            self.data_store.compress = compress
+        if sqlite:
+            self.data_store.serialiser = serialiser
+        self._serialiser = serialiser
         self.func = self.write
 
     def _set_checkpoint_loader(self):
@@ -582,10 +647,14 @@ class write_db(_checkpointable):
         if identifier is None:
             identifier = self._make_output_identifier(data)
         # todo revisit this when we establish immutability behaviour of database
-        try:
-            out = data.to_json()
-        except AttributeError:
-            out = json.dumps(data)
+        if self._serialiser == "binary":
+            # the data store does the encoding
+            out = data
+        else:
+            try:
+                out = data.to_json()
+            except AttributeError:
+                out = json.dumps(data)
         stored = self.data_store.write(identifier, out)
         # todo is anything actually using this stored attriubte? if not, delete this
         #  code and all other cases
@@ -25,6 +25,7 @@ import re
 import warnings
 
 from collections import Counter, defaultdict
+from collections.abc import Mapping
 from copy import copy, deepcopy
 from functools import total_ordering
 from itertools import combinations
@@ -64,6 +65,7 @@ from cogent3.format.fasta import alignment_to_fasta
 from cogent3.format.nexus import nexus_from_alignment
 from cogent3.format.phylip import alignment_to_phylip
 from cogent3.maths.stats.number import CategoryCounter
+from cogent3.parse.fasta_index import IndexedFasta
 from cogent3.parse.gff import gff_parser
 from cogent3.util import progress_display as UI
 from cogent3.util.dict_array import DictArrayTemplate
@@ -105,6 +107,10 @@ class DataError(Exception):
 # default number of gaps to allow in a column.
 eps = 1e-6
 
+# maximum number of array elements processed at a time by ArrayAlignment
+# methods that iterate over blocks of positions
+_POSITION_CHUNK_ELEMENTS = 2 ** 24
+
 
 # factory functions for identifying whether character set conditions are satsified
 
@@ -1707,6 +1713,7 @@ class _SequenceCollectionBase:
         width=500,
         title=None,
         rc=False,
+        seed_length=None,
         show_progress=False,
     ):
         """make a dotplot between specified sequences. Random sequences
@@ -1731,6 +1738,12 @@ class _SequenceCollectionBase:
         rc : bool or None
             include dotplot of reverse compliment also. Only applies to Nucleic
             acids moltypes
+        seed_length : int, "auto" or None
+            length of identical words from which matches are extended. If None,
+            the longest that finds every match, so the result is that of an
+            exhaustive comparison, unless that has too many word hits (see
+            cogent3.align.pycompare.seeded_dotplot). "auto" uses longer words
+            on long sequences, which is faster but can miss weak matches.
         Returns
         -------
         a Drawable or AnnotatedDrawable
@@ -1780,6 +1793,7 @@ class _SequenceCollectionBase:
             title=title,
             moltype=self.moltype,
             rc=rc,
+            seed_length=seed_length,
             show_progress=show_progress,
             width=width,
         )
@@ -2026,6 +2040,226 @@ class SequenceCollection(_SequenceCollectionBase):
             seq.annotate_from_gff(seq_dict[seq_id], pre_parsed=True)
 
 
+class _IndexedSeqs(Mapping):
+    """{name: seq} where sequences are read from an IndexedFasta on first access"""
+
+    def __init__(self, index, name_map, moltype, degap=False, cache=None):
+        self._index = index
+        # {name in collection: name in index}
+        self._name_map = name_map
+        self._moltype = moltype
+        self._degap = degap
+        self._cache = {} if cache is None else cache
+
+    def __getitem__(self, name):
+        if name in self._cache:
+            return self._cache[name]
+
+        seq = self._index.get_seq(self._name_map[name])
+        seq = self._moltype.make_seq(seq, name=name)
+        if self._degap:
+            seq = seq.degap()
+        self._cache[name] = seq
+        return seq
+
+    def __iter__(self):
+        return iter(self._name_map)
+
+    def __len__(self):
+        return len(self._name_map)
+
+    def __contains__(self, name):
+        return name in self._name_map
+
+    def get_length(self, name):
+        """length of the named sequence, without reading it if possible"""
+        if self._degap:
+            return len(self[name])
+        return self._index.get_length(self._name_map[name])
+
+    def close(self):
+        """closes the indexed file"""
+        self._index.close()
+
+    def subset(self, names, degap=None):
+        """returns new instance restricted to names, sharing the index"""
+        degap = self._degap if degap is None else degap
+        name_map = {n: self._name_map[n] for n in names}
+        cache = (
+            {}
+            if degap != self._degap
+            else {n: self._cache[n] for n in names if n in self._cache}
+        )
+        return self.__class__(self._index, name_map, self._moltype, degap, cache)
+
+
+class IndexedSequenceCollection(SequenceCollection):
+    """SequenceCollection whose sequences are read from an indexed FASTA file
+    when first accessed
+
+    Selecting sequences (take_seqs) or degapping returns a new instance that
+    shares the index, so only the sequences used are ever read. Construction
+    from any other data type produces an ordinary, in memory, collection.
+    """
+
+    def __init__(
+        self,
+        data,
+        names=None,
+        moltype=None,
+        name=None,
+        info=None,
+        label_to_name=None,
+        degap=False,
+        **kwargs,
+    ):
+        """
+        Parameters
+        ----------
+        data
+            an IndexedFasta instance, or any data type accepted by
+            SequenceCollection
+        names
+            names of sequences to include, defaults to all. Applies after
+            label_to_name.
+        moltype
+            moltype to be applied to the sequences
+        name
+            name of the collection
+        info
+            info object to be attached to the collection
+        label_to_name
+            if present, converts name into f(name)
+        degap : bool
+            whether sequences are degapped after being read
+        kwargs
+            passed to SequenceCollection if data is not an IndexedFasta
+        """
+        if not isinstance(data, IndexedFasta):
+            self._indexed = False
+            super(IndexedSequenceCollection, self).__init__(
+                data,
+                names=names,
+                moltype=moltype,
+                name=name,
+                info=info,
+                label_to_name=label_to_name,
+                **kwargs,
+            )
+            return
+
+        self._indexed = True
+        self.name = name
+        self.alphabet, self.moltype = self._get_alphabet_and_moltype(None, moltype, ())
+        if not isinstance(info, InfoClass):
+            info = InfoClass(info) if info else InfoClass()
+        self.info = info
+        if self.info.get("source", None) in (None, "unknown"):
+            self.info["source"] = data.filename
+
+        label_to_name = label_to_name or str
+        name_map = {}
+        for label in data.names:
+            new_name = label_to_name(label)
+            if new_name in name_map:
+                raise ValueError(f"duplicate sequence name '{new_name}'")
+            name_map[new_name] = label
+
+        if names is not None:
+            missing = set(names) - set(name_map)
+            if missing:
+                raise ValueError(f"sequences not in file: {sorted(missing)}")
+            name_map = {n: name_map[n] for n in names}
+
+        self.names = list(name_map)
+        self.named_seqs = _IndexedSeqs(data, name_map, self.moltype, degap=degap)
+        self._repr_policy = dict(num_seqs=10, num_pos=60, ref_name="longest")
+
+    def _from_named_seqs(self, named_seqs):
+        """returns new instance using named_seqs, which shares our index"""
+        result = self.__class__.__new__(self.__class__)
+        result.__dict__.update(self.__dict__)
+        result.named_seqs = named_seqs
+        result.names = list(named_seqs)
+        result._repr_policy = dict(self._repr_policy)
+        return result
+
+    @property
+    def seq_len(self):
+        if not self._indexed:
+            return self._seq_len
+        get_length = self.named_seqs.get_length
+        return max([get_length(n) for n in self.names], default=0)
+
+    @seq_len.setter
+    def seq_len(self, value):
+        self._seq_len = value
+
+    @property
+    def seq_data(self):
+        if not self._indexed:
+            return self._seq_data
+        return self.seqs
+
+    @seq_data.setter
+    def seq_data(self, value):
+        self._seq_data = value
+
+    def close(self):
+        """closes the indexed file, shared with instances derived from this
+        one. It is reopened if sequences not yet read are accessed."""
+        if self._indexed:
+            self.named_seqs.close()
+
+    def copy(self):
+        """Returns copy of self, sequences already read are shared."""
+        if not self._indexed:
+            return super(IndexedSequenceCollection, self).copy()
+        return self._from_named_seqs(self.named_seqs.subset(self.names))
+
+    def take_seqs(self, seqs, negate=False, **kwargs):
+        """Returns new collection containing only specified seqs.
+
+        Unless kwargs are provided, the result shares the file index and
+        only the selected sequences will be read.
+        """
+        if not self._indexed or kwargs:
+            return super(IndexedSequenceCollection, self).take_seqs(
+                seqs, negate=negate, **kwargs
+            )
+
+        if type(seqs) == str:
+            seqs = [seqs]
+        if negate:
+            exclude = set(seqs)
+            seqs = [n for n in self.names if n not in exclude]
+        else:
+            seqs = list(seqs)
+            # KeyError for names not present, as for SequenceCollection
+            for n in seqs:
+                if n not in self.named_seqs:
+                    raise KeyError(n)
+
+        if not seqs:
+            return {}  # safe value; can't construct empty alignment
+        return self._from_named_seqs(self.named_seqs.subset(seqs))
+
+    def degap(self, **kwargs):
+        """Returns copy in which sequences have no gaps."""
+        if not self._indexed or kwargs:
+            return super(IndexedSequenceCollection, self).degap(**kwargs)
+        return self._from_named_seqs(self.named_seqs.subset(self.names, degap=True))
+
+    def to_rich_dict(self):
+        """returns detailed content including info and moltype attributes
+
+        The type is recorded as a SequenceCollection, as the sequences are
+        included in the result."""
+        data = super(IndexedSequenceCollection, self).to_rich_dict()
+        data["type"] = f"{SequenceCollection.__module__}.SequenceCollection"
+        return data
+
+
 @total_ordering
 class Aligned(object):
     """One sequence in an alignment, a map between alignment coordinates and
@@ -3087,7 +3321,14 @@ class AlignmentI(object):
         new = klass(data=data, moltype=moltype, info=self.info, names=self.names)
         return new
 
-    def distance_matrix(self, calc="percent", show_progress=False, drop_invalid=False):
+    def distance_matrix(
+        self,
+        calc="percent",
+        show_progress=False,
+        drop_invalid=False,
+        parallel=False,
+        par_kw=None,
+    ):
         """Returns pairwise distances between sequences.
 
         Parameters
@@ -3101,6 +3342,11 @@ class AlignmentI(object):
             If True, sequences for which a pairwise distance could not be
             calculated are excluded. If False, an ArithmeticError is raised if
             a distance could not be computed on observed data.
+        parallel : bool
+            tiles of the distance matrix are computed in parallel
+        par_kw
+            dict of values for configuring parallel execution, see
+            cogent3.util.parallel.imap
         """
         from cogent3.evolve.fast_distance import get_distance_calculator
 
@@ -3111,7 +3357,9 @@ class AlignmentI(object):
                 alignment=self,
                 invalid_raises=not drop_invalid,
             )
-            calculator.run(show_progress=show_progress)
+            calculator.run(
+                show_progress=show_progress, parallel=parallel, par_kw=par_kw
+            )
         except ArithmeticError:
             msg = "not all pairwise distances could be computed, try drop_invalid=True"
             raise ArithmeticError(msg)
@@ -3474,6 +3722,27 @@ def aln_from_array_seqs(seqs, array_type=None, alphabet=None):
     return result, names
 
 
+def aln_from_index_arrays(seqs, array_type=None, alphabet=None):
+    """Alignment from series of (name, indices) pairs.
+
+    This is an InputHandler for Alignment. The indices are arrays of
+    sequence characters already converted to their index in the alphabet,
+    e.g. as produced by cogent3.parse.fasta.iter_fasta_indices. All
+    sequences must be the same length.
+    """
+    data, names = [], []
+    for name, indices in seqs:
+        data.append(indices)
+        names.append(name)
+
+    _one_length(data)
+
+    result = vstack(data)
+    if array_type:
+        result = result.astype(array_type, copy=False)
+    return result, names
+
+
 def aln_from_generic(data, array_type=None, alphabet=None):
     """Alignment from generic seq x pos data: sequence of sequences of chars.
 
@@ -3665,7 +3934,10 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         """
         kwargs["suppress_named_seqs"] = True
         super(ArrayAlignment, self).__init__(*args, **kwargs)
-        self.array_positions = transpose(self.seq_data.astype(self.alphabet.array_type))
+        # copy=False so memory mapped data is not read into memory
+        self.array_positions = transpose(
+            self.seq_data.astype(self.alphabet.array_type, copy=False)
+        )
         self.array_seqs = transpose(self.array_positions)
         self.seq_data = self.array_seqs
         self.seq_len = len(self.array_positions)
@@ -3809,6 +4081,193 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             seqs,
         )
 
+    def write(self, filename=None, format=None, **kwargs):
+        """Write the alignment to a file, preserving order of sequences.
+
+        Parameters
+        ----------
+        filename
+            name of the sequence file
+        format
+            format of the sequence file. The 'c3aln' binary format can be
+            loaded as a memory mapped alignment, see
+            cogent3.core.binary_alignment.
+
+        Notes
+        -----
+
+        If format is None, will attempt to infer format from the filename
+        suffix.
+        """
+        from cogent3.core.binary_alignment import (
+            BINARY_SUFFIX,
+            write_binary_alignment,
+        )
+        from cogent3.parse.sequence import format_from_filename
+
+        if filename is not None and (
+            format_from_filename(filename, format) == BINARY_SUFFIX
+        ):
+            write_binary_alignment(self, filename)
+            return
+
+        super(ArrayAlignment, self).write(filename=filename, format=format, **kwargs)
+
+    def _iter_position_chunks(self, motif_length=1):
+        """yields (start, end) motif indices of blocks of positions
+
+        Blocks are sized so that operating on a block of self.array_seqs
+        requires bounded memory, important when array_seqs is memory mapped.
+        """
+        num_motifs = len(self) // motif_length
+        per_motif = max(self.num_seqs * motif_length, 1)
+        step = max(1, _POSITION_CHUNK_ELEMENTS // per_motif)
+        for start in range(0, num_motifs, step):
+            yield start, min(start + step, num_motifs)
+
+    def counts_per_pos(
+        self, motif_length=1, include_ambiguity=False, allow_gap=False, alert=False
+    ):
+        """return DictArray of counts per position
+
+        Parameters
+        ----------
+
+        alert
+            warns if motif_length > 1 and alignment trimmed to produce
+            motif columns
+        """
+        length = (len(self) // motif_length) * motif_length
+        if alert and len(self) != length:
+            warnings.warn(f"trimmed {len(self) - length}", UserWarning)
+
+        alpha = self.moltype.alphabet.get_word_alphabet(motif_length)
+        num_states = len(self.alphabet)
+        num_codes = num_states ** motif_length
+        weights = num_states ** arange(motif_length - 1, -1, -1, dtype=numpy.int64)
+        positions, codes, counts = [], [], []
+        for start, end in self._iter_position_chunks(motif_length):
+            data = self.array_seqs[:, start * motif_length : end * motif_length]
+            data = data.astype(numpy.int64).reshape(
+                (self.num_seqs, end - start, motif_length)
+            )
+            motif_codes = (data * weights).sum(axis=2)
+            motif_codes += arange(start, end, dtype=numpy.int64) * num_codes
+            combined, count = numpy.unique(motif_codes, return_counts=True)
+            positions.append(combined // num_codes)
+            codes.append(combined % num_codes)
+            counts.append(count)
+
+        if positions:
+            positions = numpy.concatenate(positions)
+            codes = numpy.concatenate(codes)
+            counts = numpy.concatenate(counts)
+        else:
+            positions = codes = counts = array([], dtype=int)
+
+        def code_to_motif(code):
+            chars = []
+            for _ in range(motif_length):
+                code, index = divmod(code, num_states)
+                chars.append(self.alphabet[index])
+            return "".join(reversed(chars))
+
+        observed = {code: code_to_motif(code) for code in numpy.unique(codes).tolist()}
+        if allow_gap or include_ambiguity:
+            all_motifs = set(observed.values())
+            if all_motifs:
+                alpha += tuple(sorted(set(alpha) ^ all_motifs))
+
+        motif_index = defaultdict(list)
+        for i, motif in enumerate(alpha):
+            motif_index[motif].append(i)
+
+        result = zeros((length // motif_length, len(alpha)), dtype=int)
+        for code, motif in observed.items():
+            if motif not in motif_index:
+                continue
+            selected = codes == code
+            for column in motif_index[motif]:
+                result[positions[selected], column] = counts[selected]
+
+        if not result.any():
+            # MotifCountsArray rejects an all zero array, but not rows of zeros
+            result = result.tolist()
+        result = MotifCountsArray(result, alpha)
+        return result
+
+    def take_positions(self, cols, negate=False):
+        """Returns new ArrayAlignment containing only specified positions.
+
+        Parameters
+        ----------
+        cols
+            series of position indices
+        negate : bool
+            if True, all positions except cols are returned
+        """
+        if negate:
+            keep = ones(len(self), dtype=bool)
+            keep[list(cols)] = False
+            cols = nonzero(keep)[0]
+        data = self.array_seqs.take(list(cols), axis=1)
+        result = self.__class__(
+            data,
+            force_same_data=True,
+            moltype=self.moltype,
+            info=self.info,
+            names=self.names,
+        )
+        return result
+
+    def omit_gap_pos(self, allowed_gap_frac=1 - eps, motif_length=1):
+        """Returns new alignment where all cols (motifs) have <= allowed_gap_frac gaps.
+
+        Parameters
+        ----------
+        allowed_gap_frac
+            specifies proportion of gaps is allowed in each
+            column (default is just < 1, i.e. only cols with at least one gap
+            character are preserved). Set to 1 - e-6 to exclude strictly gapped
+            columns.
+        motif_length
+            set's the "column" width, e.g. setting to 3
+            corresponds to codons. A motif that includes a gap at any position
+            is included in the counting. Default is 1.
+
+        """
+        try:
+            alpha = self.moltype.alphabets.degen_gapped
+        except:
+            alpha = self.moltype.alphabet
+
+        gaps = list(map(alpha.index, self.moltype.gaps))
+        denominator = self.num_seqs * motif_length
+        keep = numpy.zeros(len(self) // motif_length, dtype=bool)
+        for start, end in self._iter_position_chunks(motif_length):
+            data = self.array_seqs[:, start * motif_length : end * motif_length]
+            num_gaps = numpy.isin(data, gaps).reshape(
+                (self.num_seqs, end - start, motif_length)
+            )
+            num_gaps = num_gaps.sum(axis=(0, 2))
+            keep[start:end] = num_gaps / denominator <= allowed_gap_frac
+
+        if not keep.any():
+            return None
+
+        # a boolean mask of positions, any incomplete trailing motif excluded
+        keep = numpy.repeat(keep, motif_length)
+        keep = numpy.append(keep, numpy.zeros(len(self) - len(keep), dtype=bool))
+        data = self.array_seqs.compress(keep, axis=1)
+        result = self.__class__(
+            data,
+            force_same_data=True,
+            moltype=self.moltype,
+            info=self.info,
+            names=self.names,
+        )
+        return result
+
     def iupac_consensus(self, alphabet=None):
         """Returns string containing IUPAC consensus sequence of the alignment.
         """
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""A binary on-disk format for ArrayAlignment that supports memory mapping.
+
+The file consists of a fixed size header, the alignment as a raw (num_seqs,
+num_positions) array of alphabet indices in row (sequence) major order,
+followed by JSON metadata. The header holds a magic string plus the offset
+and size of the metadata. Because the array is stored uncompressed, it can be
+used via numpy.memmap without reading it into memory.
+"""
+import json
+import struct
+
+import numpy
+
+from cogent3.core.moltype import get_moltype
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+BINARY_SUFFIX = "c3aln"
+
+_MAGIC = b"C3ALN\x00"
+_FORMAT_VERSION = 1
+# magic, format version, metadata offset, metadata size
+_HEADER = struct.Struct("<6sHQQ")
+# the array starts at this offset, which keeps it aligned
+_DATA_OFFSET = 64
+
+
+def _get_alphabet(moltype):
+    """the alphabet used by ArrayAlignment for moltype"""
+    try:
+        alphabet = moltype.alphabets.degen_gapped
+    except AttributeError:
+        alphabet = moltype.alphabet
+    return alphabet
+
+
+def _make_char_validator(alphabet):
+    """returns a boolean array indexed by byte value, True if valid"""
+    valid = numpy.zeros(256, dtype=bool)
+    for char in alphabet:
+        valid[ord(char)] = True
+    return valid
+
+
+def _seq_to_indices(seq, alphabet, valid):
+    """converts a sequence into an array of alphabet indices"""
+    if isinstance(seq, numpy.ndarray):
+        return seq.astype(alphabet.array_type, copy=False)
+
+    if isinstance(seq, bytes):
+        seq = seq.decode("utf-8")
+    seq = str(seq)
+    if not valid[numpy.frombuffer(seq.encode("utf-8"), dtype=numpy.uint8)].all():
+        raise ValueError(f"sequence contains characters not in {alphabet}")
+    return alphabet.from_string(seq).astype(alphabet.array_type, copy=False)
+
+
+def _json_safe_info(info):
+    """returns the members of info that can be stored as json"""
+    result = {}
+    for key, value in dict(info or {}).items():
+        try:
+            json.dumps(value)
+        except TypeError:
+            continue
+        result[key] = value
+    return result
+
+
+def write_binary_alignment(data, filename, moltype=None):
+    """writes aligned sequences to filename in the binary alignment format
+
+    Parameters
+    ----------
+    data
+        an ArrayAlignment, or a series of (name, seq) pairs. The latter is
+        consumed one sequence at a time so that, for example, records from a
+        parser can be converted without holding the alignment in memory.
+    filename : str
+        path to write to
+    moltype
+        the moltype of the sequences, defaults to data.moltype if present
+
+    Returns
+    -------
+    the shape of the written array
+    """
+    from cogent3.core.alignment import ArrayAlignment
+
+    if isinstance(data, ArrayAlignment):
+        moltype = data.moltype if moltype is None else moltype
+        records = zip(data.names, data.array_seqs)
+        info = _json_safe_info(data.info)
+    else:
+        moltype = getattr(data, "moltype", moltype)
+        records = data.items() if hasattr(data, "items") else data
+        info = {}
+
+    moltype = get_moltype(moltype or "bytes")
+    alphabet = _get_alphabet(moltype)
+    valid = _make_char_validator(alphabet)
+    names = []
+    length = None
+    with open(filename, "wb") as outfile:
+        outfile.write(b"\x00" * _DATA_OFFSET)
+        for name, seq in records:
+            indices = _seq_to_indices(seq, alphabet, valid)
+            if length is None:
+                length = len(indices)
+            elif len(indices) != length:
+                raise ValueError("not all sequences have same length")
+            names.append(str(name))
+            outfile.write(indices.tobytes())
+
+        metadata = dict(
+            names=names,
+            shape=[len(names), length or 0],
+            dtype=numpy.dtype(alphabet.array_type).str,
+            moltype=moltype.label,
+            info=info,
+        )
+        metadata = json.dumps(metadata).encode("utf-8")
+        offset = outfile.tell()
+        outfile.write(metadata)
+        outfile.seek(0)
+        outfile.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, offset, len(metadata)))
+
+    return len(names), length or 0
+
+
+def _read_metadata(filename):
+    """returns the metadata dict from a binary alignment file"""
+    with open(filename, "rb") as infile:
+        magic, version, offset, size = _HEADER.unpack(infile.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"'{filename}' is not a binary alignment file")
+        if version > _FORMAT_VERSION:
+            raise ValueError(f"unsupported binary alignment version {version}")
+        infile.seek(offset)
+        metadata = json.loads(infile.read(size).decode("utf-8"))
+    return metadata
+
+
+def load_binary_alignment(
+    filename, mmap=True, moltype=None, info=None, label_to_name=None
+):
+    """loads an ArrayAlignment from a binary alignment file
+
+    Parameters
+    ----------
+    filename : str
+        path to a file written by write_binary_alignment
+    mmap : bool
+        if True, the alignment array is a read-only numpy.memmap of the
+        file, otherwise it's read into memory
+    moltype
+        overrides the moltype stored in the file, must have the same
+        alphabet
+    info
+        info object to be attached to the alignment, defaults to the stored
+        info. It is copied, not modified.
+    label_to_name
+        function for converting the stored names into others
+
+    Returns
+    -------
+    ArrayAlignment
+    """
+    from cogent3.core.alignment import ArrayAlignment
+
+    metadata = _read_metadata(filename)
+    stored = get_moltype(metadata["moltype"])
+    moltype = stored if moltype is None else get_moltype(moltype)
+    if tuple(_get_alphabet(moltype)) != tuple(_get_alphabet(stored)):
+        raise ValueError(
+            f"moltype {moltype.label!r} incompatible with stored "
+            f"{stored.label!r} alphabet"
+        )
+
+    shape = tuple(metadata["shape"])
+    dtype = numpy.dtype(metadata["dtype"])
+    if mmap:
+        data = numpy.memmap(
+            filename, dtype=dtype, mode="r", offset=_DATA_OFFSET, shape=shape
+        )
+    else:
+        with open(filename, "rb") as infile:
+            infile.seek(_DATA_OFFSET)
+            data = numpy.fromfile(infile, dtype=dtype, count=shape[0] * shape[1])
+        data = data.reshape(shape)
+
+    info = metadata.get("info") if info is None else info
+    info = dict(info or {})
+    if info.get("source") in (None, "unknown"):
+        info["source"] = filename
+    names = metadata["names"]
+    if label_to_name:
+        names = [label_to_name(n) for n in names]
+    result = ArrayAlignment(
+        data, names=names, moltype=moltype, info=info, force_same_data=True,
+    )
+    return result
@@ -1,4 +1,4 @@
-from cogent3.align.align import dotplot
+from cogent3.align.pycompare import seeded_dotplot
 from cogent3.core.moltype import get_moltype
 from cogent3.draw.drawable import Drawable
 from cogent3.util.union_dict import UnionDict
@@ -75,9 +75,22 @@ def _convert_coords_for_scatter(coords):
 
 
 def get_dotplot_coords(
-    seq1, seq2, window=20, threshold=None, min_gap=0, rc=None, show_progress=False
+    seq1,
+    seq2,
+    window=20,
+    threshold=None,
+    min_gap=0,
+    rc=None,
+    seed_length=None,
+    show_progress=False,
 ):
-    """returns coordinates for forward / reverse strand"""
+    """returns coordinates for forward / reverse strand
+
+    Notes
+    -----
+    Matches are extended from identical words of seed_length, see
+    cogent3.align.pycompare.seeded_dotplot
+    """
     (len1, len2) = len(seq1), len(seq2)
     if threshold is None:
         universe = (len1 - window) * (len2 - window)
@@ -85,23 +98,25 @@ def get_dotplot_coords(
         threshold = suitable_threshold(window, acceptable_noise / universe)
 
     key = (window, threshold, min_gap)
-    fwd = dotplot(
+    fwd = seeded_dotplot(
         str(seq1),
         str(seq2),
         window,
         threshold,
         min_gap,
         None,
+        seed_length=seed_length,
         show_progress=show_progress,
     )
     if hasattr(seq1, "reverse_complement") and rc:
-        rev = dotplot(
+        rev = seeded_dotplot(
             str(seq1.reverse_complement()),
             str(seq2),
             window,
             threshold,
             min_gap,
             None,
+            seed_length=seed_length,
             show_progress=show_progress,
         )
         rev = [((len1 - x1, y1), (len1 - x2, y2)) for ((x1, y1), (x2, y2)) in rev]
@@ -164,6 +179,7 @@ class Dotplot(Drawable):
         threshold=None,
         min_gap=0,
         rc=False,
+        seed_length=None,
         xtitle=None,
         ytitle=None,
         title=None,
@@ -187,6 +203,12 @@ class Dotplot(Drawable):
         rc : bool or None
             include dotplot of reverse compliment also. Only applies to Nucleic
             acids moltypes
+        seed_length : int, "auto" or None
+            length of identical words from which matches are extended. If None,
+            the longest that finds every match, so the result is that of an
+            exhaustive comparison, unless that has too many word hits (see
+            cogent3.align.pycompare.seeded_dotplot). "auto" uses longer words
+            on long sequences, which is faster but can miss weak matches.
         xtitle, ytitle
             name of the seq1, seq2. None if included as part of a
             AnnotatedDrawable
@@ -235,6 +257,7 @@ class Dotplot(Drawable):
             threshold=threshold,
             min_gap=min_gap,
             rc=rc,
+            seed_length=seed_length,
             show_progress=show_progress,
         )
         self._fwd = fwd
@@ -5,11 +5,13 @@ include "../../include/numerical_pyrex.pyx"
 version_info = (2, 2)
 __version__ = "('2019', '12', '6a')"
 
-cdef extern from "math.h":
+cdef extern from "math.h" nogil:
     double log (double x)
 
 
 def sum_input_likelihoods(child_indexes, Double2D result, likelihoods):
+    # The GIL is released while multiplying, so different rows of result
+    # can be computed concurrently in separate threads
     cdef int M, S, U, C, motif, parent_col, child_col, child
     cdef Double2D plhs
     cdef Long1D index
@@ -26,18 +28,37 @@ def sum_input_likelihoods(child_indexes, Double2D result, likelihoods):
         U = 0
         checkArray1D(index, &S)
         checkArray2D(plhs, &U, &M)
-        if child == 0:
-            for parent_col in range(S):
-                child_col = index[parent_col]
-                for motif in range(M):
-                    result[parent_col, motif] = plhs[child_col, motif]
-        else:
-            for parent_col in range(S):
-                child_col = index[parent_col]
-                for motif in range(M):
-                    result[parent_col, motif] *= plhs[child_col, motif]
+        with nogil:
+            if child == 0:
+                for parent_col in range(S):
+                    child_col = index[parent_col]
+                    for motif in range(M):
+                        result[parent_col, motif] = plhs[child_col, motif]
+            else:
+                for parent_col in range(S):
+                    child_col = index[parent_col]
+                    for motif in range(M):
+                        result[parent_col, motif] *= plhs[child_col, motif]
     return result
     
+def min_row_sum(Double2D likelihoods):
+    # The smallest of the sums of the rows, for the underflow check
+    cdef int S, M, col, motif
+    cdef double row_sum, lowest
+    
+    S = M = 0
+    checkArray2D(likelihoods, &S, &M)
+    
+    lowest = 1.0e300
+    with nogil:
+        for col in range(S):
+            row_sum = 0.0
+            for motif in range(M):
+                row_sum += likelihoods[col, motif]
+            if row_sum < lowest:
+                lowest = row_sum
+    return lowest
+
 def get_total_log_likelihood(Double1D counts, Double2D input_likelihoods, Double1D mprobs):
     cdef int S, M, col, motif
     cdef double posn, total
@@ -49,11 +70,12 @@ def get_total_log_likelihood(Double1D counts, Double2D input_likelihoods, Double
     checkArray2D(input_likelihoods, &S, &M)
     
     total = 0.0
-    for col in range(S):
-        posn = 0.0
-        for motif in range(M):
-            posn += input_likelihoods[col, motif] * mprobs[motif]
-        total += log(posn)*counts[col]
+    with nogil:
+        for col in range(S):
+            posn = 0.0
+            for motif in range(M):
+                posn += input_likelihoods[col, motif] * mprobs[motif]
+            total += log(posn)*counts[col]
     return total
 
 def get_log_sum_across_sites(Double1D counts, Double1D input_likelihoods):
@@ -65,8 +87,9 @@ def get_log_sum_across_sites(Double1D counts, Double1D input_likelihoods):
     checkArray1D(input_likelihoods, &S)
     
     total = 0.0
-    for col in range(S):
-        total += log(input_likelihoods[col])*counts[col]
+    with nogil:
+        for col in range(S):
+            total += log(input_likelihoods[col])*counts[col]
     return total
 
 def log_dot_reduce(Long1D index, object patch_probs, Double2D switch_probs, Double2D plhs):
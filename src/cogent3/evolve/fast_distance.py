@@ -1,3 +1,8 @@
+import multiprocessing
+import os
+import tempfile
+import warnings
+
 from collections import defaultdict, namedtuple
 from numbers import Number
 
@@ -7,7 +12,7 @@ from numpy import array, diag, dot, eye, float64, int32, log, sqrt, zeros
 from numpy.linalg import LinAlgError, det, inv, norm
 
 from cogent3 import DNA, RNA, get_moltype
-from cogent3.util.dict_array import DictArray
+from cogent3.util.dict_array import DictArray, DictArrayTemplate
 from cogent3.util.misc import get_object_provenance
 from cogent3.util.progress_display import display_wrap
 
@@ -268,6 +273,303 @@ def _logdet(matrix, use_tk_adjustment=True):
     return total, p, d_xy, var
 
 
+def _fill_diversity_matrices(indexed_seqs, index1, index2, dim):
+    """returns the stacked diversity matrices for the sequence pairs
+
+    Parameters
+    ----------
+    indexed_seqs : array
+        2D array of sequences converted to indices, invalid characters
+        being negative numbers
+    index1, index2 : array
+        row indices of the first and second member of each pair
+    dim : int
+        number of valid states
+
+    Returns
+    -------
+    float64 array with shape (len(index1), dim, dim)
+    """
+    num_pairs = len(index1)
+    seqs1 = indexed_seqs.take(index1, axis=0).astype(numpy.int64)
+    seqs2 = indexed_seqs.take(index2, axis=0)
+    valid = (seqs1 >= 0) & (seqs2 >= 0)
+    codes = seqs1 * dim + seqs2
+    codes += numpy.arange(num_pairs, dtype=numpy.int64)[:, None] * (dim * dim)
+    counts = numpy.bincount(codes[valid], minlength=num_pairs * dim * dim)
+    return counts.reshape((num_pairs, dim, dim)).astype(float64)
+
+
+def _hamming_from_matrices(matrices):
+    """vectorised version of _hamming
+
+    Parameters
+    ----------
+    matrices : array
+        3D numpy array of stacked diversity matrices
+
+    Returns
+    -------
+    arrays of total, the proportion of changes, hamming distance and variance
+    (None). Invalid entries are nan.
+    """
+    total = matrices.sum(axis=(1, 2))
+    dist = total - numpy.trace(matrices, axis1=1, axis2=2)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = dist / total
+
+    dist[total == 0] = numpy.nan
+    return total, p, dist, None
+
+
+def _jc69_from_matrices(matrices):
+    """vectorised version of _jc69_from_matrix"""
+    total = matrices.sum(axis=(1, 2))
+    diffs = total - numpy.trace(matrices, axis1=1, axis2=2)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = diffs / total
+        factor = 1 - (4 / 3) * p
+        dist = -3.0 * log(factor) / 4
+        var = p * (1 - p) / (factor * factor * total)
+
+    invalid = (total == 0) | (p >= 0.75)
+    dist[invalid] = numpy.nan
+    var[invalid] = numpy.nan
+    return total, p, dist, var
+
+
+def _tn93_from_matrices(
+    matrices, freqs, pur_indices, pyr_indices, pur_coords, pyr_coords, tv_coords
+):
+    """vectorised version of _tn93_from_matrix"""
+    total = matrices.sum(axis=(1, 2))
+    flat = matrices.reshape((matrices.shape[0], -1))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        freqs = matrices.sum(axis=1) + matrices.sum(axis=2)
+        freqs /= 2 * total[:, None]
+
+        p = flat.take(pur_coords + pyr_coords + tv_coords, axis=1).sum(axis=1) / total
+
+        freq_purs = freqs.take(pur_indices, axis=1).sum(axis=1)
+        prod_purs = freqs.take(pur_indices, axis=1).prod(axis=1)
+        freq_pyrs = freqs.take(pyr_indices, axis=1).sum(axis=1)
+        prod_pyrs = freqs.take(pyr_indices, axis=1).prod(axis=1)
+
+        pur_ts_diffs = flat.take(pur_coords, axis=1).sum(axis=1) / total
+        pyr_ts_diffs = flat.take(pyr_coords, axis=1).sum(axis=1) / total
+        tv_diffs = flat.take(tv_coords, axis=1).sum(axis=1) / total
+
+        coeff1 = 2 * prod_purs / freq_purs
+        coeff2 = 2 * prod_pyrs / freq_pyrs
+        coeff3 = 2 * (
+            freq_purs * freq_pyrs
+            - (prod_purs * freq_pyrs / freq_purs)
+            - (prod_pyrs * freq_purs / freq_pyrs)
+        )
+
+        term1 = 1 - pur_ts_diffs / coeff1 - tv_diffs / (2 * freq_purs)
+        term2 = 1 - pyr_ts_diffs / coeff2 - tv_diffs / (2 * freq_pyrs)
+        term3 = 1 - tv_diffs / (2 * freq_purs * freq_pyrs)
+        invalid = (total == 0) | (term1 <= 0) | (term2 <= 0) | (term3 <= 0)
+
+        dist = -coeff1 * log(term1) - coeff2 * log(term2) - coeff3 * log(term3)
+        v1 = 1 / term1
+        v2 = 1 / term2
+        v3 = 1 / term3
+        v4 = (
+            (coeff1 * v1 / (2 * freq_purs))
+            + (coeff2 * v2 / (2 * freq_pyrs))
+            + (coeff3 * v3 / (2 * freq_purs * freq_pyrs))
+        )
+        var = (
+            v1 ** 2 * pur_ts_diffs
+            + v2 ** 2 * pyr_ts_diffs
+            + v4 ** 2 * tv_diffs
+            - (v1 * pur_ts_diffs + v2 * pyr_ts_diffs + v4 * tv_diffs) ** 2
+        )
+        var /= total
+
+    dist[invalid] = numpy.nan
+    var[invalid] = numpy.nan
+    return total, p, dist, var
+
+
+def _logdetcommon_matrices(matrices):
+    """vectorised version of _logdetcommon, invalid entries are flagged"""
+    num, r = matrices.shape[:2]
+    total = matrices.sum(axis=(1, 2))
+    diffs = total - numpy.trace(matrices, axis1=1, axis2=2)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = diffs / total
+
+    frequency = matrices.copy()
+    frequency[(frequency == 0) & eye(r, dtype=bool)[None, :, :]] = 0.5
+    frequency /= frequency.sum(axis=(1, 2))[:, None, None]
+
+    determinant = det(frequency)
+    invalid = (total == 0) | (diffs == 0) | ~(determinant > 0)
+
+    # substitute identity for the invalid matrices so the inverse is defined
+    frequency[invalid] = eye(r) / r
+    M_matrix = inv(frequency) ** 2
+    freqs = [frequency.sum(axis=axis) for axis in (1, 2)]
+    var_term = numpy.einsum("kij,kji->k", M_matrix, frequency)
+    determinant[invalid] = 1.0
+
+    return total, p, determinant, freqs, var_term, invalid
+
+
+def _paralinear_from_matrices(matrices):
+    """vectorised version of _paralinear"""
+    total, p, determinant, freqs, var_term, invalid = _logdetcommon_matrices(matrices)
+    r = matrices.shape[1]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        d_xy = -log(determinant / sqrt((freqs[0] * freqs[1]).prod(axis=1))) / r
+        var = (var_term - (1 / sqrt(freqs[0] * freqs[1])).sum(axis=1)) / (
+            r ** 2 * total
+        )
+
+    d_xy[invalid] = numpy.nan
+    var[invalid] = numpy.nan
+    return total, p, d_xy, var
+
+
+def _logdet_from_matrices(matrices, use_tk_adjustment=True):
+    """vectorised version of _logdet"""
+    total, p, determinant, freqs, var_term, invalid = _logdetcommon_matrices(matrices)
+    r = matrices.shape[1]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        if use_tk_adjustment:
+            coeff = (((freqs[0] + freqs[1]) ** 2).sum(axis=1) / 4 - 1) / (r - 1)
+            d_xy = coeff * log(determinant / sqrt((freqs[0] * freqs[1]).prod(axis=1)))
+            var = None
+        else:
+            d_xy = -log(determinant) / r - log(r)
+            var = (var_term / r ** 2 - 1) / total
+            var[invalid] = numpy.nan
+
+    d_xy[invalid] = numpy.nan
+    return total, p, d_xy, var
+
+
+def _iter_pair_blocks(num_seqs, block_size, start=0, end=None):
+    """yields row and column indices of upper triangle pairs in blocks
+
+    Pairs are produced in row major order for rows start to end (exclusive),
+    each block having at most block_size pairs."""
+    end = num_seqs - 1 if end is None else min(end, num_seqs - 1)
+    index1, index2 = [], []
+    size = 0
+    for i in range(start, end):
+        cols = numpy.arange(i + 1, num_seqs)
+        while len(cols):
+            chunk = cols[: block_size - size]
+            cols = cols[len(chunk) :]
+            index1.append(numpy.full(len(chunk), i))
+            index2.append(chunk)
+            size += len(chunk)
+            if size == block_size:
+                yield numpy.concatenate(index1), numpy.concatenate(index2)
+                index1, index2 = [], []
+                size = 0
+
+    if size:
+        yield numpy.concatenate(index1), numpy.concatenate(index2)
+
+
+def _get_block_size(dim, seq_len, block_bytes=None):
+    """number of pairs whose diversity matrices fit within block_bytes"""
+    block_bytes = block_bytes or DEFAULT_BLOCK_BYTES
+    # a pair needs its diversity matrix plus int64 codes and a mask
+    pair_bytes = 8 * dim * dim + 17 * max(seq_len, 1)
+    return max(1, int(block_bytes // pair_bytes))
+
+
+def _pair_stats_for_rows(
+    indexed_seqs, dim, batch_func, func_args, block_size, start=0, end=None, ui=None
+):
+    """returns the statistics for all upper triangle pairs in rows start to end
+
+    Returns
+    -------
+    index1, index2, stats, no_var where stats is a 2D array whose rows are
+    total, p, dist, var, identical; and no_var indicates batch_func does not
+    compute a variance
+    """
+    num_seqs, seq_len = indexed_seqs.shape
+    to_do = sum(num_seqs - 1 - i for i in range(start, end or num_seqs))
+    index1, index2, stats = [], [], []
+    no_var = False
+    done = 0
+    for rows, cols in _iter_pair_blocks(num_seqs, block_size, start=start, end=end):
+        if ui is not None:
+            ui.display(progress=done / max(to_do, 1))
+        done += len(rows)
+        matrices = _fill_diversity_matrices(indexed_seqs, rows, cols, dim)
+        identical = numpy.trace(matrices, axis1=1, axis2=2) == matrices.sum(axis=(1, 2))
+        total, p, dist, var = batch_func(matrices, *func_args)
+        var_is_none = var is None
+        if var_is_none:
+            var = numpy.full(len(rows), numpy.nan)
+        index1.append(rows)
+        index2.append(cols)
+        stats.append(numpy.array([total, p, dist, var, identical]))
+        no_var = no_var or var_is_none
+
+    if not stats:
+        empty = numpy.array([], dtype=int)
+        return empty, empty, numpy.zeros((5, 0)), no_var
+
+    index1 = numpy.concatenate(index1)
+    index2 = numpy.concatenate(index2)
+    return index1, index2, numpy.concatenate(stats, axis=1), no_var
+
+
+def _get_row_tiles(num_seqs, num_tiles):
+    """splits the rows of the upper triangle into bands of similar pair counts
+
+    Returns
+    -------
+    list of [start, end) row ranges
+    """
+    num_tiles = max(1, min(num_tiles, num_seqs - 1))
+    pairs_per_row = numpy.arange(num_seqs - 1, 0, -1)
+    cumulative = numpy.cumsum(pairs_per_row)
+    bounds = numpy.searchsorted(
+        cumulative, numpy.linspace(0, cumulative[-1], num_tiles + 1)[1:-1]
+    )
+    bounds = [0] + sorted(set(int(b) + 1 for b in bounds)) + [num_seqs - 1]
+    return [(s, e) for s, e in zip(bounds[:-1], bounds[1:]) if s < e]
+
+
+class _TilePairStats:
+    """computes pair statistics for a tile of rows in a worker process
+
+    The indexed sequences are read from a memory mapped file, so workers
+    share the array rather than receiving a pickled copy."""
+
+    def __init__(self, path, dim, batch_func, func_args, block_bytes=None):
+        self.path = path
+        self.dim = dim
+        self.batch_func = batch_func
+        self.func_args = func_args
+        self.block_bytes = block_bytes
+
+    def __call__(self, tile):
+        start, end = tile
+        indexed_seqs = numpy.load(self.path, mmap_mode="r")
+        block_size = _get_block_size(self.dim, indexed_seqs.shape[1], self.block_bytes)
+        return _pair_stats_for_rows(
+            indexed_seqs,
+            self.dim,
+            self.batch_func,
+            self.func_args,
+            block_size,
+            start=start,
+            end=end,
+        )
+
+
 try:
     from ._pairwise_distance import _fill_diversity_matrix as fill_diversity_matrix
 
@@ -291,6 +593,9 @@ def _number_formatter(template):
 
 Stats = namedtuple("Stats", ["length", "fraction_variable", "dist", "variance"])
 
+# memory budget for the stacked diversity matrices of a block of pairs
+DEFAULT_BLOCK_BYTES = 2 ** 26
+
 
 def _make_stat_table(stats, names, **kwargs):
     from cogent3.util.table import Table
@@ -338,6 +643,7 @@ class _PairwiseDistance(object):
 
         self.names = None
         self.indexed_seqs = None
+        self._batch_func = None
 
         if alignment is not None:
             self._convert_seqs_to_indices(alignment)
@@ -370,17 +676,66 @@ class _PairwiseDistance(object):
         pass  # over ride in subclasses
 
     @display_wrap
-    def run(self, alignment=None, ui=None):
-        """computes the pairwise distances"""
+    def run(
+        self, alignment=None, ui=None, block_bytes=None, parallel=False, par_kw=None
+    ):
+        """computes the pairwise distances
+
+        Parameters
+        ----------
+        alignment
+            if provided, replaces the alignment the calculator was created with
+        block_bytes : int
+            approximate memory budget (in bytes) for each block of pairwise
+            diversity matrices evaluated together. Defaults to
+            DEFAULT_BLOCK_BYTES.
+        parallel : bool
+            the upper triangle of the distance matrix is split into tiles that
+            are computed by worker processes, see cogent3.util.parallel. Only
+            applies to calculators with a vectorised evaluation, others warn
+            and compute in serial.
+        par_kw
+            dict of values for configuring parallel execution
+        """
         self._dupes = None
         self._duped = None
 
-        dupes = set()
-        duped = defaultdict(list)
-
         if alignment is not None:
             self._convert_seqs_to_indices(alignment)
 
+        if self._batch_func is None:
+            if parallel:
+                warnings.warn(
+                    f"{self.__class__.__name__} has no vectorised evaluation, "
+                    "computing in serial",
+                    UserWarning,
+                    stacklevel=3,
+                )
+            dupes, duped = self._run_pairwise(ui)
+        else:
+            dupes, duped = self._run_batched(ui, block_bytes, parallel, par_kw)
+
+        names = self.names[:]
+        self._dupes = [names[i] for i in dupes] or None
+        if duped:
+            self._duped = {}
+            for k, v in duped.items():
+                key = names[k]
+                vals = [names[i] for i in v]
+                self._duped[key] = vals
+
+            # clean the distances so only unique seqs included
+            remove = set(self._dupes)
+            keys = list(self._dists.keys())
+            for key in keys:
+                if set(key) & remove:
+                    del self._dists[key]
+
+    def _run_pairwise(self, ui):
+        """computes the distances one pair at a time using self.func"""
+        dupes = set()
+        duped = defaultdict(list)
+
         names = self.names[:]
         matrix = zeros((self._dim, self._dim), float64)
         off_diag = [
@@ -420,20 +775,108 @@ class _PairwiseDistance(object):
                 self._dists[(name_1, name_2)] = result
                 self._dists[(name_2, name_1)] = result
 
-        self._dupes = [names[i] for i in dupes] or None
-        if duped:
-            self._duped = {}
-            for k, v in duped.items():
-                key = names[k]
-                vals = [names[i] for i in v]
-                self._duped[key] = vals
+        return dupes, duped
 
-            # clean the distances so only unique seqs included
-            remove = set(self._dupes)
-            keys = list(self._dists.keys())
-            for key in keys:
-                if set(key) & remove:
-                    del self._dists[key]
+    def _run_batched(self, ui, block_bytes, parallel=False, par_kw=None):
+        """computes the distances for blocks of pairs using self._batch_func
+
+        The diversity matrices for a block of pairs are constructed as a
+        single stacked array and the statistics evaluated over the whole
+        stack."""
+        names = self.names[:]
+        num_seqs = len(names)
+        if num_seqs < 2:
+            return set(), {}
+
+        if parallel:
+            index1, index2, stats, no_var = self._tiled_pair_stats(
+                ui, block_bytes, par_kw
+            )
+        else:
+            block_size = _get_block_size(
+                self._dim, self.indexed_seqs.shape[1], block_bytes
+            )
+            index1, index2, stats, no_var = _pair_stats_for_rows(
+                self.indexed_seqs,
+                self._dim,
+                self._batch_func,
+                self._func_args,
+                block_size,
+                ui=ui,
+            )
+
+        total, p, dist, var, identical = stats
+        identical = identical.astype(bool)
+
+        # sequences are duplicates of the first sequence they are identical to
+        # that is not itself a duplicate
+        marked_by = numpy.full(num_seqs, num_seqs)
+        dupes = set()
+        duped = defaultdict(list)
+        same = numpy.zeros((num_seqs, num_seqs), dtype=bool)
+        same[index1[identical], index2[identical]] = True
+        for i in range(num_seqs - 1):
+            if i in dupes:
+                continue
+            matches = numpy.flatnonzero(same[i, i + 1 :]) + i + 1
+            matches = matches[marked_by[matches] == num_seqs]
+            if len(matches):
+                marked_by[matches] = i
+                dupes.update(matches.tolist())
+                duped[i].extend(matches.tolist())
+
+        # a pair was evaluated if neither member was already known to be a
+        # duplicate when it was reached
+        evaluated = (marked_by[index1] == num_seqs) & (marked_by[index2] > index1)
+        if self._invalid_raises:
+            failed = numpy.flatnonzero(evaluated & numpy.isnan(dist))
+            if len(failed):
+                name_1 = names[index1[failed[0]]]
+                name_2 = names[index2[failed[0]]]
+                msg = f"distance could not be calculated for {name_1} - {name_2}"
+                raise ArithmeticError(msg)
+
+        invalid = Stats(None, None, None, None)
+        for i, j, t, f, d, v in zip(
+            index1[evaluated].tolist(),
+            index2[evaluated].tolist(),
+            total[evaluated].tolist(),
+            p[evaluated].tolist(),
+            dist[evaluated].tolist(),
+            var[evaluated].tolist(),
+        ):
+            if d != d:  # nan
+                result = invalid
+            else:
+                result = Stats(t, f, d, None if no_var else v)
+            self._dists[(names[i], names[j])] = result
+            self._dists[(names[j], names[i])] = result
+
+        return dupes, duped
+
+    def _tiled_pair_stats(self, ui, block_bytes, par_kw):
+        """computes the pair statistics for bands of rows in parallel
+
+        The indexed sequences are written to a temporary file that each
+        worker memory maps."""
+        par_kw = par_kw or {}
+        max_workers = par_kw.get("max_workers") or max(
+            multiprocessing.cpu_count() - 1, 1
+        )
+        tiles = _get_row_tiles(len(self.names), 4 * max_workers)
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, "indexed_seqs.npy")
+            numpy.save(path, self.indexed_seqs)
+            calc = _TilePairStats(
+                path, self._dim, self._batch_func, self._func_args, block_bytes
+            )
+            results = list(ui.imap(calc, tiles, parallel=True, par_kw=par_kw))
+
+        index1 = numpy.concatenate([r[0] for r in results])
+        index2 = numpy.concatenate([r[1] for r in results])
+        stats = numpy.concatenate([r[2] for r in results], axis=1)
+        no_var = any(r[3] for r in results)
+        return index1, index2, stats, no_var
 
     __call__ = run
 
@@ -544,6 +987,7 @@ class HammingPair(_PairwiseDistance):
         """states: the valid sequence states"""
         super(HammingPair, self).__init__(moltype, *args, **kwargs)
         self.func = _hamming
+        self._batch_func = _hamming_from_matrices
 
 
 class PercentIdentityPair(_PairwiseDistance):
@@ -555,6 +999,7 @@ class PercentIdentityPair(_PairwiseDistance):
         """states: the valid sequence states"""
         super(PercentIdentityPair, self).__init__(moltype, *args, **kwargs)
         self.func = _hamming
+        self._batch_func = _hamming_from_matrices
 
     def get_pairwise_distances(self, include_duplicates=True):
         """returns a matrix of pairwise distances.
@@ -596,6 +1041,7 @@ class JC69Pair(_NucleicSeqPair):
         """states: the valid sequence states"""
         super(JC69Pair, self).__init__(moltype, *args, **kwargs)
         self.func = _jc69_from_matrix
+        self._batch_func = _jc69_from_matrices
 
 
 class TN93Pair(_NucleicSeqPair):
@@ -622,6 +1068,7 @@ class TN93Pair(_NucleicSeqPair):
         self.tv_coords = [i * 4 + j for i, j in self.tv_coords]
 
         self.func = _tn93_from_matrix
+        self._batch_func = _tn93_from_matrices
         self._func_args = [
             self._freqs,
             self.pur_indices,
@@ -644,6 +1091,7 @@ class LogDetPair(_PairwiseDistance):
         """
         super(LogDetPair, self).__init__(moltype, *args, **kwargs)
         self.func = _logdet
+        self._batch_func = _logdet_from_matrices
         self._func_args = [use_tk_adjustment]
 
     def run(self, use_tk_adjustment=None, *args, **kwargs):
@@ -661,6 +1109,7 @@ class ParalinearPair(_PairwiseDistance):
     def __init__(self, moltype="dna", *args, **kwargs):
         super(ParalinearPair, self).__init__(moltype, *args, **kwargs)
         self.func = _paralinear
+        self._batch_func = _paralinear_from_matrices
 
 
 _calculators = {
@@ -825,3 +1274,121 @@ class DistanceMatrix(DictArray):
             raise ValueError("Too few distances to build a treenj")
         dists = dists.to_dict()
         return nj(dists, show_progress=show_progress)
+
+
+# bounds the number of elements of the k-mer presence profiles held at once
+KMER_PROFILE_CELLS = 2 ** 24
+
+
+def _kmer_codes(indices, k, dim):
+    """returns the sorted distinct codes of the k-mers in indices
+
+    Parameters
+    ----------
+    indices : array
+        sequence as canonical state indices, other states negative
+    k : int
+        k-mer size
+    dim : int
+        number of canonical states
+
+    Notes
+    -----
+    k-mers including a non-canonical state are excluded. The k-mer at
+    position i has code sum(indices[i+j] * dim ** (k - j - 1)).
+    """
+    num = len(indices) - k + 1
+    if num <= 0:
+        return zeros(0, dtype=numpy.int64)
+
+    invalid = numpy.concatenate(([0], numpy.cumsum(indices < 0)))
+    valid = invalid[k:] == invalid[:num]
+    indices = numpy.where(indices < 0, 0, indices)
+    kmers = zeros(num, dtype=numpy.int64)
+    for i in range(k):
+        kmers *= dim
+        kmers += indices[i : i + num]
+    return numpy.unique(kmers[valid])
+
+
+def _shared_kmer_counts(codes):
+    """returns the matrix of the number of k-mers shared by each pair
+
+    Parameters
+    ----------
+    codes : list of arrays
+        the sorted distinct k-mer codes of each sequence
+    """
+    # distinct codes are renumbered consecutively, and presence profiles
+    # for blocks of them multiplied, bounding memory whatever k is
+    num_seqs = len(codes)
+    ends = numpy.cumsum([len(c) for c in codes])[:-1]
+    (distinct, columns) = numpy.unique(numpy.concatenate(codes), return_inverse=True)
+    columns = numpy.split(columns, ends)
+    block = max(1, KMER_PROFILE_CELLS // max(num_seqs, 1))
+    shared = zeros((num_seqs, num_seqs), dtype=float)
+    for start in range(0, len(distinct), block):
+        profiles = zeros((num_seqs, min(block, len(distinct) - start)), numpy.float32)
+        for (i, cols) in enumerate(columns):
+            (lo, hi) = cols.searchsorted([start, start + block])
+            profiles[i, cols[lo:hi] - start] = 1
+        shared += profiles @ profiles.T
+    return shared
+
+
+def get_kmer_distances(seqs, k=None, moltype=None):
+    """returns alignment free pairwise distances from shared k-mers
+
+    Parameters
+    ----------
+    seqs
+        a sequence collection, aligned or not. Gaps are ignored.
+    k : int
+        k-mer size. Defaults to 6 for nucleic acids, 3 otherwise.
+    moltype
+        molecular type, defaults to that of seqs
+
+    Returns
+    -------
+    DistanceMatrix
+
+    Notes
+    -----
+    The fraction of shared k-mers between two sequences, F, is the number of
+    distinct k-mers they have in common divided by the number of distinct
+    k-mers of the sequence with fewer. If sites differ independently with
+    probability p, F is approximately (1 - p)^k, so the returned distance is
+    the proportion of differences 1 - F^(1/k). A sequence with no k-mers of
+    canonical states, eg. one shorter than k, is at distance 1 from all
+    others. Work is linear in the total sequence length plus products of the
+    k-mer presence profiles, which are formed for at most KMER_PROFILE_CELLS
+    elements at a time.
+    """
+    moltype = get_moltype(moltype or seqs.moltype)
+    dim = len(moltype.alphabet)
+    if k is None:
+        k = 6 if dim == 4 else 3
+    # k-mer codes are int64
+    if k < 1 or dim ** k >= 2 ** 63:
+        raise ValueError(f"k={k} is out of range for an alphabet of {dim} states")
+
+    char_to_index = get_moltype_index_array(moltype)
+    # so any byte can be looked up
+    char_to_index = numpy.concatenate(
+        (char_to_index, numpy.full(256 - len(char_to_index), -9, dtype=int32))
+    )
+    names = list(seqs.names)
+    codes = []
+    for name in names:
+        seq = str(seqs.get_seq(name)).replace("-", "")
+        seq = numpy.frombuffer(seq.upper().encode("utf8"), dtype=numpy.uint8)
+        codes.append(_kmer_codes(char_to_index.take(seq), k, dim))
+
+    shared = _shared_kmer_counts(codes)
+    smaller = numpy.minimum.outer(shared.diagonal(), shared.diagonal())
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        fraction = numpy.where(smaller > 0, shared / smaller, 0)
+    dists = 1 - fraction ** (1 / k)
+    numpy.fill_diagonal(dists, 0)
+    dists = DictArrayTemplate(names, names).wrap(dists)
+    return DistanceMatrix(dists)
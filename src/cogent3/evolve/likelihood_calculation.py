@@ -8,10 +8,24 @@ implementation. The two versions are maintained for the purpose of cross-
 validating accuracy. The calculations can be performed for tree's that have polytomies
 in addition to binary trees.
 """
+import os
+
 import numpy
 
-from cogent3.evolve.likelihood_tree import LikelihoodTreeEdge
-from cogent3.evolve.simulate import argpick
+from cogent3.evolve.likelihood_tree import (
+    EDGE_TYPES,
+    LikelihoodTreeEdge,
+    get_log_scale,
+    scaled_inner,
+    with_common_scale,
+    with_log_scale,
+)
+from cogent3.evolve.simulate import (
+    argpick,
+    cumulative_probs,
+    picks,
+    random_states,
+)
 from cogent3.maths.markov import SiteClassTransitionMatrix
 from cogent3.recalculation.definition import (
     CalcDefn,
@@ -57,14 +71,18 @@ class PartialLikelihoodProductDefn(_PartialLikelihoodDefn):
     def calc(self, recycled_result, lh_edge, *child_likelihoods):
         if recycled_result is None:
             recycled_result = lh_edge.make_partial_likelihoods_array()
-        return lh_edge.sum_input_likelihoodsR(recycled_result, *child_likelihoods)
+        return lh_edge.sum_scaled_input_likelihoodsR(
+            recycled_result, *child_likelihoods
+        )
 
 
 class PartialLikelihoodProductDefnFixedMotif(PartialLikelihoodProductDefn):
     def calc(self, recycled_result, fixed_motif, lh_edge, *child_likelihoods):
         if recycled_result is None:
             recycled_result = lh_edge.make_partial_likelihoods_array()
-        result = lh_edge.sum_input_likelihoodsR(recycled_result, *child_likelihoods)
+        result = lh_edge.sum_scaled_input_likelihoodsR(
+            recycled_result, *child_likelihoods
+        )
         if fixed_motif not in [None, -1]:
             for motif in range(result.shape[-1]):
                 if motif != fixed_motif:
@@ -96,7 +114,7 @@ def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs):
         for child in edge.children:
             child_plh = make_partial_likelihood_defns(child, lht, psubs, fixed_motifs)
             psub = psubs.select_from_dimension("edge", child.name)
-            child_plh = CalcDefn(numpy.inner)(child_plh, psub)
+            child_plh = CalcDefn(scaled_inner, name="inner")(child_plh, psub)
             children.append(child_plh)
 
         if fixed_motifs:
@@ -110,35 +128,57 @@ def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs):
     return plh
 
 
-def recursive_lht_build(edge, leaves):
+def recursive_lht_build(edge, leaves, edge_type=LikelihoodTreeEdge, threads=1):
     if edge.istip():
         lhe = leaves[edge.name]
+        if lhe.input_likelihoods.dtype != edge_type.float_type:
+            lhe = lhe.astype(edge_type.float_type)
     else:
         lht_children = []
         for child in edge.children:
-            lht = recursive_lht_build(child, leaves)
+            lht = recursive_lht_build(child, leaves, edge_type, threads)
             lht_children.append(lht)
-        lhe = LikelihoodTreeEdge(lht_children, edge_name=edge.name)
+        lhe = edge_type(lht_children, edge_name=edge.name)
+        lhe.threads = threads
     return lhe
 
 
 class LikelihoodTreeDefn(CalculationDefn):
     name = "lht"
 
-    def setup(self, tree):
+    def setup(self, tree, precision="double", threads=1):
         self.tree = tree
+        self.edge_type = EDGE_TYPES[precision]
+        self.threads = threads
 
     def calc(self, leaves):
-        return recursive_lht_build(self.tree, leaves)
+        return recursive_lht_build(self.tree, leaves, self.edge_type, self.threads)
 
 
 def make_total_loglikelihood_defn(
-    tree, leaves, psubs, mprobs, bprobs, bin_names, locus_names, sites_independent
+    tree,
+    leaves,
+    psubs,
+    mprobs,
+    bprobs,
+    bin_names,
+    locus_names,
+    sites_independent,
+    precision="double",
+    threads=1,
 ):
+    if precision not in EDGE_TYPES:
+        raise ValueError(
+            f"precision must be one of {list(EDGE_TYPES)}, not {precision!r}"
+        )
+    if threads is None:
+        threads = os.cpu_count() or 1
+    elif threads < 1:
+        raise ValueError(f"threads must be at least 1, not {threads}")
 
     fixed_motifs = NonParamDefn("fixed_motif", ["edge"])
 
-    lht = LikelihoodTreeDefn(leaves, tree=tree)
+    lht = LikelihoodTreeDefn(leaves, tree=tree, precision=precision, threads=threads)
     plh = make_partial_likelihood_defns(tree, lht, psubs, fixed_motifs)
 
     # After the root partial likelihoods have been calculated it remains to
@@ -149,7 +189,7 @@ def make_total_loglikelihood_defn(
     # minimise inter-CPU communicaton.
 
     root_mprobs = mprobs.select_from_dimension("edge", "root")
-    lh = CalcDefn(numpy.inner, name="lh")(plh, root_mprobs)
+    lh = CalcDefn(scaled_inner, name="lh")(plh, root_mprobs)
     if len(bin_names) > 1:
         if sites_independent:
             site_pattern = CalcDefn(BinnedSiteDistribution, name="bdist")(bprobs)
@@ -175,18 +215,151 @@ def log_sum_across_sites(root, root_lh):
     return root.get_log_sum_across_sites(root_lh)
 
 
+class EdgeLengthDerivatives(object):
+    """Analytic partial derivatives of the log-likelihood with respect to the
+    edge lengths. The partial likelihoods below each edge are taken from the
+    calculator and combined with dP/dt and the likelihood of the rest of the
+    tree, which is accumulated in one pass from the root to the tips.
+
+    Requires a single locus and bin, with edge lengths not scaled by a rate.
+    Use make_edge_length_derivatives() to construct."""
+
+    def __init__(self, defn_for, root_plh):
+        psubs = defn_for["psubs"]
+        (self.Qd, self.length) = psubs.args
+        self.psubs = psubs
+        self.lht = defn_for["lht"]
+        self.lh = defn_for["lh"]
+        self.fixed_motif = defn_for.get("fixed_motif")
+        self.children = self._child_defns(root_plh)
+        self._groupings = {}
+
+    def _child_defns(self, plh):
+        """[(psub posn, contribution defn, plh defn, [grand children]), ..]"""
+        if isinstance(plh, PartialLikelihoodProductDefnFixedMotif):
+            contributions = plh.args[2:]
+        elif isinstance(plh, PartialLikelihoodProductDefn):
+            contributions = plh.args[1:]
+        else:
+            return []
+
+        children = []
+        for contribution in contributions:
+            (child_plh, psub) = contribution.args
+            assert psub.arg is self.psubs, psub.name
+            posn = self.psubs._getPosnForScope(edge=child_plh.edge_name)
+            children.append(
+                (posn, contribution, child_plh, self._child_defns(child_plh))
+            )
+        return children
+
+    def _sum_by_index(self, values, index, size):
+        """sums the rows of values that have the same child pattern index"""
+        key = id(index)
+        if key not in self._groupings or self._groupings[key][0] is not index:
+            order = numpy.argsort(index, kind="stable")
+            ordered = index[order]
+            starts = numpy.flatnonzero(numpy.diff(ordered, prepend=-1))
+            self._groupings[key] = (index, order, starts, ordered[starts])
+        (index, order, starts, targets) = self._groupings[key]
+        result = numpy.zeros((size,) + values.shape[1:], values.dtype)
+        result[targets] = numpy.add.reduceat(values[order], starts, axis=0)
+        return result
+
+    def _outside(self, values, children, lht_edge, above, result):
+        """adds d lnL / d length for the child edges of lht_edge, where above
+        is the weighted likelihood of the tree outside of lht_edge"""
+        expanded = [
+            values(contribution)[0][index]
+            for ((index, child), (p, contribution, c, g)) in zip(
+                lht_edge._indexed_children, children
+            )
+        ]
+        for (i, (index, lht_child)) in enumerate(lht_edge._indexed_children):
+            (posn, contribution, child_plh, grandchildren) = children[i]
+            other = above
+            for (j, sibling) in enumerate(expanded):
+                if j != i:
+                    other = other * sibling
+            plh = values(child_plh)[0]
+            other = self._sum_by_index(other, index, len(plh))
+            (exp_num, length_num) = self.psubs.uniq[posn]
+            exponentiator = values(self.Qd)[exp_num]
+            dpsub = exponentiator.derivative(values(self.length)[length_num])
+            deriv = (other * numpy.inner(plh, dpsub)).sum()
+            result[posn] = result.get(posn, 0.0) + deriv
+            if grandchildren:
+                above_child = numpy.dot(other, values(self.psubs)[posn])
+                self._outside(values, grandchildren, lht_child, above_child, result)
+
+    def __call__(self, calc):
+        """returns {opt_par rank: d lnL / d length} for calc"""
+        cache = {}
+
+        def values(defn):
+            if id(defn) not in cache:
+                cache[id(defn)] = calc.get_current_cell_values_for_defn(defn)
+            return cache[id(defn)]
+
+        if self.fixed_motif is not None:
+            if any(m not in (None, -1) for m in values(self.fixed_motif)):
+                return {}
+        if not all(hasattr(e, "derivative") for e in values(self.Qd)):
+            return {}
+
+        if get_log_scale(values(self.lh)[0]) is not None:
+            # partial likelihoods have been rescaled to avoid underflow
+            return {}
+
+        root = values(self.lht)[0]
+        mprobs = values(self.lh.args[1])[self.lh.uniq[0][1]]
+        weights = root.counts / values(self.lh)[0]
+        above = numpy.outer(weights, mprobs)
+        by_posn = {}
+        self._outside(values, self.children, root, above, by_posn)
+
+        length_cells = calc.results_by_id[id(self.length)]
+        result = {}
+        for (posn, deriv) in by_posn.items():
+            cell = length_cells[self.psubs.uniq[posn][1]]
+            if cell.rank < len(calc.opt_pars):
+                result[cell.rank] = result.get(cell.rank, 0.0) + deriv
+        return result
+
+
+def make_edge_length_derivatives(defn_for):
+    """returns an EdgeLengthDerivatives instance for a likelihood function, or
+    None if its calculation is not of the supported form"""
+    psubs = defn_for.get("psubs")
+    lht = defn_for.get("lht")
+    lh = defn_for.get("lh")
+    if (
+        lh is None
+        or "dpsubs" in defn_for
+        or not isinstance(lht, LikelihoodTreeDefn)
+        or not isinstance(psubs, CallDefn)
+        or psubs.args[1] is not defn_for.get("length")
+        or len(lh.uniq) != 1
+        or len(lht.uniq) != 1
+    ):
+        return None
+
+    return EdgeLengthDerivatives(defn_for, lh.args[0])
+
+
 class BinnedSiteDistribution(object):
     def __init__(self, bprobs):
         self.bprobs = bprobs
 
     def get_weighted_sum_lh(self, lhs):
+        (lhs, log_scale) = with_common_scale(lhs)
         result = numpy.zeros(lhs[0].shape, lhs[0].dtype.char)
         temp = numpy.empty(result.shape, result.dtype.char)
         for (bprob, lh) in zip(self.bprobs, lhs):
             temp[:] = lh
             temp *= bprob
             result += temp
-        return result
+        return with_log_scale(result, log_scale)
 
     def __call__(self, root):
         return BinnedLikelihood(self, root)
@@ -197,6 +370,10 @@ class BinnedSiteDistribution(object):
             result[i] = argpick(self.bprobs, random_series)
         return result
 
+    def emit_many(self, num_replicates, length, random_state):
+        """bin indices for num_replicates sequences, as a 2D array"""
+        return random_states(self.bprobs, (num_replicates, length), random_state)
+
 
 class PatchSiteDistribution(object):
     def __init__(self, switch, bprobs):
@@ -211,13 +388,16 @@ class PatchSiteDistribution(object):
         self.transition_matrix = SiteClassTransitionMatrix(switch, pprobs)
 
     def get_weighted_sum_lhs(self, lhs):
+        """returns the per patch weighted sums of lhs, which are rescaled to
+        their common log scaling, and that scaling (None if unscaled)"""
+        (lhs, log_scale) = with_common_scale(lhs)
         result = numpy.zeros((2,) + lhs[0].shape, lhs[0].dtype.char)
         temp = numpy.empty(lhs[0].shape, result.dtype.char)
         for (patch, weight, lh) in zip(self.alloc, self.bprobs, lhs):
             temp[:] = lh
             temp *= weight
             result[patch] += temp
-        return result
+        return result, log_scale
 
     def __call__(self, root):
         return SiteHmm(self, root)
@@ -234,6 +414,25 @@ class PatchSiteDistribution(object):
             result[i] = argpick(bprobs[patch], random_series)
         return result
 
+    def emit_many(self, num_replicates, length, random_state):
+        """bin indices for num_replicates sequences, as a 2D array. Patches
+        follow the site class Markov process, bins within them being drawn
+        independently."""
+        alloc = numpy.array(self.alloc)
+        patches = self.transition_matrix.emit_many(num_replicates, length, random_state)
+        # the bins of each patch, padded with the patch's last bin
+        patch_bins = [numpy.flatnonzero(alloc == a) for a in range(2)]
+        width = max(len(bins) for bins in patch_bins)
+        cumulative = numpy.ones((2, width))
+        bin_index = numpy.empty((2, width), int)
+        for (a, bins) in enumerate(patch_bins):
+            probs = numpy.array(self.bprobs)[bins]
+            cumulative[a, : len(bins)] = cumulative_probs(probs)
+            bin_index[a] = bins[-1]
+            bin_index[a, : len(bins)] = bins
+        uniforms = random_state.random_sample(patches.shape)
+        return bin_index[patches, picks(cumulative, patches, uniforms)]
+
 
 class BinnedLikelihood(object):
     def __init__(self, distrib, root):
@@ -247,6 +446,7 @@ class BinnedLikelihood(object):
     def get_posterior_probs(self, *lhs):
         # posterior bin probs, not motif probs
         assert len(lhs) == len(self.distrib.bprobs)
+        (lhs, log_scale) = with_common_scale(lhs)
         result = numpy.array(
             [
                 b * self.root.get_full_length_likelihoods(p)
@@ -263,15 +463,20 @@ class SiteHmm(object):
         self.distrib = distrib
 
     def __call__(self, *lhs):
-        plhs = self.distrib.get_weighted_sum_lhs(lhs)
+        (plhs, log_scale) = self.distrib.get_weighted_sum_lhs(lhs)
         plhs = numpy.ascontiguousarray(numpy.transpose(plhs))
         matrix = self.distrib.transition_matrix
-        return self.root.log_dot_reduce(matrix.StationaryProbs, matrix.Matrix, plhs)
+        result = self.root.log_dot_reduce(matrix.StationaryProbs, matrix.Matrix, plhs)
+        if log_scale is not None:
+            result += numpy.inner(log_scale, self.root.counts)
+        return result
 
     def get_posterior_probs(self, *lhs):
+        # a common scaling of the sites does not change the posteriors
+        (lhs, log_scale) = with_common_scale(lhs)
         plhs = [
             self.root.get_full_length_likelihoods(lh)
-            for lh in self.distrib.get_weighted_sum_lhs(lhs)
+            for lh in self.distrib.get_weighted_sum_lhs(lhs)[0]
         ]
         plhs = numpy.transpose(plhs)
         pprobs = self.distrib.transition_matrix.get_posterior_probs(plhs)
@@ -10,7 +10,12 @@ import numpy
 
 from cogent3.core.alignment import ArrayAlignment
 from cogent3.evolve import substitution_model
-from cogent3.evolve.simulate import AlignmentEvolver, random_sequence
+from cogent3.evolve.likelihood_tree import with_common_scale, with_log_scale
+from cogent3.evolve.simulate import (
+    AlignmentEvolver,
+    numpy_random_state,
+    random_states,
+)
 from cogent3.maths.matrix_exponential_integration import expected_number_subs
 from cogent3.maths.matrix_logarithm import is_generator_unique
 from cogent3.maths.measure import (
@@ -385,8 +390,9 @@ class LikelihoodFunction(ParameterController):
                 self.get_param_value("lh", locus=locus, bin=bin)
                 for bin in self.bin_names
             ]
+            (root_lhs, log_scale) = with_common_scale(root_lhs)
             bprobs = self.get_param_value("bprobs")
-            root_lh = bprobs.dot(root_lhs)
+            root_lh = with_log_scale(bprobs.dot(root_lhs), log_scale)
         else:
             root_lh = self.get_param_value("lh", locus=locus)
         return root_lh
@@ -397,6 +403,12 @@ class LikelihoodFunction(ParameterController):
         root_lht = self.get_param_value("root", locus=locus)
         return root_lht.get_full_length_likelihoods(root_lh)
 
+    def get_full_length_log_likelihoods(self, locus=None):
+        """Array of per site log likelihoods"""
+        root_lh = self._getLikelihoodValuesSummedAcrossAnyBins(locus=locus)
+        root_lht = self.get_param_value("root", locus=locus)
+        return root_lht.get_full_length_log_likelihoods(root_lh)
+
     def get_G_statistic(self, return_table=False, locus=None):
         """Goodness-of-fit statistic derived from the unambiguous columns"""
         root_lh = self._getLikelihoodValuesSummedAcrossAnyBins(locus=locus)
@@ -1035,14 +1047,93 @@ class LikelihoodFunction(ParameterController):
             random_series = random.Random()
             random_series.seed(seed)
 
+        (evolver, site_bins, random_state) = self._make_evolver(
+            1, sequence_length, random_series, orig_ambig, exclude_internal, locus
+        )
+        evolver.site_bins = site_bins[0]
+
+        if root_sequence is not None:  # we convert to a vector of motifs
+            if isinstance(root_sequence, str):
+                root_sequence = self._model.moltype.make_seq(root_sequence)
+            motif_len = self._model.get_alphabet().get_motif_len()
+            root_sequence = root_sequence.get_in_motif_size(motif_len)
+        else:
+            states = self._random_root_states(sequence_length, random_state, locus)
+            root_sequence = [self._motifs[i] for i in states]
+
+        simulated_sequences = evolver(self._tree, root_sequence)
+
+        return ArrayAlignment(data=simulated_sequences, moltype=self._model.moltype)
+
+    def simulate_states(
+        self,
+        num_replicates,
+        sequence_length=None,
+        random_series=None,
+        exclude_internal=True,
+        locus=None,
+        seed=None,
+    ):
+        """
+        Simulates num_replicates alignments in one pass down the tree, all
+        sites and replicates of an edge being drawn at once.
+
+        Parameters
+        ----------
+        num_replicates
+            the number of alignments to simulate
+        sequence_length
+            the length of the alignments to be simulated,
+            default is the length of the attached alignment.
+        random_series
+            a random number generator.
+        exclude_internal
+            if True, only sequences for tips are returned.
+
+        Returns
+        -------
+        the sequence names and a 3D array of motif indices, into the motifs
+        attribute, with axes (replicate, sequence, site). Ambiguous positions
+        in the attached alignment are not preserved.
+        """
+        if sequence_length is None:
+            sequence_length = len(self.get_param_value("lht", locus=locus).index)
+
+        if random_series is None:
+            random_series = random.Random()
+            random_series.seed(seed)
+
+        (evolver, site_bins, random_state) = self._make_evolver(
+            num_replicates, sequence_length, random_series, {}, exclude_internal, locus
+        )
+        shape = (num_replicates, sequence_length)
+        root_states = self._random_root_states(shape, random_state, locus)
+        simulated = evolver.generate_simulated_states(self._tree, root_states)
+        names = list(simulated)
+        states = numpy.stack([simulated[n] for n in names], axis=1)
+        return names, states
+
+    def _make_evolver(
+        self,
+        num_replicates,
+        sequence_length,
+        random_series,
+        orig_ambig,
+        exclude_internal,
+        locus,
+    ):
+        """returns an AlignmentEvolver, the (num_replicates, sequence_length)
+        site bins and a numpy RandomState seeded from random_series"""
+
         def psub_for(edge, bin):
             return self.get_psub_for_edge(edge, bin=bin, locus=locus)
 
+        random_state = numpy_random_state(random_series)
         if len(self.bin_names) > 1:
             hmm = self.get_param_value("bdist", locus=locus)
-            site_bins = hmm.emit(sequence_length, random_series)
+            site_bins = hmm.emit_many(num_replicates, sequence_length, random_state)
         else:
-            site_bins = numpy.zeros([sequence_length], int)
+            site_bins = numpy.zeros([num_replicates, sequence_length], int)
 
         evolver = AlignmentEvolver(
             random_series,
@@ -1053,21 +1144,13 @@ class LikelihoodFunction(ParameterController):
             psub_for,
             self._motifs,
         )
+        return evolver, site_bins, random_state
 
-        if root_sequence is not None:  # we convert to a vector of motifs
-            if isinstance(root_sequence, str):
-                root_sequence = self._model.moltype.make_seq(root_sequence)
-            motif_len = self._model.get_alphabet().get_motif_len()
-            root_sequence = root_sequence.get_in_motif_size(motif_len)
-        else:
-            mprobs = self.get_param_value("mprobs", locus=locus, edge="root")
-            mprobs = self._model.calc_word_probs(mprobs)
-            mprobs = dict((m, p) for (m, p) in zip(self._motifs, mprobs))
-            root_sequence = random_sequence(random_series, mprobs, sequence_length)
-
-        simulated_sequences = evolver(self._tree, root_sequence)
-
-        return ArrayAlignment(data=simulated_sequences, moltype=self._model.moltype)
+    def _random_root_states(self, shape, random_state, locus):
+        """motif indices drawn from the root motif probabilities"""
+        mprobs = self.get_param_value("mprobs", locus=locus, edge="root")
+        mprobs = self._model.calc_word_probs(mprobs)
+        return random_states(mprobs, shape, random_state)
 
     def all_psubs_DLC(self):
         """Returns True if every Psub matrix is Diagonal Largest in Column"""
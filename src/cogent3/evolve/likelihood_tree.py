@@ -2,6 +2,7 @@
 """Leaf and Edge classes that can calculate their likelihoods.
 Each leaf holds a sequence.  Used by a likelihood function."""
 
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy
 
@@ -30,7 +31,96 @@ except ImportError:
     pyrex = None
 
 
+LOG_2 = numpy.log(2.0)
+
+# fewer site patterns than this per thread are not worth dividing
+MIN_SITES_PER_THREAD = 128
+
+_thread_pools = {}
+
+
+def _get_thread_pool(threads):
+    """a shared pool of threads for computing partial likelihoods"""
+    if threads not in _thread_pools:
+        _thread_pools[threads] = ThreadPoolExecutor(max_workers=threads)
+    return _thread_pools[threads]
+
+
+class ScaledLikelihoods(numpy.ndarray):
+    """Likelihoods with rows (sites) held multiplied by exp(-log_scale), so
+    they do not underflow. The true values are self * exp(log_scale). Arrays
+    derived from one of these have no log_scale."""
+
+    def __array_finalize__(self, obj):
+        self.log_scale = None
+
+
+def get_log_scale(likelihoods):
+    """per-row log scaling of likelihoods, None if unscaled"""
+    return getattr(likelihoods, "log_scale", None)
+
+
+def with_log_scale(likelihoods, log_scale):
+    """likelihoods with per-row log_scale attached"""
+    if log_scale is None:
+        return likelihoods
+    likelihoods = likelihoods.view(ScaledLikelihoods)
+    likelihoods.log_scale = log_scale
+    return likelihoods
+
+
+def scaled_inner(likelihoods, other):
+    """numpy.inner, preserving the log scaling of the rows of likelihoods
+    and their precision"""
+    if type(likelihoods) is numpy.ndarray:
+        return numpy.inner(likelihoods, numpy.asarray(other, likelihoods.dtype))
+    log_scale = get_log_scale(likelihoods)
+    likelihoods = numpy.asarray(likelihoods)
+    other = numpy.asarray(other, likelihoods.dtype)
+    result = numpy.inner(likelihoods, other)
+    return with_log_scale(result, log_scale)
+
+
+def unscaled(likelihoods):
+    """the true values of likelihoods, as a plain array"""
+    log_scale = get_log_scale(likelihoods)
+    likelihoods = numpy.asarray(likelihoods)
+    if log_scale is not None:
+        shape = (-1,) + (1,) * (likelihoods.ndim - 1)
+        likelihoods = likelihoods * numpy.exp(log_scale).reshape(shape)
+    return likelihoods
+
+
+def with_common_scale(likelihoods):
+    """returns likelihoods rescaled to a common per-row log scaling and that
+    scaling, None if none are scaled"""
+    scales = [get_log_scale(lh) for lh in likelihoods]
+    if all(scale is None for scale in scales):
+        return [numpy.asarray(lh) for lh in likelihoods], None
+
+    size = len(likelihoods[0])
+    scales = [numpy.zeros(size) if scale is None else scale for scale in scales]
+    common = numpy.max(scales, axis=0)
+    result = []
+    for (lh, scale) in zip(likelihoods, scales):
+        lh = numpy.asarray(lh)
+        shape = (-1,) + (1,) * (lh.ndim - 1)
+        result.append(lh * numpy.exp(scale - common).reshape(shape))
+    return result, common
+
+
 class _LikelihoodTreeEdge(object):
+    # Partial likelihoods for a site are rescaled when their sum falls
+    # below this, as after multiplying in children can still be represented
+    # without losing precision, and children are multiplied in this many at
+    # a time (so the root of an unrooted tree takes a single product)
+    _scaling_threshold = 2.0 ** -192
+    _scaling_group = 3
+
+    # number of threads the site patterns are divided between
+    threads = 1
+    _blocks = None
+
     def __init__(self, children, edge_name, alignment=None):
         self.edge_name = edge_name
         self.alphabet = children[0].alphabet
@@ -80,11 +170,12 @@ class _LikelihoodTreeEdge(object):
 
         # If this is the root it will need to weight the total
         # log likelihoods by these counts:
-        self.counts = numpy.array(counts, self.float_type)
+        self.counts = numpy.array(counts, FLOAT_TYPE)
 
         # For product of child likelihoods
         self._indexed_children = list(zip(self.indexes, children))
         self.shape = [len(self.uniq), M]
+        self._motif_ones = numpy.ones(M, self.float_type)
 
         # Derive per-column degree of ambiguity from children's
         ambigs = [child.ambig[index] for (index, child) in self._indexed_children]
@@ -112,7 +203,16 @@ class _LikelihoodTreeEdge(object):
         return self.__class__(children, self.edge_name)
 
     def get_full_length_likelihoods(self, likelihoods):
-        return likelihoods[self.index]
+        return unscaled(likelihoods)[self.index]
+
+    def get_full_length_log_likelihoods(self, likelihoods):
+        """log of the per site likelihoods, which can be below the smallest
+        representable float"""
+        result = numpy.log(numpy.asarray(likelihoods))
+        log_scale = get_log_scale(likelihoods)
+        if log_scale is not None:
+            result = result + log_scale
+        return result[self.index]
 
     def calc_G_statistic(self, likelihoods, return_table=False):
         # A Goodness-of-fit statistic
@@ -120,7 +220,7 @@ class _LikelihoodTreeEdge(object):
 
         unambig = (self.ambig == 1.0).nonzero()[0]
         observed = self.counts[unambig].astype(int)
-        expected = likelihoods[unambig] * observed.sum()
+        expected = unscaled(likelihoods)[unambig] * observed.sum()
         # chisq = ((observed-expected)**2 / expected).sum()
         G = 2 * observed.dot(numpy.log(observed / expected))
 
@@ -153,6 +253,120 @@ class _LikelihoodTreeEdge(object):
         self.sum_input_likelihoodsR(result, *likelihoods)
         return result
 
+    def sum_scaled_input_likelihoodsR(self, result, *likelihoods):
+        """as for sum_input_likelihoodsR, but with the log scaling of the
+        likelihoods carried through. Sites approaching underflow are
+        rescaled by an exact power of 2. Children of polytomies are
+        multiplied in in small groups so the product cannot underflow
+        before it is rescaled."""
+        result = numpy.asarray(result)
+        if self.threads == 1 and not any(
+            type(lh) is ScaledLikelihoods for lh in likelihoods
+        ):
+            # the usual case, with nothing rescaled below this edge, is kept
+            # to the compiled product and an underflow check
+            if len(likelihoods) <= self._scaling_group:
+                self._sum_inputs(self.indexes, result, likelihoods)
+                log_scale = self._rescale(result, None)
+            else:
+                log_scale = self._sum_scaled_rows(
+                    self.indexes, result, likelihoods, None
+                )
+            return with_log_scale(result, log_scale)
+
+        plain = [numpy.asarray(lh) for lh in likelihoods]
+
+        log_scale = None
+        for (index, lh) in zip(self.indexes, likelihoods):
+            child_scale = get_log_scale(lh)
+            if child_scale is not None:
+                child_scale = child_scale[index]
+                log_scale = (
+                    child_scale if log_scale is None else log_scale + child_scale
+                )
+
+        blocks = self._site_blocks()
+        if len(blocks) == 1:
+            log_scale = self._sum_scaled_rows(self.indexes, result, plain, log_scale)
+            return with_log_scale(result, log_scale)
+
+        def sum_block(rows):
+            return self._sum_scaled_rows(
+                [index[rows] for index in self.indexes],
+                result[rows],
+                plain,
+                None if log_scale is None else log_scale[rows],
+            )
+
+        # rescaling updates existing log_scale rows in place
+        block_scales = list(_get_thread_pool(self.threads).map(sum_block, blocks))
+        if log_scale is None and any(s is not None for s in block_scales):
+            log_scale = numpy.zeros(len(result))
+            for (rows, block_scale) in zip(blocks, block_scales):
+                if block_scale is not None:
+                    log_scale[rows] = block_scale
+
+        return with_log_scale(result, log_scale)
+
+    def _sum_scaled_rows(self, indexes, result, likelihoods, log_scale):
+        """multiplies the likelihoods into result, in groups, with rescaling.
+        Returns the updated log_scale."""
+        group = self._scaling_group
+        temp = None
+        for start in range(0, len(likelihoods), group):
+            chunk = slice(start, start + group)
+            if start == 0:
+                self._sum_inputs(indexes[chunk], result, likelihoods[chunk])
+            else:
+                if temp is None:
+                    temp = numpy.empty(result.shape, result.dtype)
+                self._sum_inputs(indexes[chunk], temp, likelihoods[chunk])
+                result *= temp
+            log_scale = self._rescale(result, log_scale)
+        return log_scale
+
+    def _site_blocks(self):
+        """slices dividing the site patterns between threads"""
+        num_sites = len(self.uniq)
+        num_blocks = max(1, min(self.threads, num_sites // MIN_SITES_PER_THREAD))
+        if self._blocks is None or len(self._blocks) != num_blocks:
+            bounds = numpy.linspace(0, num_sites, num_blocks + 1).astype(int)
+            self._blocks = [slice(a, b) for (a, b) in zip(bounds, bounds[1:])]
+        return self._blocks
+
+    def _rescale(self, likelihoods, log_scale):
+        """rescales, in place, rows of likelihoods whose sum is below the
+        threshold by a power of 2, so their sum lies in [0.5, 1). Returns the
+        updated log_scale."""
+        if not self._min_row_sum(likelihoods) < self._scaling_threshold:
+            return log_scale
+
+        row_sum = likelihoods.dot(self._motif_ones)
+        exponent = numpy.frexp(row_sum)[1]
+        exponent[(row_sum >= self._scaling_threshold) | (row_sum == 0)] = 0
+        # the factor must be representable in the precision of likelihoods
+        numpy.maximum(exponent, numpy.finfo(likelihoods.dtype).minexp, exponent)
+        if not exponent.any():
+            # eg. rows of zeros, which are left as they are
+            return log_scale
+
+        factor = numpy.ldexp(1.0, -exponent).astype(likelihoods.dtype)
+        likelihoods *= factor[:, None]
+        if log_scale is None:
+            log_scale = numpy.zeros(len(likelihoods))
+        log_scale += exponent * LOG_2
+        return log_scale
+
+    def _min_row_sum(self, likelihoods):
+        # a matrix-vector product is much faster than sum(axis=-1)
+        return likelihoods.dot(self._motif_ones).min()
+
+    def _log_scale_total(self, lhs):
+        log_scale = get_log_scale(lhs)
+        if log_scale is None:
+            return 0.0
+        return numpy.inner(log_scale, self.counts)
+
     def as_leaf(self, likelihoods):
         assert len(likelihoods) == len(self.counts)
         return LikelihoodTreeLeaf(
@@ -177,10 +391,13 @@ class _PyLikelihoodTreeEdge(_LikelihoodTreeEdge):
     LOG_BASE = numpy.log(BASE)
 
     def sum_input_likelihoodsR(self, result, *likelihoods):
+        self._sum_inputs(self.indexes, result, likelihoods)
+        return result
+
+    def _sum_inputs(self, indexes, result, likelihoods):
         result[:] = 1.0
-        for (i, index) in enumerate(self.indexes):
+        for (i, index) in enumerate(indexes):
             result *= numpy.take(likelihoods[i], index, 0)
-        return result
 
     # For root
 
@@ -195,11 +412,12 @@ class _PyLikelihoodTreeEdge(_LikelihoodTreeEdge):
         return numpy.log(sum(state_probs)) + exponent * self.LOG_BASE
 
     def get_total_log_likelihood(self, input_likelihoods, mprobs):
-        lhs = numpy.inner(input_likelihoods, mprobs)
+        lhs = scaled_inner(input_likelihoods, mprobs)
         return self.get_log_sum_across_sites(lhs)
 
     def get_log_sum_across_sites(self, lhs):
-        return numpy.inner(numpy.log(lhs), self.counts)
+        total = numpy.inner(numpy.log(numpy.asarray(lhs)), self.counts)
+        return total + self._log_scale_total(lhs)
 
 
 class _PyxLikelihoodTreeEdge(_LikelihoodTreeEdge):
@@ -207,19 +425,53 @@ class _PyxLikelihoodTreeEdge(_LikelihoodTreeEdge):
     float_type = numerictypes(float)  # match checkArrayDouble1D/2D
 
     def sum_input_likelihoodsR(self, result, *likelihoods):
-        pyrex.sum_input_likelihoods(self.indexes, result, likelihoods)
+        self._sum_inputs(self.indexes, result, likelihoods)
         return result
 
+    def _sum_inputs(self, indexes, result, likelihoods):
+        pyrex.sum_input_likelihoods(indexes, result, likelihoods)
+
+    def _min_row_sum(self, likelihoods):
+        return pyrex.min_row_sum(likelihoods)
+
     # For root
 
     def log_dot_reduce(self, patch_probs, switch_probs, plhs):
         return pyrex.log_dot_reduce(self.index, patch_probs, switch_probs, plhs)
 
     def get_total_log_likelihood(self, input_likelihoods, mprobs):
-        return pyrex.get_total_log_likelihood(self.counts, input_likelihoods, mprobs)
+        plain = numpy.asarray(input_likelihoods)
+        blocks = self._site_blocks()
+        if len(blocks) == 1:
+            total = pyrex.get_total_log_likelihood(self.counts, plain, mprobs)
+        else:
+
+            def block_total(rows):
+                return pyrex.get_total_log_likelihood(
+                    self.counts[rows], plain[rows], mprobs
+                )
+
+            total = sum(_get_thread_pool(self.threads).map(block_total, blocks))
+        return total + self._log_scale_total(input_likelihoods)
+
+    def get_log_sum_across_sites(self, lhs):
+        total = pyrex.get_log_sum_across_sites(self.counts, numpy.asarray(lhs))
+        return total + self._log_scale_total(lhs)
+
+
+class _SinglePrecisionLikelihoodTreeEdge(_PyLikelihoodTreeEdge):
+    """Partial likelihoods are stored, and multiplied, in single precision,
+    halving memory use. The sum of log likelihoods across sites is
+    accumulated in double precision."""
+
+    float_type = numpy.float32
+    # sites are rescaled at every edge, as the float32 exponent range is
+    # small and arithmetic on subnormal values is very slow
+    _scaling_threshold = 1.0
 
     def get_log_sum_across_sites(self, lhs):
-        return pyrex.get_log_sum_across_sites(self.counts, lhs)
+        log_lhs = numpy.log(numpy.asarray(lhs, numpy.float64))
+        return numpy.inner(log_lhs, self.counts) + self._log_scale_total(lhs)
 
 
 if pyrex is None:
@@ -230,6 +482,12 @@ else:
 FLOAT_TYPE = LikelihoodTreeEdge.float_type
 INTEGER_TYPE = LikelihoodTreeEdge.integer_type
 
+# likelihood tree edge classes for the supported precisions
+EDGE_TYPES = {
+    "double": LikelihoodTreeEdge,
+    "single": _SinglePrecisionLikelihoodTreeEdge,
+}
+
 
 def _indexed(values):
     # >>> _indexed(['a', 'b', 'c', 'a', 'a'])
@@ -296,6 +554,18 @@ class LikelihoodTreeLeaf(object):
         self.shape = likelihoods.shape
         self.ambig = numpy.sum(self.input_likelihoods, axis=-1)
 
+    def astype(self, float_type):
+        """returns a copy with likelihoods of float_type"""
+        return self.__class__(
+            self.uniq,
+            self.input_likelihoods.astype(float_type),
+            self.counts,
+            self.index,
+            self.edge_name,
+            self.alphabet,
+            getattr(self, "sequence", None),
+        )
+
     def backward(self):
         index = numpy.array(self.index[::-1, ...])
         result = self.__class__(
@@ -12,6 +12,7 @@ import numpy
 
 from cogent3.align import dp_calculation
 from cogent3.align.pairwise import AlignableSeq
+from cogent3.core.alignment import ArrayAlignment
 from cogent3.core.tree import TreeError
 from cogent3.evolve import likelihood_calculation
 from cogent3.evolve.likelihood_function import LikelihoodFunction as _LF
@@ -202,7 +203,11 @@ class _LikelihoodParameterController(_LF):
         self.set_param_rule("expm", is_constant=True, value=expm)
 
     def make_calculator(self, **kw):
-        return super(_LF, self).make_calculator(**kw)
+        calc = super(_LF, self).make_calculator(**kw)
+        calc.partial_derivatives = likelihood_calculation.make_edge_length_derivatives(
+            self.defn_for
+        )
+        return calc
 
     def _process_scope_info(
         self,
@@ -489,7 +494,13 @@ class AlignmentLikelihoodFunction(_LikelihoodParameterController):
         except KeyError:
             pass
 
-    def make_likelihood_defn(self, sites_independent=True, discrete_edges=None):
+    def make_likelihood_defn(
+        self,
+        sites_independent=True,
+        discrete_edges=None,
+        precision="double",
+        threads=1,
+    ):
         defns = self.model.make_param_controller_defns(bin_names=self.bin_names)
         if discrete_edges is not None:
             from .discrete_markov import PartialyDiscretePsubsDefn
@@ -506,6 +517,8 @@ class AlignmentLikelihoodFunction(_LikelihoodParameterController):
             self.bin_names,
             self.locus_names,
             sites_independent,
+            precision=precision,
+            threads=threads,
         )
 
     def set_alignment(self, aligns, motif_pseudocount=None):
@@ -537,6 +550,68 @@ class AlignmentLikelihoodFunction(_LikelihoodParameterController):
                         pseudocount=motif_pseudocount,
                     )
 
+    def get_log_likelihoods(self, aligns, locus=None):
+        """returns the log-likelihood of each alignment under the current
+        parameter values
+
+        Parameters
+        ----------
+        aligns
+            series of alignments with the same sequence names as the tree tips
+        locus
+            name of the locus whose parameter values are used
+
+        Notes
+        -----
+        The alignments are stacked so the partial likelihoods of their site
+        patterns are computed together, in one set of arrays, while the
+        substitution probability matrices are computed once. The alignment
+        (and motif probabilities) of the likelihood function are unchanged.
+
+        All alignments are evaluated at the same parameter values, this does
+        not fit them. Not available for likelihood functions made with
+        sites_independent=False, as the bin HMM couples adjacent sites.
+        """
+        if len(self.bin_names) > 1 and "bin_switch" in self.defn_for:
+            raise ValueError(
+                "get_log_likelihoods requires independent sites, not "
+                "sites_independent=False"
+            )
+
+        if len(self.locus_names) == 1:
+            locus = self.locus_names[0]
+        elif locus is None:
+            raise ValueError("a locus must be specified")
+
+        motif_len = self.model.get_alphabet().get_motif_len()
+        tip_names = self.tree.get_tip_names()
+        lengths = []
+        seqs = {name: [] for name in tip_names}
+        for aln in aligns:
+            assert not set(aln.names).symmetric_difference(tip_names), (
+                "Tree tip names %s and aln seq names %s don't match"
+                % (tip_names, aln.names)
+            )
+            length = len(aln) // motif_len
+            lengths.append(length)
+            for name in tip_names:
+                seq = str(aln.get_gapped_seq(name))
+                seqs[name].append(seq[: length * motif_len])
+
+        seqs = {name: "".join(seqs[name]) for name in tip_names}
+        stacked = ArrayAlignment(data=seqs, moltype=aligns[0].moltype)
+        original = self.get_param_value("alignment", locus=locus)
+        self.assign_all("alignment", {"locus": [locus]}, value=stacked, const=True)
+        try:
+            log_lhs = self.get_full_length_log_likelihoods(locus=locus)
+        finally:
+            self.assign_all(
+                "alignment", {"locus": [locus]}, value=original, const=True
+            )
+
+        bounds = numpy.cumsum([0] + lengths)
+        return [log_lhs[start:end].sum() for start, end in zip(bounds, bounds[1:])]
+
 
 class SequenceLikelihoodFunction(_LikelihoodParameterController):
     def set_default_param_rules(self):
@@ -68,6 +68,75 @@ def random_sequence(random_series, motif_probs, sequence_length):
     return [getRootRandomMotif() for i in range(sequence_length)]
 
 
+def numpy_random_state(random_series):
+    """a numpy RandomState seeded from random_series, so simulations using
+    either are reproducible from the same seed"""
+    return numpy.random.RandomState(int(random_series.uniform(0, 2 ** 32)))
+
+
+def cumulative_probs(probs):
+    """cumulative sums along the last axis of probs, each ending in 1.0"""
+    result = numpy.add.accumulate(numpy.maximum(probs, 0.0), axis=-1)
+    assert (abs(result[..., -1] - 1.0) < 1e-6).all(), probs
+    result[..., -1] = 1.0
+    return result
+
+
+def picks(cumulative, rows, uniforms):
+    """indices of the states picked by uniforms from the rows of cumulative.
+
+    Parameters
+    ----------
+    cumulative
+        2D array of cumulative probabilities, one row per distribution
+    rows
+        int array, the row of cumulative to pick from for each uniform
+    uniforms
+        array of random values in [0, 1)
+
+    Returns
+    -------
+    int array the shape of uniforms
+    """
+    (num_rows, num_states) = cumulative.shape
+    # row i is offset into [i, i+1] so all rows are searched at once
+    offset = (cumulative + numpy.arange(num_rows)[:, None]).ravel()
+    result = numpy.searchsorted(offset, rows + uniforms, side="right")
+    result -= rows * num_states
+    # guards against rows + uniforms rounding up to rows + 1
+    return numpy.minimum(result, num_states - 1, out=result)
+
+
+def evolve_states(psubs, parent_states, site_bins, random_state):
+    """states derived from parent_states, using psubs[site_bins[i]] for
+    site i. All sites of all replicates are picked at once.
+
+    Parameters
+    ----------
+    psubs
+        array of substitution probability matrices, one per bin
+    parent_states
+        int array, motif indices, last axis is sites
+    site_bins
+        int array of bin indices, broadcastable to parent_states
+    random_state
+        numpy RandomState
+    """
+    psubs = numpy.asarray(psubs)
+    num_states = psubs.shape[-1]
+    cumulative = cumulative_probs(psubs).reshape(-1, num_states)
+    rows = site_bins * num_states + parent_states
+    uniforms = random_state.random_sample(parent_states.shape)
+    return picks(cumulative, rows, uniforms)
+
+
+def random_states(motif_probs, shape, random_state):
+    """int array of motif indices drawn from motif_probs"""
+    cumulative = cumulative_probs(numpy.asarray(motif_probs))[None, :]
+    uniforms = random_state.random_sample(shape)
+    return picks(cumulative, numpy.zeros(shape, int), uniforms)
+
+
 class AlignmentEvolver(object):
     # Encapsulates settings that are constant throughout the recursive generation
     # of a synthetic alignment.
@@ -83,64 +152,64 @@ class AlignmentEvolver(object):
         motifs,
     ):
         self.random_series = random_series
+        self.random_state = numpy_random_state(random_series)
         self.orig_ambig = orig_ambig
         self.exclude_internal = exclude_internal
         self.bin_names = bin_names
-        self.site_bins = site_bins
+        self.site_bins = numpy.asarray(site_bins)
         self.psub_for = psub_for
         self.motifs = motifs
 
     def __call__(self, tree, root_sequence):
-        # probsd = dict(enumerate(self.bin_probs))
-        # bprobs = _randomMotifGenerator(self.random_series, probsd)
-        # site_bins = [bprobs.next() for c in range(len(root_sequence))]
         return self.generate_simulated_seqs(tree, root_sequence)
 
-    def generate_simulated_seqs(self, parent, parent_seq):
-        """recursively generate the descendant sequences by descending the tree
-        from root.
-        Each child will be set by mutating the parent motif based on the probs
-        in the psub matrix of this edge.
+    def generate_simulated_states(self, parent, parent_states):
+        """recursively generate the descendant states by descending the tree
+        from root. All sites, and replicates, of a child are drawn at once
+        from the psub matrix rows for the parent states.
 
-        random_series - get a random numer 0-1 by calling random_series.random()
-        length - the desired alignment length
         parent - the edge structure.
-        parent_seq - the corresponding sequence. This will be mutated for each
-        of its children, based on their psub matricies.
-        """
-
-        # This depends on parameter names 'mprobs', 'alignment2', 'bprobs' and
-        # 'psubs'.  Might be better to integrate it into likelihood_calculation.
+        parent_states - int array of motif indices, the last axis being
+        sites and any preceding axes replicates. self.site_bins must be
+        broadcastable to it.
 
+        Returns a dict of name: states array
+        """
         if self.exclude_internal and parent.children:
-            simulated_sequences = {}
+            simulated_states = {}
         else:
-            simulated_sequences = {parent.name: "".join(parent_seq)}
+            simulated_states = {parent.name: parent_states}
 
         for edge in parent.children:
-            # The result for this edge - a list of motifs
-
-            # Keep original ambiguity codes
-            if edge.name in self.orig_ambig:
-                orig_seq_ambig = self.orig_ambig[edge.name]
-            else:
-                orig_seq_ambig = {}
-
-            # Matrix of substitution probabilities
             psubs = [self.psub_for(edge.name, bin) for bin in self.bin_names]
-
-            # Make the semi-random sequence for this edge.
-            edge_seq = evolve_sequence(
-                self.random_series,
-                self.motifs,
-                parent_seq,
-                self.site_bins,
-                psubs,
-                orig_seq_ambig,
+            edge_states = evolve_states(
+                psubs, parent_states, self.site_bins, self.random_state
             )
+            descendant_states = self.generate_simulated_states(edge, edge_states)
+            simulated_states.update(descendant_states)
 
-            # Pass this new edge sequence on down the tree
-            descendant_sequences = self.generate_simulated_seqs(edge, edge_seq)
-            simulated_sequences.update(descendant_sequences)
+        return simulated_states
 
+    def generate_simulated_seqs(self, parent, parent_seq):
+        """recursively generate the descendant sequences by descending the tree
+        from root.
+        Each child will be set by mutating the parent motif based on the probs
+        in the psub matrix of this edge.
+
+        parent - the edge structure.
+        parent_seq - the corresponding sequence, as a series of motifs.
+
+        Returns a dict of name: sequence string, with the original ambiguity
+        codes of the sequences preserved.
+        """
+        index = {m: i for (i, m) in enumerate(self.motifs)}
+        parent_states = numpy.array([index[m] for m in parent_seq], int)
+        simulated_states = self.generate_simulated_states(parent, parent_states)
+        motifs = numpy.array(self.motifs, dtype=object)
+        simulated_sequences = {}
+        for (name, states) in simulated_states.items():
+            seq = list(motifs[states])
+            for (i, motif) in self.orig_ambig.get(name, {}).items():
+                seq[i] = motif
+            simulated_sequences[name] = "".join(seq)
         return simulated_sequences
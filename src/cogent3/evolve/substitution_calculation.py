@@ -103,3 +103,31 @@ class ExpDefn(CalculationDefn):
             return eigen
         else:
             return _EigenPade(eigen=eigen)
+
+
+class QdDefn(CallDefn):
+    """A rate matrix prepared for exponentiation, eg: by eigen decomposition.
+    These are expensive, so are kept in the calculator's evaluation cache."""
+
+    name = "Qd"
+    cached = True
+
+
+class PsubsDefn(CallDefn):
+    """P=exp(Q*t) from an exponentiator and a distance. Cells sharing an
+    exponentiator are evaluated with one stacked exponentiation."""
+
+    name = "psubs"
+
+    def batch_calc(self, args_list):
+        groups = {}
+        for (i, (expm, distance)) in enumerate(args_list):
+            groups.setdefault(id(expm), []).append(i)
+
+        results = [None] * len(args_list)
+        for indices in groups.values():
+            expm = args_list[indices[0]][0]
+            psubs = expm.stacked([args_list[i][1] for i in indices])
+            for (i, psub) in zip(indices, psubs):
+                results[i] = psub
+        return results
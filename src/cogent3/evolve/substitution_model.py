@@ -56,6 +56,8 @@ from cogent3.evolve.substitution_calculation import (
     NonParamDefn,
     PartitionDefn,
     ProductDefn,
+    PsubsDefn,
+    QdDefn,
     RateDefn,
     SelectForDimension,
 )
@@ -319,7 +321,18 @@ class _SubstitutionModel(object):
         space=None,
         **kw,
     ):
-
+        """
+        Parameters
+        ----------
+        tree
+            a cogent3 tree
+        kw
+            passed to the likelihood function constructor, including
+            bins, loci, sites_independent, precision ('double' or 'single',
+            the precision of the partial likelihoods) and threads (the
+            number of threads the site patterns are divided between, None
+            for all CPUs).
+        """
         if motif_probs_from_align is None:
             motif_probs_from_align = self.motif_probs_from_align
 
@@ -591,7 +604,7 @@ class _ContinuousSubstitutionModel(_SubstitutionModel):
         Q = CalcDefn(self.calcQ, name="Q")(word_probs, mprobs_matrix, *rate_params)
         expm = NonParamDefn("expm")
         exp = ExpDefn(expm)
-        Qd = CallDefn(exp, Q, name="Qd")
+        Qd = QdDefn(exp, Q)
         return Qd
 
     def _make_bin_param_defn(self, edge_par_name, bin_par_name, bprob_defn):
@@ -653,7 +666,7 @@ class _ContinuousSubstitutionModel(_SubstitutionModel):
         self, word_probs, mprobs_matrix, distance, rate_params
     ):
         Qd = self.make_Qd_defn(word_probs, mprobs_matrix, rate_params)
-        P = CallDefn(Qd, distance, name="psubs")
+        P = PsubsDefn(Qd, distance)
         return P
 
 
@@ -64,6 +64,26 @@ class TransitionMatrix(object):
             x = random_series.uniform(0.0, 1.0)
             state = bisect.bisect_left(partitions[state], x)
 
+    def emit_many(self, num_series, length, random_state):
+        """Generates num_series independent sequences of states, returned as
+        a 2D array of state indices. Steps along the sequences in turn,
+        drawing the next state of every series at once."""
+        partitions = numpy.add.accumulate(self.Matrix, axis=1)
+        stationary = numpy.add.accumulate(self.StationaryProbs)
+        uniforms = random_state.random_sample((length, num_series))
+        result = numpy.zeros((length, num_series), int)
+        # the minimum guards against probabilities summing to slightly less
+        # than 1
+        last = self.size - 1
+        if length:
+            state = numpy.searchsorted(stationary, uniforms[0], side="right")
+            result[0] = numpy.minimum(state, last)
+        for i in range(1, length):
+            rows = partitions[result[i - 1]]
+            state = (rows <= uniforms[i][:, None]).sum(axis=1)
+            result[i] = numpy.minimum(state, last)
+        return result.T
+
     def __repr__(self):
         from cogent3.util.table import Table
 
@@ -33,6 +33,14 @@ class _Exponentiator:
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, repr(self.Q))
 
+    def derivative(self, t):
+        """dP/dt, the derivative of P=exp(Q*t) with respect to t"""
+        return numpy.dot(self.Q, self(t))
+
+    def stacked(self, ts):
+        """P=exp(Q*t) for each t in ts, as an array of shape (len(ts), n, n)"""
+        return numpy.array([self(t) for t in ts])
+
 
 class EigenExponentiator(_Exponentiator):
     """A matrix ready for fast exponentiation.  P=exp(Q*t)"""
@@ -54,6 +62,23 @@ class EigenExponentiator(_Exponentiator):
         result = numpy.maximum(result, 0.0)
         return result
 
+    def stacked(self, ts):
+        """P=exp(Q*t) for each t in ts, as an array of shape (len(ts), n, n)"""
+        exp_roots = numpy.exp(numpy.multiply.outer(ts, self.roots))
+        result = numpy.matmul(self.evT * exp_roots[:, numpy.newaxis, :], self.evI.T)
+        if result.dtype.kind == "c":
+            result = numpy.asarray(result.real)
+        result = numpy.maximum(result, 0.0)
+        return result
+
+    def derivative(self, t):
+        """dP/dt, the derivative of P=exp(Q*t) with respect to t"""
+        exp_roots = self.roots * numpy.exp(t * self.roots)
+        result = numpy.inner(self.evT * exp_roots, self.evI)
+        if result.dtype.kind == "c":
+            result = numpy.asarray(result.real)
+        return result
+
 
 def SemiSymmetricExponentiator(motif_probs, Q):
     """Like EigenExponentiator, but more numerically stable and
@@ -10,6 +10,7 @@ import numpy
 
 from cogent3.util import progress_display as UI
 
+from .quasi_newton import LBFGS
 from .scipy_optimisers import Powell
 from .simannealingoptimiser import SimulatedAnnealing
 
@@ -17,6 +18,9 @@ from .simannealingoptimiser import SimulatedAnnealing
 GlobalOptimiser = SimulatedAnnealing
 LocalOptimiser = Powell
 
+# choices for the local_method argument of maximise
+LocalOptimisers = {"powell": Powell, "lbfgs": LBFGS}
+
 __author__ = "Peter Maxwell"
 __copyright__ = "Copyright 2007-2019, The Cogent Project"
 __credits__ = ["Andrew Butterfield", "Peter Maxwell", "Gavin Huttley"]
@@ -54,7 +58,11 @@ class MaximumEvaluationsReached(Exception):
 # adapt it to the optimiser in various ways.  They can be combined.
 
 
-def limited_use(f, max_evaluations=None):
+def limited_use(f, max_evaluations=None, gradient=None):
+    """Returns get_best and f, and gradient if provided, wrapped to share
+    one count of evaluations. A gradient call counts as one evaluation per
+    dimension of x, the cost of estimating it by forward differences, and
+    is refused if that would exceed max_evaluations."""
     if max_evaluations is None:
         max_evaluations = numpy.inf
     evals = [0]
@@ -71,11 +79,19 @@ def limited_use(f, max_evaluations=None):
             best_x[0] = x.copy()
         return fval
 
+    def wrapped_gradient(x):
+        if evals[0] + numpy.size(x) > max_evaluations:
+            raise MaximumEvaluationsReached(evals[0])
+        evals[0] += numpy.size(x)
+        return gradient(x)
+
     def get_best():
         f(best_x[0])  # for calculator, ensure best last
         return best_fval[0], best_x[0], evals[0]
 
-    return get_best, wrapped_f
+    if gradient is None:
+        return get_best, wrapped_f, None
+    return get_best, wrapped_f, wrapped_gradient
 
 
 def bounded_function(f, lower_bounds, upper_bounds, report_error=False):
@@ -122,6 +138,14 @@ def minimise(f, *args, **kw):
     def nf(x):
         return -1 * f(x)
 
+    gradient = kw.get("gradient", None)
+    if gradient is not None:
+
+        def ngradient(x):
+            return -1 * numpy.asarray(gradient(x))
+
+        kw["gradient"] = ngradient
+
     return maximise(nf, *args, **kw)
 
 
@@ -140,19 +164,32 @@ def maximise(
     global_tolerance=1e-1,
     ui=None,
     return_eval_count=False,
+    local_method=None,
+    gradient=None,
     **kw,
 ):
     """Find input values that optimise this function.
     'local' controls the choice of optimiser, the default being to run
     both the global and local optimisers. 'filename' and 'interval'
-    control checkpointing.  Unknown keyword arguments get passed on to
-    the global optimiser.
+    control checkpointing. 'local_method' selects the local optimiser,
+    'powell' (the default) or 'lbfgs', the latter using the function
+    'gradient' if provided, numerical derivatives otherwise.  Unknown
+    keyword arguments get passed on to the global optimiser.
     """
     do_global = (not local) or local is None
     do_local = local or local is None
 
+    if local_method is None:
+        local_optimiser = LocalOptimiser
+    elif local_method.lower() in LocalOptimisers:
+        local_optimiser = LocalOptimisers[local_method.lower()]
+    else:
+        raise ValueError(
+            f"local_method must be one of {list(LocalOptimisers)}, not {local_method!r}"
+        )
+
     assert limit_action in ["ignore", "warn", "raise", "error"]
-    (get_best, f) = limited_use(f, max_evaluations)
+    (get_best, f, gradient) = limited_use(f, max_evaluations, gradient)
 
     x = numpy.array(xinit, float)
     multidimensional_input = x.shape != ()
@@ -208,13 +245,17 @@ def maximise(
         if do_local:
             callback = unsteadyProgressIndicator(ui.display, "Local", gend, 1.0)
             # ui.display('local opt', 1.0-per_opt, per_opt)
-            opt = LocalOptimiser()
+            opt = local_optimiser()
+            opt_kw = {}
+            if isinstance(opt, LBFGS):
+                opt_kw = dict(gradient=gradient, bounds=bounds)
             x = opt.maximise(
                 f,
                 x,
                 tolerance=tolerance,
                 max_restarts=max_restarts,
                 show_remaining=callback,
+                **opt_kw,
             )
     finally:
         # ensure state of calculator reflects optimised result, or
@@ -230,3 +271,130 @@ def maximise(
         return x, evals
 
     return x
+
+
+class _StartOptimiser:
+    """optimises f from one starting point, for use by worker processes.
+    Returns (fval, x, evals) at the end point."""
+
+    def __init__(self, f, max_evaluations=None, **kw):
+        self.f = f
+        self.max_evaluations = max_evaluations
+        self.kw = kw
+
+    def __call__(self, start):
+        (x, kw) = start
+        kw = dict(self.kw, **kw)
+        (get_best, f, kw["gradient"]) = limited_use(
+            self.f, self.max_evaluations, kw.get("gradient")
+        )
+        try:
+            maximise(f, x, show_progress=False, **kw)
+        except MaximumEvaluationsReached:
+            pass
+        return get_best()
+
+
+@UI.display_wrap
+def maximise_from_starts(
+    f,
+    starts,
+    bounds=None,
+    method="multistart",
+    max_evaluations=None,
+    tolerance=1e-6,
+    global_tolerance=1e-1,
+    local_method=None,
+    gradient=None,
+    init_temp=5.0,
+    seed=None,
+    parallel=False,
+    par_kw=None,
+    ui=None,
+    **kw,
+):
+    """Optimise f from several starting points, then polish the best end
+    point with a local optimiser.
+
+    Parameters
+    ----------
+    f
+        the function to maximise. If parallel, it must be picklable.
+    starts
+        series of starting parameter vectors
+    bounds
+        (lower, upper) bounds vectors
+    method : str
+        'multistart' runs the local optimiser from each start to
+        global_tolerance. 'tempering' runs a simulated annealing chain from
+        each start, chain i with an initial temperature of init_temp * 2**i.
+    max_evaluations
+        limit on the function evaluations for each start
+    tolerance
+        tolerance of the final local optimisation
+    global_tolerance
+        tolerance of the optimisation from each start
+    seed
+        seeds the annealing chains, chain i using seed + i
+    parallel : bool
+        optimise from the starts in worker processes
+    par_kw
+        dict of values for configuring parallel execution, see
+        cogent3.util.parallel
+
+    Returns
+    -------
+    the optimised parameter vector and a list of (fval, x, evals) at the
+    end point of the optimisation from each start, in order of the starts.
+    Unknown keyword arguments are passed on to the optimisers. Reaching
+    max_evaluations ends the optimisation from a start, or the polishing
+    with a warning.
+    """
+    if method not in ("multistart", "tempering"):
+        raise ValueError(f"method must be 'multistart' or 'tempering', not {method!r}")
+    if seed is None:
+        seed = numpy.random.randint(2 ** 31)
+
+    common = dict(
+        bounds=bounds,
+        max_evaluations=max_evaluations,
+        tolerance=global_tolerance,
+        local_method=local_method,
+        gradient=gradient,
+        **kw,
+    )
+    if method == "multistart":
+        common["local"] = True
+        per_start = [{} for start in starts]
+    else:
+        common["local"] = False
+        per_start = [
+            dict(init_temp=init_temp * 2 ** i, seed=seed + i)
+            for i in range(len(starts))
+        ]
+
+    optimise_from = _StartOptimiser(f, **common)
+    starts = [(numpy.array(x, float), kw) for (x, kw) in zip(starts, per_start)]
+    end_points = list(ui.imap(optimise_from, starts, parallel=parallel, par_kw=par_kw))
+
+    best = max(range(len(end_points)), key=lambda i: end_points[i][0])
+    (get_best, polished, gradient) = limited_use(f, max_evaluations, gradient)
+    try:
+        maximise(
+            polished,
+            end_points[best][1],
+            bounds=bounds,
+            local=True,
+            tolerance=tolerance,
+            local_method=local_method,
+            gradient=gradient,
+            show_progress=False,
+        )
+    except MaximumEvaluationsReached as detail:
+        # keep the end points, which are the point of this function
+        warnings.warn(
+            "FORCED EXIT from local polishing after %s evaluations" % detail.args[0],
+            stacklevel=2,
+        )
+    (fval, x, evals) = get_best()
+    return x, end_points
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""A bounded limited memory quasi-Newton (L-BFGS) local optimiser.
+
+Search directions are computed from the gradient using the L-BFGS two-loop
+recursion, restricted to parameters not held at a bound. Steps are projected
+back into the bounds and accepted by a backtracking (Armijo) line search.
+If no gradient function is supplied, forward differences are used.
+"""
+import math
+
+import numpy
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Peter Maxwell", "Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Alpha"
+
+# sufficient decrease constant for the Armijo condition
+_ARMIJO = 1e-4
+_MAX_BACKTRACKS = 40
+_MAX_ITERATIONS = 10000
+
+
+def numerical_gradient(function, x, fval, lower, upper):
+    """forward difference approximation to the gradient of function at x,
+    stepping backwards where a forward step would cross an upper bound"""
+    x = numpy.array(x, float)
+    grad = numpy.zeros(len(x), float)
+    for i in range(len(x)):
+        step = 1.5e-8 * max(1.0, abs(x[i]))
+        if x[i] + step > upper[i]:
+            step = -step
+        orig = x[i]
+        x[i] = orig + step
+        grad[i] = (function(x) - fval) / step
+        x[i] = orig
+    return grad
+
+
+class LBFGS(object):
+    """Bounded limited memory BFGS. Has the same maximise() / minimise()
+    interface as the other local optimisers, with additional gradient and
+    bounds arguments."""
+
+    def __init__(self, memory=10):
+        """
+        Parameters
+        ----------
+        memory : int
+            the number of previous steps used to approximate the Hessian
+        """
+        self.memory = memory
+
+    def maximise(self, function, *args, **kw):
+        def nf(x):
+            return -1 * function(x)
+
+        gradient = kw.pop("gradient", None)
+        if gradient is not None:
+
+            def ngradient(x):
+                return -1 * numpy.asarray(gradient(x))
+
+            kw["gradient"] = ngradient
+
+        return self.minimise(nf, *args, **kw)
+
+    def minimise(
+        self,
+        function,
+        xopt,
+        show_remaining,
+        max_restarts=None,
+        tolerance=None,
+        gradient=None,
+        bounds=None,
+    ):
+        if max_restarts is None:
+            max_restarts = 0
+        if tolerance is None:
+            tolerance = 1e-6
+
+        xopt = numpy.array(xopt, float)
+        if len(xopt) == 0:
+            return xopt
+
+        lower, upper = (None, None) if bounds is None else bounds
+        lower = numpy.broadcast_to(
+            -numpy.inf if lower is None else numpy.asarray(lower, float), xopt.shape
+        )
+        upper = numpy.broadcast_to(
+            numpy.inf if upper is None else numpy.asarray(upper, float), xopt.shape
+        )
+        xopt = numpy.clip(xopt, lower, upper)
+
+        if gradient is None:
+
+            def gradient(x, fval):
+                return numerical_gradient(function, x, fval, lower, upper)
+
+        else:
+            _gradient = gradient
+
+            def gradient(x, fval):
+                return numpy.array(_gradient(x), float)
+
+        if show_remaining:
+
+            def callback(fcalls, x, fval, delta):
+                remaining = math.log(max(abs(delta) / tolerance, 1.0))
+                show_remaining(remaining, -fval, delta, fcalls)
+
+        else:
+            callback = None
+
+        fval_last = numpy.inf
+        for i in range(max_restarts + 1):
+            xopt, fval = self._minimise(
+                function, gradient, xopt, lower, upper, tolerance, callback
+            )
+            # same tolerance check as the other local optimisers
+            if abs(fval_last - fval) < tolerance:
+                break
+            fval_last = fval
+
+        return xopt
+
+    def _direction(self, grad, free, steps):
+        """two-loop recursion for the quasi-Newton direction, computed over
+        the free parameters only"""
+        q = numpy.where(free, grad, 0.0)
+        alphas = []
+        for s, y, rho in reversed(steps):
+            s = s * free
+            y = y * free
+            alpha = rho * s.dot(q)
+            q -= alpha * y
+            alphas.append(alpha)
+        if steps:
+            s, y, rho = steps[-1]
+            q *= s.dot(y) / y.dot(y)
+        else:
+            # steepest descent, with the largest step being 1
+            q /= max(1.0, numpy.abs(q).max())
+        for (s, y, rho), alpha in zip(steps, reversed(alphas)):
+            s = s * free
+            y = y * free
+            beta = rho * y.dot(q)
+            q += (alpha - beta) * s
+        return -q * free
+
+    def _minimise(self, f, gradient, x, lower, upper, tolerance, callback):
+        fcalls = 1
+        fx = f(x)
+        grad = gradient(x, fx)
+        steps = []
+        for iteration in range(_MAX_ITERATIONS):
+            # parameters at a bound that the gradient pushes beyond it are
+            # held fixed
+            free = ~(
+                ((x <= lower) & (grad > 0)) | ((x >= upper) & (grad < 0))
+            ) & numpy.isfinite(grad)
+            if not free.any() or numpy.abs(grad[free]).max() == 0.0:
+                break
+
+            direction = self._direction(grad, free, steps)
+            slope = grad.dot(direction)
+            if not slope < 0.0:
+                steps = []
+                direction = self._direction(grad, free, steps)
+                slope = grad.dot(direction)
+            elif -slope <= tolerance:
+                # predicted improvement is within tolerance
+                break
+
+            # backtracking line search along the projected path
+            alpha = 1.0
+            best = (fx, None)
+            for backtrack in range(_MAX_BACKTRACKS):
+                xnew = numpy.clip(x + alpha * direction, lower, upper)
+                fnew = f(xnew)
+                fcalls += 1
+                if fnew <= fx + _ARMIJO * grad.dot(xnew - x):
+                    break
+                if fnew > best[0] and best[1] is not None:
+                    # the gradient is a poor guide, eg. near a singularity at
+                    # a bound, and shorter steps are getting worse
+                    (fnew, xnew) = best
+                    steps = []
+                    break
+                if fnew < best[0]:
+                    best = (fnew, xnew)
+                if numpy.isfinite(fnew):
+                    # minimum of the quadratic interpolant, safeguarded
+                    denom = 2.0 * (fnew - fx - alpha * slope)
+                    trial = -slope * alpha * alpha / denom if denom > 0 else 0.0
+                    alpha = min(max(trial, 0.1 * alpha), 0.5 * alpha)
+                else:
+                    alpha *= 0.1
+            else:
+                if steps:
+                    # curvature information is misleading, start afresh
+                    steps = []
+                    continue
+                break
+
+            if not fnew < fx:
+                break
+
+            gnew = gradient(xnew, fnew)
+            s = xnew - x
+            y = gnew - grad
+            sy = s.dot(y)
+            if sy > 1e-10 * y.dot(y):
+                steps.append((s, y, 1.0 / sy))
+                if len(steps) > self.memory:
+                    steps.pop(0)
+
+            delta = fx - fnew
+            x, fx, grad = xnew, fnew, gnew
+            if callback is not None:
+                callback(fcalls, x, fx, delta)
+
+        return x, fx
@@ -7,6 +7,7 @@ __all__ = [
     "dialign",
     "ebi",
     "fasta",
+    "fasta_index",
     "gcg",
     "genbank",
     "gff",
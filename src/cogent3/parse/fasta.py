@@ -4,6 +4,8 @@ import re
 
 from collections.abc import Callable
 
+import numpy
+
 import cogent3
 
 from cogent3.core.info import Info
@@ -50,6 +52,201 @@ def is_blank(x):
 
 FastaFinder = LabeledRecordFinder(is_fasta_label, ignore=is_blank_or_comment)
 
+# number of characters read at a time by iter_fasta_records
+FASTA_CHUNK_SIZE = 2 ** 22
+
+# whitespace, other than newlines, that is stripped from line ends
+_line_whitespace = " \t\x0b\x0c"
+
+# the start of a label line, which may be indented
+_label_start = re.compile("\n[%s]*>" % _line_whitespace)
+_label_start_bytes = re.compile(_label_start.pattern.encode("ascii"))
+
+
+def _fasta_record(text, strict, label_to_name):
+    """returns (label, seq) from FASTA record text without the leading '>'
+
+    Returns None if the record has no sequence and strict is False."""
+    is_bytes = isinstance(text, (bytes, bytearray))
+    newline, comment = (b"\n", b"#") if is_bytes else ("\n", "#")
+    label, _, seq = text.partition(newline)
+    label = label.strip()
+    if is_bytes:
+        label = label.decode("utf-8")
+
+    if comment in seq:
+        seq = newline.join(
+            l for l in seq.split(newline) if not l.strip().startswith(comment)
+        )
+
+    if is_bytes:
+        seq = bytes(seq)
+        whitespace = _line_whitespace.encode("ascii")
+    else:
+        whitespace = _line_whitespace
+
+    if any(c in seq for c in whitespace):
+        # lines are stripped, internal whitespace is retained
+        seq = seq[:0].join(l.strip() for l in seq.split(newline))
+    else:
+        seq = seq.replace(newline, seq[:0])
+
+    if not seq:
+        if strict:
+            raise RecordError("Found label line without sequences: >%s" % label)
+        return None
+
+    return label_to_name(label), seq
+
+
+def _is_blank_or_comment_text(text):
+    """True if all lines in text are blank or comments"""
+    if isinstance(text, (bytes, bytearray)):
+        text = bytes(text).decode("utf-8")
+    return all(is_blank_or_comment(l.strip()) for l in text.splitlines())
+
+
+def _read_chunks(infile, chunk_size):
+    """yields successive chunks of chunk_size from infile"""
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_fasta_records(infile, strict=True, label_to_name=str, chunk_size=None):
+    """Yields successive (label, seq) tuples from a FASTA file
+
+    The file is read in chunks of chunk_size characters and record boundaries
+    identified within a chunk using str / bytes methods, so memory use is
+    bounded by the chunk size plus the largest record.
+
+    Parameters
+    ----------
+    infile
+        a file path, or an open file object. Paths are opened in binary mode.
+    strict : bool
+        raises RecordError when label or seq missing
+    label_to_name
+        callback applied to each label
+    chunk_size : int
+        number of characters read at a time, defaults to FASTA_CHUNK_SIZE
+
+    Returns
+    -------
+    seq is bytes if the file was opened in binary mode, str otherwise.
+    Sequence lines are stripped of whitespace and joined.
+    """
+    chunk_size = chunk_size or FASTA_CHUNK_SIZE
+    if isinstance(infile, str):
+        infile = open_(infile, mode="rb")
+        close_at_end = True
+    else:
+        close_at_end = False
+
+    # text preceding the first label line is not a record
+    before_first = [True]
+
+    def get_record(parts):
+        text = parts[0][:0].join(parts)
+        if before_first[0]:
+            before_first[0] = False
+            if strict and not _is_blank_or_comment_text(text):
+                raise RecordError("Found Fasta record without label line: %r" % text)
+            return None
+        return _fasta_record(text, strict, label_to_name)
+
+    parts = []
+    # whether the text since the last newline is only whitespace
+    line_start = True
+    sep = None
+    try:
+        for chunk in _read_chunks(infile, chunk_size):
+            if sep is None:
+                is_str = isinstance(chunk, str)
+                if is_str:
+                    sep, newline, carriage_return, label_char = (
+                        _label_start,
+                        "\n",
+                        "\r",
+                        ">",
+                    )
+                    whitespace = _line_whitespace
+                else:
+                    sep, newline, carriage_return, label_char = (
+                        _label_start_bytes,
+                        b"\n",
+                        b"\r",
+                        b">",
+                    )
+                    whitespace = _line_whitespace.encode("ascii")
+                parts = [chunk[:0]]
+
+            # universal newlines, as for files opened in text mode
+            chunk = chunk.replace(carriage_return, newline)
+            pieces = sep.split(chunk)
+            head = pieces[0].lstrip(whitespace)
+            if line_start and head[:1] == label_char:
+                # a record starts at the beginning of this chunk
+                record = get_record(parts)
+                if record is not None:
+                    yield record
+                parts = [head[1:]]
+            else:
+                parts.append(pieces[0])
+
+            for piece in pieces[1:]:
+                record = get_record(parts)
+                if record is not None:
+                    yield record
+                parts = [piece]
+
+            tail = chunk[chunk.rfind(newline) + 1 :]
+            line_start = (newline in chunk or line_start) and not tail.strip(whitespace)
+
+        if parts:
+            record = get_record(parts)
+            if record is not None:
+                yield record
+    finally:
+        if close_at_end:
+            infile.close()
+
+
+def iter_fasta_indices(
+    infile, alphabet, strict=True, label_to_name=str, chunk_size=None
+):
+    """Yields successive (label, indices) from a FASTA file
+
+    indices is a numpy array of the sequence characters converted to their
+    index in alphabet, with dtype alphabet.array_type (uint8 for the standard
+    nucleic acid and protein alphabets). As for sequence objects, lower case
+    characters are converted to upper case. Arguments otherwise as for
+    iter_fasta_records.
+
+    Raises KeyError with the first character not in alphabet.
+    """
+    lookup = numpy.full(256, -1, dtype=numpy.int16)
+    for index, char in enumerate(alphabet):
+        code = ord(char)
+        if code < 128:
+            lookup[code] = index
+    for code in range(ord("a"), ord("z") + 1):
+        lookup[code] = lookup[ord(chr(code).upper())]
+
+    array_type = getattr(alphabet, "array_type", None) or numpy.uint8
+    for label, seq in iter_fasta_records(
+        infile, strict=strict, label_to_name=label_to_name, chunk_size=chunk_size
+    ):
+        if isinstance(seq, str):
+            seq = seq.encode("utf-8")
+        indices = lookup.take(numpy.frombuffer(seq, dtype=numpy.uint8))
+        invalid = numpy.flatnonzero(indices < 0)
+        if len(invalid):
+            raise KeyError(chr(seq[invalid[0]]).upper())
+        yield label, indices.astype(array_type)
+
 
 def MinimalFastaParser(
     infile, strict=True, label_to_name=str, finder=FastaFinder, label_characters=">"
@@ -58,6 +255,20 @@ def MinimalFastaParser(
 
     If strict is True (default), raises RecordError when label or seq missing.
     """
+    if (
+        finder is FastaFinder
+        and label_characters == ">"
+        and (isinstance(infile, str) or hasattr(infile, "read"))
+    ):
+        # files are parsed in large chunks
+        for label, seq in iter_fasta_records(
+            infile, strict=strict, label_to_name=label_to_name
+        ):
+            if not isinstance(seq, str):
+                seq = seq.decode("utf-8")
+            yield label, seq
+        return
+
     try:
         infile = open_(infile)
         close_at_end = True
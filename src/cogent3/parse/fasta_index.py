@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""Random access to sequences in FASTA files via a samtools faidx style index.
+
+The index is a tab delimited file, conventionally the FASTA path with a
+'.fai' suffix, with one line per record containing
+
+    NAME  LENGTH  OFFSET  LINEBASES  LINEWIDTH
+
+where OFFSET is the byte offset of the first base, LINEBASES the number of
+bases on each line and LINEWIDTH the number of bytes per line, including the
+line terminator. As with samtools, all sequence lines of a record other than
+the last must have the same length. Unlike samtools, which truncates labels at
+the first whitespace, NAME is the whole label, as for the FASTA parsers.
+"""
+import os
+
+from collections import namedtuple
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+FASTA_INDEX_SUFFIX = "fai"
+
+FastaIndexRecord = namedtuple(
+    "FastaIndexRecord", ("name", "length", "offset", "linebases", "linewidth")
+)
+
+_compression_suffixes = ("gz", "bz2", "zip")
+
+
+def _check_not_compressed(filename):
+    if str(filename).split(".")[-1] in _compression_suffixes:
+        raise ValueError(f"cannot index compressed file '{filename}'")
+
+
+def _make_index_record(name, offset, line_lengths, line_widths):
+    """returns FastaIndexRecord, validating line lengths are consistent"""
+    if not line_lengths:
+        return FastaIndexRecord(name, 0, offset, 0, 0)
+
+    linebases, linewidth = line_lengths[0], line_widths[0]
+    if any(l != linebases for l in line_lengths[:-1]) or any(
+        w != linewidth for w in line_widths[:-1]
+    ):
+        raise ValueError(f"'{name}' has lines of differing length, cannot index")
+    if line_lengths[-1] > linebases:
+        raise ValueError(f"'{name}' has lines of differing length, cannot index")
+    return FastaIndexRecord(name, sum(line_lengths), offset, linebases, linewidth)
+
+
+def iter_fasta_index(filename):
+    """yields FastaIndexRecord for each sequence in an uncompressed FASTA file
+
+    The record name is the label stripped of surrounding whitespace, as for
+    MinimalFastaParser.
+    """
+    _check_not_compressed(filename)
+    name = None
+    offset = position = 0
+    line_lengths, line_widths = [], []
+    seen_blank = False
+    with open(filename, "rb") as infile:
+        for line in infile:
+            width = len(line)
+            if b"\r" in line.rstrip(b"\r\n"):
+                raise ValueError(f"'{filename}' has carriage return line endings")
+            if line.startswith(b">"):
+                if name is not None:
+                    yield _make_index_record(name, offset, line_lengths, line_widths)
+                name = line[1:].strip().decode("utf-8")
+                if not name:
+                    raise ValueError(f"record without a name at byte {position}")
+                offset = position + width
+                line_lengths, line_widths = [], []
+                seen_blank = False
+            elif name is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if bases == 0:
+                    seen_blank = True
+                elif seen_blank:
+                    raise ValueError(f"'{name}' has blank lines, cannot index")
+                else:
+                    line_lengths.append(bases)
+                    line_widths.append(width)
+            position += width
+
+    if name is not None:
+        yield _make_index_record(name, offset, line_lengths, line_widths)
+
+
+def make_fasta_index(filename):
+    """returns list of FastaIndexRecord for filename
+
+    Raises ValueError for duplicated names.
+    """
+    records = []
+    names = set()
+    for record in iter_fasta_index(filename):
+        if record.name in names:
+            raise ValueError(f"duplicate sequence name '{record.name}'")
+        names.add(record.name)
+        records.append(record)
+    return records
+
+
+def write_fasta_index(filename, index_path=None):
+    """writes a faidx style index for filename
+
+    Parameters
+    ----------
+    filename : str
+        path to an uncompressed FASTA file
+    index_path : str
+        path to write index to, defaults to filename + '.fai'
+
+    Returns
+    -------
+    list of FastaIndexRecord
+    """
+    index_path = index_path or f"{filename}.{FASTA_INDEX_SUFFIX}"
+    records = make_fasta_index(filename)
+    with open(index_path, "w") as outfile:
+        for record in records:
+            outfile.write("\t".join(map(str, record)) + "\n")
+    return records
+
+
+def read_fasta_index(index_path):
+    """returns list of FastaIndexRecord from a faidx style index file"""
+    records = []
+    with open(index_path) as infile:
+        for line in infile:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            fields = line.split("\t")
+            # samtools writes an extra column for FASTQ files
+            name, numbers = fields[0], list(map(int, fields[1:5]))
+            records.append(FastaIndexRecord(name, *numbers))
+    return records
+
+
+class IndexedFasta:
+    """read access to individual sequences, or parts of them, in a FASTA file
+
+    Sequences are read by seeking to their location using a faidx style
+    index, so memory use is independent of the number of sequences. The file
+    is opened on the first read and stays open until close() is called, the
+    instance is used as a context manager, or it is garbage collected.
+    """
+
+    def __init__(self, filename, index_path=None, build=True, write_index=False):
+        """
+        Parameters
+        ----------
+        filename : str
+            path to an uncompressed FASTA file
+        index_path : str
+            path to an existing index. If None, or the index is older than
+            filename, the index is built by reading filename.
+        build : bool
+            if False and there is no current index at index_path, raises a
+            ValueError
+        write_index : bool
+            if True, an index that is built is written to index_path, or
+            filename + '.fai' if index_path is None. Nothing is written
+            otherwise.
+        """
+        _check_not_compressed(filename)
+        filename = str(filename)
+        stale = (
+            index_path is None
+            or not os.path.exists(index_path)
+            or (os.path.getmtime(index_path) < os.path.getmtime(filename))
+        )
+        if stale and not build:
+            raise ValueError(f"no current index for '{filename}'")
+
+        if not stale:
+            records = read_fasta_index(index_path)
+        elif write_index:
+            index_path = index_path or f"{filename}.{FASTA_INDEX_SUFFIX}"
+            records = write_fasta_index(filename, index_path)
+        else:
+            records = make_fasta_index(filename)
+
+        self.filename = filename
+        self.index_path = index_path
+        self._records = {r.name: r for r in records}
+        self.names = [r.name for r in records]
+        self._file = None
+
+    def __getstate__(self):
+        # open files can't be pickled
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self._records
+
+    def __getitem__(self, name):
+        return self.get_seq(name)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.filename!r}, num_seqs={len(self)})"
+
+    def get_length(self, name):
+        """returns the length of the named sequence"""
+        return self._records[name].length
+
+    def get_lengths(self):
+        """returns {name: length, ...} for all sequences"""
+        return {n: r.length for n, r in self._records.items()}
+
+    def _byte_position(self, record, pos):
+        line, column = divmod(pos, record.linebases or 1)
+        return record.offset + line * record.linewidth + column
+
+    def get_seq(self, name, start=None, end=None):
+        """returns the sequence string, or the slice [start:end] of it
+
+        Parameters
+        ----------
+        name : str
+            sequence name
+        start, end : int
+            sequence coordinates, as for slicing a Python string
+        """
+        record = self._records[name]
+        start, end, _ = slice(start, end).indices(record.length)
+        if start >= end:
+            return ""
+
+        begin = self._byte_position(record, start)
+        stop = self._byte_position(record, end)
+        if self._file is None:
+            self._file = open(self.filename, "rb")
+        self._file.seek(begin)
+        data = self._file.read(stop - begin)
+        data = data.replace(b"\n", b"").replace(b"\r", b"")
+        return data.decode("utf-8")
+
+    def close(self):
+        """closes the FASTA file, it is reopened if sequences are read"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
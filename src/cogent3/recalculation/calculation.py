@@ -1,12 +1,21 @@
 #!/usr/bin/env python
 
 import os
+import random
+import sys
 import time
 import warnings
 
+from collections import OrderedDict
+from operator import itemgetter
+
 import numpy
 
-from cogent3.maths.optimisers import ParameterOutOfBoundsError, maximise
+from cogent3.maths.optimisers import (
+    ParameterOutOfBoundsError,
+    maximise,
+    maximise_from_starts,
+)
 from cogent3.maths.solve import find_root
 
 
@@ -16,6 +25,9 @@ Float = numpy.core.numerictypes.sctype2char(float)
 TRACE_DEFAULT = "COGENT3_TRACE" in os.environ
 TRACE_SCALE = 100000
 
+# default memory limit for the Calculator's cache of cell values
+CACHE_BYTES = 2 ** 25
+
 __author__ = "Peter Maxwell"
 __copyright__ = "Copyright 2007-2019, The Cogent Project"
 __credits__ = ["Peter Maxwell", "Gavin Huttley", "Daniel McDonald"]
@@ -34,6 +46,45 @@ class CalculationInterupted(Exception):
     pass
 
 
+def _attribute_values(value):
+    """the values of the attributes of value, those in __slots__ included"""
+    values = list(getattr(value, "__dict__", {}).values())
+    for cls in type(value).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = [slots]
+        for name in slots:
+            if name not in ("__dict__", "__weakref__") and hasattr(value, name):
+                values.append(getattr(value, name))
+    return values
+
+
+def _nbytes(value):
+    """approximate memory used by value, counting the arrays it holds"""
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    # arrays sharing memory, eg. a matrix and its transpose, count once
+    seen = set()
+    for attr in _attribute_values(value):
+        if isinstance(attr, numpy.ndarray):
+            owner = attr if attr.base is None else attr.base
+            if id(owner) not in seen:
+                seen.add(id(owner))
+                size += attr.nbytes
+    return size
+
+
+def _arg_getter(ranks):
+    """function returning the values at ranks of a list as a sequence"""
+    ranks = list(ranks)
+    start = ranks[0] if ranks else 0
+    if ranks == list(range(start, start + len(ranks))):
+        # contiguous, including single arguments, so a slice
+        return itemgetter(slice(start, start + len(ranks)))
+    return itemgetter(*ranks)
+
+
 class OptPar(object):
     """One parameter, as seen by the optimiser, eg: length of one edge.
     An OptPar reports changes to the ParameterValueSet for its parameter.
@@ -128,13 +179,31 @@ class EvaluatedCell(object):
         "consequences",
         "recycled",
         "default",
+        "batch_calc",
+        "cached",
+        "key_ranks",
     ]
 
-    def __init__(self, name, calc, args, recycling=None, default=None):
+    def __init__(
+        self,
+        name,
+        calc,
+        args,
+        recycling=None,
+        default=None,
+        batch_calc=None,
+        cached=False,
+    ):
         self.name = name
         self.rank = None
         self.calc = calc
         self.default = default
+        # evaluates a list of argument lists for cells sharing batch_calc
+        self.batch_calc = None if recycling else batch_calc
+        # recycled results are overwritten, so cannot be kept
+        self.cached = cached and not recycling
+        # ranks of the OptPars this cell depends on
+        self.key_ranks = ()
         self.args = tuple(args)
 
         self.recycled = recycling
@@ -199,7 +268,15 @@ class Calculator(object):
     """A complete hierarchical function with N evaluation steps to call
     for each change of inputs.  Made by a ParameterController."""
 
-    def __init__(self, cells, defns, trace=None, with_undo=True):
+    def __init__(
+        self,
+        cells,
+        defns,
+        trace=None,
+        with_undo=True,
+        cache_bytes=CACHE_BYTES,
+        compiled=False,
+    ):
         if trace is None:
             trace = TRACE_DEFAULT
         self.with_undo = with_undo
@@ -251,10 +328,34 @@ class Calculator(object):
                 arg.consequences[cell.rank] = True
                 arg.consequences.update(cell.consequences)
 
+        # The values of cached cells are kept, keyed by the values of the
+        # OptPars they depend on, up to cache_bytes in total. The least
+        # recently used are discarded first.
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self.cache_hits = self.cache_misses = 0
+        key_ranks = {
+            cell.rank: []
+            for cell in self._cells
+            if isinstance(cell, EvaluatedCell) and cell.cached
+        }
+        for opt_par in self.opt_pars:
+            for rank in opt_par.consequences:
+                if rank in key_ranks:
+                    key_ranks[rank].append(opt_par.rank)
+        for (rank, ranks) in key_ranks.items():
+            self._cells[rank].key_ranks = tuple(ranks)
+
         self._programs = {}
+        self._batched_programs = {}
+        self._plans = {}
+        self.compiled = False
         # Just for timings pre-calc these
         for opt_par in self.opt_pars:
             self.cells_changed_by([(opt_par.rank, None)])
+        if compiled:
+            self.compile()
 
         self.last_values = self.get_value_array()
         self.last_undo = []
@@ -262,6 +363,18 @@ class Calculator(object):
         self.evaluations = 0
         self.set_tracing(trace)
         self.optimised = False
+        # optional function(calculator) returning {opt_par rank: derivative}
+        # of the output with respect to the parameter value
+        self.partial_derivatives = None
+
+    def __getstate__(self):
+        # batched programs and plans are keyed by the id of their program,
+        # and plans hold closures, so they are rebuilt as needed instead
+        state = self.__dict__.copy()
+        state.update(
+            _batched_programs={}, _plans={}, _cache=OrderedDict(), _cache_size=0
+        )
+        return state
 
     def graphviz(self):
         """Returns a string in the 'dot' graph description language used by the
@@ -310,8 +423,61 @@ class Calculator(object):
     def optimise(self, **kw):
         x = self.get_value_array()
         bounds = self.get_bounds_vectors()
-        maximise(self, x, bounds, **kw)
+        maximise(self, x, bounds, gradient=self.gradient, **kw)
+        self.optimised = True
+
+    def optimise_from_starts(self, num_starts=4, seed=None, **kw):
+        """Optimises from the current values and num_starts - 1 fuzzed
+        copies of them, then polishes the best end point locally. Other
+        arguments are passed to maximise_from_starts. Returns the
+        (fval, x, evals) end point from each start."""
+        random_series = random.Random(seed)
+        x = self.get_value_array()
+        starts = [x]
+        for i in range(num_starts - 1):
+            self.fuzz(random_series)
+            starts.append(self.get_value_array())
+        self.testoptparvector(x)
+        bounds = self.get_bounds_vectors()
+        (x, end_points) = maximise_from_starts(
+            self, starts, bounds, seed=seed, gradient=self.gradient, **kw
+        )
         self.optimised = True
+        return end_points
+
+    def gradient(self, values=None):
+        """Returns the partial derivatives of the output with respect to
+        each optimiser value. Derivatives not provided analytically by
+        self.partial_derivatives are estimated by forward differences, each
+        costing one recalculation of the consequences of one parameter."""
+        if values is not None:
+            self.testoptparvector(values)
+        x = list(self.last_values)
+        fval = self.testfunction()
+        known = {}
+        if self.partial_derivatives is not None:
+            known = self.partial_derivatives(self)
+
+        grad = numpy.zeros([len(self.opt_pars)], Float)
+        for (i, opt_par) in enumerate(self.opt_pars):
+            if i in known:
+                # chain rule, from parameter value to optimiser value
+                grad[i] = known[i]
+                if isinstance(opt_par, LogOptPar):
+                    grad[i] *= self._get_current_cell_value(opt_par)
+                continue
+
+            step = 1.5e-8 * max(1.0, abs(x[i]))
+            if x[i] + step > opt_par.get_optimiser_bounds()[1]:
+                step = -step
+            try:
+                grad[i] = (self.change([(i, x[i] + step)]) - fval) / step
+            except (ParameterOutOfBoundsError, ArithmeticError):
+                self.change([(i, x[i])])
+                continue
+            # reverting the last change is free, via the undo cache
+            self.change([(i, x[i])])
+        return grad
 
     def set_tracing(self, trace=False):
         """With 'trace' true every evaluated is printed.  Useful for profiling
@@ -375,8 +541,6 @@ class Calculator(object):
         # Slight randomisation suitable for removing right-on-the-
         # ridge starting points before local optimisation.
         if random_series is None:
-            import random
-
             random_series = random.Random()
         if seed is not None:
             random_series.seed(seed)
@@ -440,11 +604,10 @@ class Calculator(object):
                 if data[rank] is not base[rank]:
                     self.spare[rank] = data[rank]
             data[:] = base[:]
-            for cell in program:
-                if cell.recycled:
-                    if data[cell.rank] is base[cell.rank]:
-                        data[cell.rank] = self.spare[cell.rank]
-                        assert data[cell.rank] is not base[cell.rank]
+            for rank in self._recycled_by(program):
+                if data[rank] is base[rank]:
+                    data[rank] = self.spare[rank]
+                    assert data[rank] is not base[rank]
         else:
             data = self.cell_values[self._switch]
 
@@ -458,6 +621,8 @@ class Calculator(object):
                 data[i] = self.opt_pars[i].transform_from_optimiser(v)
             else:
                 data[i] = v
+                # cached values are only keyed by OptPar values
+                self.clear_cache()
 
         try:
             if self.trace:
@@ -502,10 +667,134 @@ class Calculator(object):
             ]
         return program
 
+    def _recycled_by(self, program):
+        """ranks of the recycled cells in program"""
+        if self.compiled:
+            return self._plan(program)[1]
+        return [cell.rank for cell in program if cell.recycled]
+
+    def _batched(self, program):
+        """program with neighbouring cells that share a batch_calc grouped
+        into lists, to be evaluated in one call"""
+        key = id(program)
+        if key not in self._batched_programs:
+            steps = []
+            for cell in program:
+                if cell.batch_calc is None:
+                    steps.append(cell)
+                elif (
+                    steps
+                    and type(steps[-1]) == list
+                    and steps[-1][0].batch_calc == cell.batch_calc
+                ):
+                    steps[-1].append(cell)
+                else:
+                    steps.append([cell])
+            steps = [s[0] if type(s) == list and len(s) == 1 else s for s in steps]
+            self._batched_programs[key] = steps
+        return self._batched_programs[key]
+
+    def _cached_calc(self, cell, data):
+        """value of cell, from the evaluation cache if possible"""
+        key = (cell.rank,) + tuple([data[r] for r in cell.key_ranks])
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return self._cache[key][0]
+
+        self.cache_misses += 1
+        value = cell.calc(*[data[a] for a in cell.arg_ranks])
+        size = _nbytes(value)
+        if size <= self.cache_bytes:
+            self._cache[key] = (value, size)
+            self._cache_size += size
+            while self._cache_size > self.cache_bytes:
+                (old_value, old_size) = self._cache.popitem(last=False)[1]
+                self._cache_size -= old_size
+        return value
+
+    def clear_cache(self):
+        """discards all values held in the evaluation cache"""
+        self._cache.clear()
+        self._cache_size = 0
+
+    def compile(self):
+        """Subsequent evaluations follow flat plans made from each program,
+        with the argument ranks of every step resolved in advance."""
+        self.compiled = True
+        for program in self._programs.values():
+            self._plan(program)
+
+    def _plan(self, program):
+        """program as a list of (rank, calc, get_args, cell) steps, and the
+        ranks of its recycled cells. Steps which store their own results,
+        batches and cached cells, have a rank of None and a calc taking only
+        the data"""
+        key = id(program)
+        if key in self._plans:
+            return self._plans[key]
+
+        plan = []
+        for step in self._batched(program):
+            if type(step) == list:
+                plan.append((None, self._batch_step(step), None, step[0]))
+            elif step.cached:
+                plan.append((None, self._cached_step(step), None, step))
+            else:
+                get_args = _arg_getter(step.arg_ranks)
+                plan.append((step.rank, step.calc, get_args, step))
+        recycled = [cell.rank for cell in program if cell.recycled]
+        self._plans[key] = (plan, recycled)
+        return self._plans[key]
+
+    def _batch_step(self, cells):
+        ranks = [c.rank for c in cells]
+        getters = [_arg_getter(c.arg_ranks) for c in cells]
+        batch_calc = cells[0].batch_calc
+
+        def step(data):
+            results = batch_calc([get_args(data) for get_args in getters])
+            for (rank, result) in zip(ranks, results):
+                data[rank] = result
+
+        return step
+
+    def _cached_step(self, cell):
+        def step(data):
+            data[cell.rank] = self._cached_calc(cell, data)
+
+        return step
+
+    def compiled_update(self, program, data):
+        try:
+            for (rank, calc, get_args, cell) in self._plan(program)[0]:
+                if rank is None:
+                    calc(data)
+                else:
+                    data[rank] = calc(*get_args(data))
+        except ParameterOutOfBoundsError as detail:
+            raise CalculationInterupted(cell, detail)
+        except ArithmeticError as detail:
+            cell.report_error(detail, data)
+            raise CalculationInterupted(cell, detail)
+
     def plain_update(self, program, data):
+        if self.compiled:
+            return self.compiled_update(program, data)
         try:
-            for cell in program:
-                data[cell.rank] = cell.calc(*[data[a] for a in cell.arg_ranks])
+            for cell in self._batched(program):
+                if type(cell) != list:
+                    if cell.cached:
+                        data[cell.rank] = self._cached_calc(cell, data)
+                    else:
+                        args = [data[a] for a in cell.arg_ranks]
+                        data[cell.rank] = cell.calc(*args)
+                    continue
+                cells = cell
+                cell = cells[0]
+                args = [[data[a] for a in c.arg_ranks] for c in cells]
+                for (c, result) in zip(cells, cell.batch_calc(args)):
+                    data[c.rank] = result
         except ParameterOutOfBoundsError as detail:
             # Non-fatal error, just cancel this calculation.
             raise CalculationInterupted(cell, detail)
@@ -524,7 +813,10 @@ class Calculator(object):
         for cell in program:
             try:
                 t0 = time.time()
-                data[cell.rank] = cell.calc(*[data[a] for a in cell.arg_ranks])
+                if cell.cached:
+                    data[cell.rank] = self._cached_calc(cell, data)
+                else:
+                    data[cell.rank] = cell.calc(*[data[a] for a in cell.arg_ranks])
                 t1 = time.time()
             except (ParameterOutOfBoundsError, ArithmeticError) as exception:
                 error_cell = cell
@@ -557,18 +849,22 @@ class Calculator(object):
         else:
             print("%-15s | %s" % (repr(data[-1])[:15], par_descs))
 
-    def measure_evals_per_second(self, time_limit=1.0, wall=True, sa=False):
+    def measure_evals_per_second(
+        self, time_limit=1.0, wall=True, sa=False, cache_stats=False
+    ):
         # Returns an estimate of the number of evaluations per second
         # an each-optpar-in-turn simulated annealing type optimiser
         # can achive, spending not much more than 'time_limit' doing
         # so.  'wall'=False causes process time to be used instead of
         # wall time.
         # 'sa' makes it simulated-annealing-like, with frequent backtracks
+        # 'cache_stats' also returns the evaluation cache hits and misses
         if wall:
             now = time.time
         else:
-            now = time.clock
+            now = time.process_time
         x = self.get_value_array()
+        self.cache_hits = self.cache_misses = 0
         samples = []
         elapsed = 0.0
         rounds_per_sample = 2
@@ -599,9 +895,13 @@ class Calculator(object):
 
         if wall:
             samples.sort()
-            return samples[len(samples) // 2]
+            rate = samples[len(samples) // 2]
         else:
-            return sum(samples) / len(samples)
+            rate = sum(samples) / len(samples)
+
+        if cache_stats:
+            return rate, {"hits": self.cache_hits, "misses": self.cache_misses}
+        return rate
 
     def _get_current_cell_value(self, cell):
         return self.cell_values[self._switch][cell.rank]
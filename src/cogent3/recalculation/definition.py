@@ -128,6 +128,15 @@ class CalculationDefn(_NonLeafDefn):
 
     recycling = False
 
+    # optionally, a method that takes a list of argument lists, one per cell,
+    # and returns the list of their values. Used by the Calculator to
+    # evaluate the cells of this Defn that need updating in one call.
+    batch_calc = None
+
+    # whether the Calculator keeps previous values of this Defn's cells in
+    # its evaluation cache. Worthwhile for expensive steps.
+    cached = False
+
     # positional arguments are inputs to this step of the calculation,
     # keyword arguments are passed on to self.setup(), likely to end up
     # as static attributes of this CalculationDefn, to be used (as self.X)
@@ -145,7 +154,13 @@ class CalculationDefn(_NonLeafDefn):
     def make_cell(self, *args):
         calc = self.make_calc_function()
         cell = EvaluatedCell(
-            self.name, calc, args, recycling=self.recycling, default=self.default
+            self.name,
+            calc,
+            args,
+            recycling=self.recycling,
+            default=self.default,
+            batch_calc=self.batch_calc,
+            cached=self.cached,
         )
         return cell
 
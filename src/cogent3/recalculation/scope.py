@@ -814,8 +814,9 @@ class ParameterController(object):
         defn.assign_all(*args, **kw)
         self.update_intermediate_values([defn])
 
-    def measure_evals_per_second(self, *args, **kw):
-        return self.make_calculator().measure_evals_per_second(*args, **kw)
+    def measure_evals_per_second(self, *args, compiled=True, **kw):
+        calc = self.make_calculator(compiled=compiled)
+        return calc.measure_evals_per_second(*args, **kw)
 
     def make_calculator(self, calculatorClass=None, variable=None, **kw):
         cells = []
@@ -858,26 +859,46 @@ class ParameterController(object):
         max_evaluations=None,
         tolerance=1e-6,
         global_tolerance=1e-1,
+        starts=None,
         **kw,
     ):
         """Find input values that optimise this function.
         'local' controls the choice of optimiser, the default being to run
         both the global and local optimisers. 'filename' and 'interval'
         control checkpointing.  Unknown keyword arguments get passed on to
-        the optimiser(s)."""
+        the optimiser(s).
+
+        If 'starts', the number of starting points, is provided the function
+        is optimised from the current values and fuzzed copies of them, by
+        local optimisation if 'local' or otherwise by annealing chains at a
+        range of temperatures. 'parallel' and 'par_kw' arguments run these
+        in worker processes. The best end point is then polished locally and
+        the (fval, x, evals) end point from each start is returned, allowing
+        convergence to be checked. See maximise_from_starts."""
         return_calculator = kw.pop("return_calculator", False)  # only for debug
-        for n in [
-            "local",
-            "filename",
-            "interval",
-            "max_evaluations",
-            "tolerance",
-            "global_tolerance",
-        ]:
+        if starts is not None:
+            if filename is not None:
+                raise ValueError("checkpointing is not supported with starts")
+            kw["method"] = "multistart" if local else "tempering"
+            names = ["max_evaluations", "tolerance", "global_tolerance"]
+        else:
+            names = [
+                "local",
+                "filename",
+                "interval",
+                "max_evaluations",
+                "tolerance",
+                "global_tolerance",
+            ]
+        for n in names:
             kw[n] = locals()[n]
-        lc = self.make_calculator()
+        lc = self.make_calculator(compiled=True)
+        end_points = None
         try:
-            lc.optimise(**kw)
+            if starts is not None:
+                end_points = lc.optimise_from_starts(starts, **kw)
+            else:
+                lc.optimise(**kw)
         except MaximumEvaluationsReached as detail:
             evals = detail.args[0]
             err_msg = "FORCED EXIT from optimiser after %s evaluations" % evals
@@ -891,6 +912,7 @@ class ParameterController(object):
             self.update_from_calculator(lc)
         if return_calculator:
             return lc
+        return end_points
 
     def graphviz(self):
         lc = self.make_calculator()
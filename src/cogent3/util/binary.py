@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""A compact binary encoding of the rich dicts produced by to_rich_dict().
+
+An encoded object consists of a header, a json skeleton of the object and
+a block of raw buffers. Lists of floats or ints, equal length lists of
+floats and NumPy arrays are removed from the skeleton (their position
+becomes null) and stored as raw little-endian buffers. An index of their
+locations in the skeleton is stored in the header. Decoding produces the
+same result as json.loads(json.dumps(obj)), except NumPy arrays are returned
+as arrays.
+"""
+import json
+import struct
+
+import numpy
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+# not a valid start for json or utf-8 text
+MAGIC = b"\xc3B\x01"
+
+# shorter numerical lists are left in the json
+MIN_BUFFER_LENGTH = 16
+
+_header = struct.Struct("<II")
+
+
+def _dict_key(key):
+    """returns key as a str, following json conventions"""
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (bool, int, float)):
+        return json.dumps(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key)}")
+
+
+def _numeric_list_dtype(value):
+    """returns the NumPy dtype for a list of floats or ints, or a list of
+    equal length lists of floats, None otherwise"""
+    types = {type(v) for v in value}
+    if types == {float}:
+        return "<f8"
+    if types == {int}:
+        return "<i8" if -(2 ** 63) <= min(value) and max(value) < 2 ** 63 else None
+    if types != {list} or not value[0]:
+        return None
+    ncols = len(value[0])
+    for row in value:
+        if len(row) != ncols:
+            return None
+        for v in row:
+            if type(v) is not float:
+                return None
+    return "<f8"
+
+
+class _Packer:
+    """separates numerical buffers from the json serialisable skeleton"""
+
+    def __init__(self):
+        self.index = []
+        self.buffers = []
+
+    def _add(self, path, kind, array):
+        array = numpy.ascontiguousarray(array)
+        array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        self.index.append([path, kind, array.dtype.str, list(array.shape)])
+        self.buffers.append(array.tobytes())
+
+    def pack(self, value, path):
+        """returns value with numerical buffers replaced by None"""
+        if isinstance(value, dict):
+            return {
+                key: self.pack(val, path + [key])
+                for key, val in ((_dict_key(k), v) for k, v in value.items())
+            }
+
+        if isinstance(value, (list, tuple)):
+            nested = bool(value) and type(value[0]) is list
+            if len(value) >= MIN_BUFFER_LENGTH or nested:
+                dtype = _numeric_list_dtype(value)
+                size = len(value) * (len(value[0]) if nested else 1)
+                if dtype and size >= MIN_BUFFER_LENGTH:
+                    self._add(path, "list", numpy.array(value, dtype=dtype))
+                    return None
+            return [self.pack(v, path + [i]) for i, v in enumerate(value)]
+
+        if isinstance(value, numpy.ndarray):
+            if value.dtype.hasobject:
+                return self.pack(value.tolist(), path)
+            self._add(path, "array", value)
+            return None
+
+        if isinstance(value, numpy.integer):
+            return int(value)
+
+        if isinstance(value, numpy.floating):
+            return float(value)
+
+        if isinstance(value, numpy.bool_):
+            return bool(value)
+
+        return value
+
+
+def is_binary(data):
+    """whether data is a bytes object produced by to_binary()"""
+    return isinstance(data, (bytes, bytearray)) and data[: len(MAGIC)] == MAGIC
+
+
+def to_binary(obj):
+    """returns obj encoded as bytes
+
+    Parameters
+    ----------
+    obj
+        a json serialisable object, or a cogent3 object with a
+        to_rich_dict() method. Can include NumPy arrays.
+    """
+    if hasattr(obj, "to_rich_dict"):
+        obj = obj.to_rich_dict()
+    packer = _Packer()
+    skeleton = packer.pack(obj, [])
+    skeleton = json.dumps(skeleton, separators=(",", ":")).encode("utf-8")
+    index = json.dumps(packer.index, separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        [MAGIC, _header.pack(len(skeleton), len(index)), skeleton, index]
+        + packer.buffers
+    )
+
+
+def from_binary(data):
+    """returns the object decoded from bytes produced by to_binary()"""
+    if not is_binary(data):
+        raise ValueError("data not produced by to_binary()")
+    offset = len(MAGIC)
+    skeleton_size, index_size = _header.unpack_from(data, offset)
+    offset += _header.size
+    skeleton = json.loads(data[offset : offset + skeleton_size].decode("utf-8"))
+    offset += skeleton_size
+    index = json.loads(data[offset : offset + index_size].decode("utf-8"))
+    offset += index_size
+    for path, kind, dtype, shape in index:
+        dtype = numpy.dtype(dtype)
+        count = int(numpy.prod(shape, dtype=int))
+        value = numpy.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        value = value.reshape(shape)
+        value = value.tolist() if kind == "list" else value.copy()
+        offset += count * dtype.itemsize
+        if not path:
+            skeleton = value
+            continue
+        parent = skeleton
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = value
+
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes in data")
+    return skeleton
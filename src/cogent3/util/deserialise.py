@@ -9,6 +9,7 @@ import cogent3
 from cogent3.core.alignment import Aligned
 from cogent3.core.genetic_code import get_code
 from cogent3.core.moltype import _CodonAlphabet, get_moltype
+from cogent3.util.binary import from_binary, is_binary
 from cogent3.util.misc import open_, path_exists
 
 
@@ -274,11 +275,12 @@ def deserialise_likelihood_function(data):
 
 def deserialise_object(data):
     """
-    deserialises from json
+    deserialises from json or binary
     Parameters
     ----------
     data
-        path to json file, json string or a dict
+        path to json or binary file, json string, bytes from
+        cogent3.util.binary.to_binary() or a dict
 
     Returns
     -------
@@ -286,8 +288,13 @@ def deserialise_object(data):
     be returned as is. Otherwise, it will be deserialised to a cogent3 object.
     """
     if path_exists(data):
-        with open_(data) as infile:
-            data = json.load(infile)
+        with open_(str(data), mode="rb") as infile:
+            data = infile.read()
+        if not is_binary(data):
+            data = json.loads(data.decode("utf-8"))
+
+    if is_binary(data):
+        data = from_binary(data)
 
     if type(data) is str:
         data = json.loads(data)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import concurrent.futures as concurrentfutures
+import itertools
 import math
 import multiprocessing
 import os
@@ -171,6 +172,69 @@ def imap(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=Non
                 yield result
 
 
+def as_completed(
+    f, s, max_workers=None, max_in_flight=None, initializer=None, initargs=()
+):
+    """
+    Parameters
+    ----------
+    f : callable
+        function that operates on values in s
+    s : iterable
+        series of inputs to f, consumed only as tasks are submitted
+    max_workers : int or None
+        maximum number of worker processes. Defaults to 1-maximum available.
+    max_in_flight : int or None
+        maximum number of tasks submitted but not yet returned, which bounds
+        the memory used by pending inputs and results. Defaults to
+        4 * max_workers.
+    initializer : callable or None
+        called with initargs once in each worker process before it takes any
+        tasks, e.g. to hold large objects shared by all tasks
+    initargs : tuple
+        arguments for initializer
+
+    Returns
+    -------
+    generator yielding (index, f(s[index])) in order of completion
+
+    Notes
+    -----
+    Tasks are submitted individually, so a worker that finishes a short task
+    immediately takes the next one rather than waiting on a pre-allocated
+    chunk. Closing the generator early cancels tasks that have not started.
+    """
+    if not max_workers:
+        max_workers = max(multiprocessing.cpu_count() - 1, 1)
+    max_in_flight = max(max_in_flight or 4 * max_workers, 1)
+
+    f = PicklableAndCallable(f)
+    items = enumerate(s)
+    with concurrentfutures.ProcessPoolExecutor(
+        max_workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        pending = {}
+
+        def submit(num):
+            for index, item in itertools.islice(items, num):
+                pending[executor.submit(f, item)] = index
+
+        try:
+            submit(max_in_flight)
+            while pending:
+                done, _ = concurrentfutures.wait(
+                    pending, return_when=concurrentfutures.FIRST_COMPLETED
+                )
+                # keep workers busy before handing results back
+                submit(len(done))
+                for future in done:
+                    index = pending.pop(future)
+                    yield index, future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
 @extend_docstring_from(imap)
 def map(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=None):
     return list(imap(f, s, max_workers, use_mpi, if_serial, chunksize))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Measures the interpreter overhead saved by compiling the Calculator's
+programs into flat evaluation plans.
+
+Short alignments are used so that the overhead, rather than the numerical
+work, dominates. Usage: python benchmark_compiled.py [time_limit]
+"""
+import sys
+
+from cogent3 import load_aligned_seqs
+from cogent3.evolve.models import get_model
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Peter Maxwell", "Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+ALIGNMENT = load_aligned_seqs(filename="data/brca1.fasta", moltype="dna")
+
+
+def compare(model_name, taxa, length, time_limit, **kw):
+    aln = ALIGNMENT.take_seqs(ALIGNMENT.names[:taxa])
+    aln = aln.no_degenerates(motif_length=3)[:length]
+    lf = get_model(model_name).make_likelihood_function(aln.quick_tree(), **kw)
+    lf.set_alignment(aln)
+    lf.set_param_rule("length", is_independent=True)
+    result = {}
+    for compiled in (False, True):
+        calc = lf.make_calculator(compiled=compiled)
+        result[compiled] = calc.measure_evals_per_second(time_limit=time_limit)
+    return len(calc._cells), result
+
+
+def benchmarks(time_limit):
+    columns = "%-8s %5s %6s %5s %6s %9s %9s %6s"
+    print(
+        columns
+        % ("model", "taxa", "length", "bins", "cells", "plain", "compiled", "speed")
+    )
+    for model_name in ("HKY85", "CNFGTR"):
+        for taxa in (10, 50):
+            for (length, bins) in ((3, 1), (60, 1), (60, 4)):
+                (cells, r) = compare(model_name, taxa, length, time_limit, bins=bins)
+                print(
+                    columns
+                    % (
+                        model_name,
+                        taxa,
+                        length,
+                        bins,
+                        cells,
+                        "%.0f" % r[False],
+                        "%.0f" % r[True],
+                        "%.2f" % (r[True] / r[False]),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    benchmarks(time_limit)
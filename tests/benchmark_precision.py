@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Compares single and double precision likelihood calculations.
+
+For each model and alignment size reports the evaluations per second, the
+memory used by the partial likelihood arrays and the difference in lnL.
+Usage: python benchmark_precision.py [time_limit]
+"""
+import sys
+
+import numpy
+
+from cogent3 import load_aligned_seqs
+from cogent3.evolve.models import get_model
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Peter Maxwell", "Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+ALIGNMENT = load_aligned_seqs(filename="data/brca1.fasta", moltype="dna")
+
+
+def partials_bytes(lf):
+    """bytes used by the partial likelihood arrays of internal nodes"""
+    lht = lf.get_param_value("lht")
+    total = 0
+    for edge in lf.tree.get_edge_vector():
+        if edge.istip():
+            continue
+        shape = lht.get_edge(edge.name).shape
+        total += numpy.prod(shape) * numpy.dtype(lht.float_type).itemsize
+    return total
+
+
+def compare(model_name, taxa, length, time_limit):
+    aln = ALIGNMENT.take_seqs(ALIGNMENT.names[:taxa])
+    aln = aln.no_degenerates(motif_length=3)[:length]
+    length = len(aln)
+    tree = aln.quick_tree()
+    result = {}
+    for precision in ("double", "single"):
+        lf = get_model(model_name).make_likelihood_function(tree, precision=precision)
+        lf.set_alignment(aln)
+        speed = lf.measure_evals_per_second(time_limit=time_limit)
+        result[precision] = (speed, partials_bytes(lf), lf.get_log_likelihood())
+    return length, result
+
+
+def benchmarks(time_limit):
+    columns = "%-8s %5s %6s %9s %9s %6s %9s %9s %10s"
+    header = ("model", "taxa", "length", "evals/s64", "evals/s32", "speed")
+    print(columns % (header + ("MB64", "MB32", "|dlnL|")))
+    for model_name in ("HKY85", "CNFGTR"):
+        for taxa in (10, 50):
+            for length in (600, None):
+                (length, r) = compare(model_name, taxa, length, time_limit)
+                (speed64, bytes64, lnL64) = r["double"]
+                (speed32, bytes32, lnL32) = r["single"]
+                print(
+                    columns
+                    % (
+                        model_name,
+                        taxa,
+                        length,
+                        "%.0f" % speed64,
+                        "%.0f" % speed32,
+                        "%.2f" % (speed32 / speed64),
+                        "%.2f" % (bytes64 / 1e6),
+                        "%.2f" % (bytes32 / 1e6),
+                        "%.2e" % abs(lnL64 - lnL32),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    benchmarks(time_limit)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Measures the cost of the underflow check on partial likelihoods.
+
+For each model and number of taxa reports the evaluations per second with
+the check (the default) and with the unchecked product of the children,
+and their ratio, which should be close to 1 for trees too small to need
+any rescaling.
+Usage: python benchmark_scaling.py [time_limit]
+"""
+import sys
+
+from unittest.mock import patch
+
+from cogent3 import load_aligned_seqs
+from cogent3.evolve.likelihood_tree import LikelihoodTreeEdge
+from cogent3.evolve.models import get_model
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Peter Maxwell", "Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+ALIGNMENT = load_aligned_seqs(filename="data/brca1.fasta", moltype="dna")
+ALIGNMENT = ALIGNMENT.no_degenerates(motif_length=3)
+
+
+def compare(model_name, taxa, time_limit, repeats=5):
+    aln = ALIGNMENT.take_seqs(ALIGNMENT.names[:taxa])
+    lf = get_model(model_name).make_likelihood_function(aln.quick_tree())
+    lf.set_alignment(aln)
+    calc = lf.make_calculator()
+    unchecked = patch.object(
+        LikelihoodTreeEdge,
+        "sum_scaled_input_likelihoodsR",
+        LikelihoodTreeEdge.sum_input_likelihoodsR,
+    )
+    # alternated, and the best of each kept, as timings are noisy
+    checked_speed = unchecked_speed = 0
+    for i in range(repeats):
+        speed = calc.measure_evals_per_second(time_limit=time_limit)
+        checked_speed = max(checked_speed, speed)
+        with unchecked:
+            speed = calc.measure_evals_per_second(time_limit=time_limit)
+        unchecked_speed = max(unchecked_speed, speed)
+    return checked_speed, unchecked_speed
+
+
+def benchmarks(time_limit):
+    columns = "%-8s %5s %9s %11s %6s"
+    print(columns % ("model", "taxa", "evals/s", "unchecked", "ratio"))
+    for model_name in ("HKY85", "CNFGTR"):
+        for taxa in (4, 8, 16, len(ALIGNMENT.names)):
+            (checked, unchecked) = compare(model_name, taxa, time_limit)
+            print(
+                columns
+                % (
+                    model_name,
+                    taxa,
+                    "%.0f" % checked,
+                    "%.0f" % unchecked,
+                    "%.2f" % (checked / unchecked),
+                )
+            )
+
+
+if __name__ == "__main__":
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    benchmarks(time_limit)
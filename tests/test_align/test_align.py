@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 
+import random
 import unittest
 
+import numpy
+
 import cogent3.align.progressive
 import cogent3.evolve.substitution_model
 
 from cogent3 import DNA, make_unaligned_seqs
+from cogent3.align import pairwise
 from cogent3.align.align import (
     classic_align_pairwise,
     global_pairwise,
@@ -13,6 +17,7 @@ from cogent3.align.align import (
     make_dna_scoring_dict,
     make_generic_scoring_dict,
 )
+from cogent3.evolve.likelihood_tree import make_likelihood_tree_leaf
 from cogent3.evolve.models import HKY85
 
 
@@ -124,6 +129,78 @@ class AlignmentTestCase(unittest.TestCase):
         self.assertEqual(str(hit).lower(), "cac")
 
 
+class BandedPairwiseTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        a = "".join(rng.choice("acgt") for _ in range(600))
+        b = list(a)
+        for i in range(0, len(b), 37):
+            b[i] = rng.choice("acgt")
+        del b[200:230]  # a deletion wider than a narrow band
+        self.seqs = [DNA.make_seq(a, name="A"), DNA.make_seq("".join(b), name="B")]
+        self.S = make_dna_scoring_dict(10, -1, -8)
+
+    def _aligned(self, band):
+        return global_pairwise(*self.seqs, self.S, 10, 2, return_score=True, band=band)
+
+    def test_band(self):
+        """banded alignment is optimal if the band contains the best path"""
+        (aln, score) = self._aligned(None)
+        (banded, banded_score) = self._aligned(40)
+        self.assertEqual(banded.to_dict(), aln.to_dict())
+        self.assertAlmostEqual(banded_score, score)
+        # the deletion is outside a band around the diagonal
+        (narrow, narrow_score) = self._aligned(5)
+        self.assertLess(narrow_score, score)
+        # but not a band following seed matches
+        (seeded, seeded_score) = self._aligned(pairwise.DPBand(5, seed_length=12))
+        self.assertEqual(seeded.to_dict(), aln.to_dict())
+        # or one given the right anchors
+        band = pairwise.DPBand(5, anchors=[(199, 199), (230, 200)])
+        (anchored, anchored_score) = self._aligned(band)
+        self.assertAlmostEqual(anchored_score, score)
+
+    def test_band_python(self):
+        """the pure Python DP gives the same banded alignment"""
+        self.seqs = [s[:300] for s in self.seqs]
+        expect = self._aligned(pairwise.DPBand(5, seed_length=12))
+        module = pairwise.pyrex_seq_align_module
+        try:
+            pairwise.pyrex_seq_align_module = None
+            got = self._aligned(pairwise.DPBand(5, seed_length=12))
+        finally:
+            pairwise.pyrex_seq_align_module = module
+        self.assertEqual(got[0].to_dict(), expect[0].to_dict())
+        self.assertAlmostEqual(got[1], expect[1])
+
+    def test_bounds(self):
+        """band bounds are monotonic and include the start and end"""
+        leaves = [make_likelihood_tree_leaf(s) for s in self.seqs]
+        pair = pairwise.Pair(*[pairwise.AlignableSeq(leaf) for leaf in leaves])
+        (M, N) = pair.size
+        for band in (pairwise.DPBand(3), pairwise.DPBand(3, seed_length=12)):
+            (low, high) = band.bounds(pair)
+            self.assertEqual(len(low), M)
+            self.assertEqual(
+                (low[0], low[-1], high[-2], high[-1]), (0, N - 1, N - 1, N)
+            )
+            self.assertTrue((numpy.diff(low) >= 0).all())
+            self.assertTrue((numpy.diff(high) >= 0).all())
+            # consecutive rows are connected, the last holds only the END state
+            self.assertTrue((high[:-2] > low[1:-1]).all())
+
+    def test_chained_anchors(self):
+        """anchors follow the best chain of co-linear segments"""
+        segments = [
+            ((0, 0), (10, 10)),
+            ((5, 40), (9, 44)),  # not co-linear with the others
+            ((8, 6), (20, 18)),  # overlaps the first
+        ]
+        got = pairwise._chained_anchors(segments)
+        # the start of the last is moved along its diagonal past the first
+        self.assertEqual(got, [(0, 0), (9, 9), (12, 10), (19, 17)])
+
+
 class UnalignedPairTestCase(unittest.TestCase):
     def test_forward(self):
         tree = cogent3.make_tree(tip_names="AB")
@@ -192,6 +269,51 @@ class MultipleAlignmentTestCase(unittest.TestCase):
         }
         self.assertEqual(aln.to_dict(), expect)
 
+    def test_progressive_kmer_tree(self):
+        """progressive alignment with a guide tree from k-mer distances"""
+        seqs = make_unaligned_seqs(
+            data={
+                "A": "TGTGGCACAAATGCTCATGCCAGCTCTTTACAGCATGAGAACA",
+                "B": "TGTGGCACAGATACTCATGCCAGCTCATTACAGCATGAGAACAGCAGTTT",
+                "C": "TGTGGCACAAGTACTCATGCCAGCTCAGTACAGCATGAGAACAGCAGTTT",
+            }
+        )
+        for guide_kmers in (True, 4):
+            aln, tree = cogent3.align.progressive.TreeAlign(
+                HKY85(),
+                seqs,
+                show_progress=False,
+                param_vals={"kappa": 4.0},
+                guide_kmers=guide_kmers,
+            )
+            self.assertEqual(set(tree.get_tip_names()), set("ABC"))
+            self.assertEqual(aln.to_dict()["A"][-7:], "-------")
+            self.assertEqual(aln.get_lengths(), {"A": 43, "B": 50, "C": 50})
+
+    def test_progressive_parallel(self):
+        """aligning subtrees in worker processes gives the serial result"""
+        seqs = {
+            "A": "tacagtacctgta",
+            "B": "taccgtcctgta",
+            "C": "tatacctgtaa",
+            "D": "tacgtcctgcta",
+        }
+        expect = self._make_aln(seqs)
+        aln = self._make_aln(seqs, parallel=True, par_kw=dict(max_workers=1))
+        self.assertEqual(aln.to_dict(), expect.to_dict())
+        self.assertAlmostEqual(
+            aln.info["align_params"]["lnL"], expect.info["align_params"]["lnL"]
+        )
+
+    def test_independent_clades(self):
+        """subtrees for parallel alignment are disjoint and have 2+ tips"""
+        from cogent3.align.progressive import _independent_clades
+
+        tree = cogent3.make_tree(treestring="((((a,b)x,c)y,(d,e)z)w,(f,(g,h)u)v)root")
+        self.assertEqual(_independent_clades(tree, 2), ["w", "v"])
+        self.assertEqual(_independent_clades(tree, 4), ["y", "z", "u"])
+        self.assertEqual(_independent_clades(tree, 100), ["z", "u", "x"])
+
     def test_align_info(self):
         """alignment info object has parameter values"""
         aln = self._make_aln(
@@ -239,6 +361,14 @@ class MultipleAlignmentTestCase(unittest.TestCase):
         )
 
 
+class BandedTestCase(MultipleAlignmentTestCase):
+    # Progressive alignment within a narrow band
+
+    def _make_aln(self, orig, **kw):
+        kw["band"] = 2
+        return MultipleAlignmentTestCase._make_aln(self, orig, **kw)
+
+
 class HirschbergTestCase(MultipleAlignmentTestCase):
     # Force use of linear space algorithm
 
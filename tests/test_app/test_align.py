@@ -2,6 +2,7 @@ from unittest import TestCase, main
 
 from cogent3 import DNA, get_moltype, make_tree, make_unaligned_seqs
 from cogent3.align.align import make_generic_scoring_dict
+from cogent3.align.pairwise import DPBand
 from cogent3.app import align as align_app
 from cogent3.app.composable import NotCompleted
 
@@ -64,6 +65,24 @@ class RefalignmentTests(TestCase):
         }
         self.assertEqual(aln.to_dict(), expect)
 
+    def test_align_to_ref_band(self):
+        """aligning to a reference within a band"""
+        expect = align_app.align_to_ref(ref_seq="Human")(self.seqs).to_dict()
+        for band in (6, DPBand(3, seed_length=6)):
+            aligner = align_app.align_to_ref(ref_seq="Human", band=band)
+            aln = aligner(self.seqs)
+            self.assertEqual(aln.to_dict(), expect)
+
+    def test_align_to_ref_parallel(self):
+        """parallel alignment to a reference matches serial"""
+        expect = align_app.align_to_ref(ref_seq="Human")(self.seqs)
+        aligner = align_app.align_to_ref(
+            ref_seq="Human", parallel=True, par_kw=dict(max_workers=1)
+        )
+        aln = aligner(self.seqs)
+        self.assertEqual(aln.names, expect.names)
+        self.assertEqual(aln.to_dict(), expect.to_dict())
+
     def test_align_to_ref_generic_moltype(self):
         """tests when the moltype is generic"""
         test_moltypes = ["text", "rna", "protein", "protein_with_stop", "bytes", "ab"]
@@ -116,6 +135,30 @@ class RefalignmentTests(TestCase):
         # got = aln.to_dict()
         # self.assertEqual(got, expect)
 
+    def test_progressive_align_kmer(self):
+        """progressive alignment with a k-mer guide tree"""
+        aligner = align_app.progressive_align(model="nucleotide", distance="kmer")
+        aln = aligner(self.seqs)
+        self.assertEqual(len(aln), 42)
+        self.assertEqual(aln.num_seqs, self.seqs.num_seqs)
+        guide = make_tree(aln.info.align_params["guide_tree"])
+        self.assertEqual(set(guide.get_tip_names()), set(self.seqs.names))
+        edges = guide.get_edge_vector(include_root=False)
+        self.assertTrue(all(e.length > 0 for e in edges))
+
+    def test_progressive_align_band(self):
+        """progressive alignment within a band"""
+        aligner = align_app.progressive_align(
+            model="nucleotide", guide_tree=self.treestring
+        )
+        expect = aligner(self.seqs).to_dict()
+        for band in (6, DPBand(3, seed_length=6)):
+            aligner = align_app.progressive_align(
+                model="nucleotide", guide_tree=self.treestring, band=band
+            )
+            aln = aligner(self.seqs)
+            self.assertEqual(aln.to_dict(), expect)
+
     def test_progressive_fails(self):
         """should return NotCompletedResult along with message"""
         # Bandicoot has an inf-frame stop codon
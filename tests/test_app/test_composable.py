@@ -2,7 +2,7 @@ import os
 
 from tempfile import TemporaryDirectory
 from unittest import TestCase, main
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from cogent3.app import io as io_app
 from cogent3.app import sample as sample_app
@@ -175,6 +175,129 @@ class TestComposableBase(TestCase):
             self.assertEqual(len(process.data_store.incomplete), 3)
             process.data_store.close()
 
+    def test_apply_to_scheduled(self):
+        """bounded parallel scheduling matches serial results"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=5)
+        reader = io_app.load_aligned(format="fasta", moltype="dna")
+        min_length = sample_app.min_length(500)
+        proc = reader + min_length
+        expect = proc.apply_to(dstore, show_progress=False)
+        got = proc.apply_to(
+            dstore,
+            parallel=True,
+            par_kw=dict(max_workers=1),
+            max_in_flight=2,
+            show_progress=False,
+        )
+        self.assertEqual(len(got), len(expect))
+        for a, b in zip(got, expect):
+            self.assertEqual(bool(a), bool(b))
+            if a:
+                self.assertEqual(a.to_dict(), b.to_dict())
+
+        timings = proc.apply_to_timings
+        self.assertEqual(timings["num_members"], len(dstore))
+        self.assertTrue(timings["members_per_second"] > 0)
+
+        # only NotCompleted retained
+        got = proc.apply_to(dstore, show_progress=False, keep_results=False)
+        self.assertEqual(len(got), sum(not r for r in expect))
+        self.assertTrue(all(type(r) == NotCompleted for r in got))
+
+    def test_apply_to_scheduled_writer(self):
+        """bounded parallel scheduling with a writer and batched commits"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
+        with TemporaryDirectory(dir=".") as dirname:
+            reader = io_app.load_aligned(format="fasta", moltype="dna")
+            min_length = sample_app.min_length(3000)
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            writer = io_app.write_db(outpath)
+            process = reader + min_length + writer
+            r = process.apply_to(
+                dstore,
+                parallel=True,
+                par_kw=dict(max_workers=1),
+                max_in_flight=1,
+                write_batch=100,
+                show_progress=False,
+            )
+            self.assertEqual(process.data_store.write_cache_size, 100)
+            self.assertEqual(len(process.data_store.incomplete), 3)
+            self.assertEqual(len(process.data_store.logs), 1)
+            process.data_store.close()
+
+    def test_profiling(self):
+        """profiling records each call of each app"""
+        path = os.path.join("data", "brca1.fasta")
+        reader = io_app.load_aligned(format="fasta", moltype="dna")
+        min_length = sample_app.min_length(3000)
+        proc = reader + min_length
+        self.assertFalse(proc.profiling)
+        proc.profiling = True
+        self.assertTrue(reader.profiling)
+        proc(path)
+        table = proc.profile_table()
+        self.assertEqual(table.shape[0], 2)
+        self.assertEqual(table.tolist("calls"), [1, 1])
+        self.assertEqual(table.tolist("not_completed_rate"), [0, 1])
+        table = proc.profile_table(per_member=True)
+        self.assertEqual(table.tolist("source"), [path, path])
+        proc.profiling = False
+        self.assertIs(reader._profile_records, None)
+
+    def test_apply_to_profile(self):
+        """profiling gathered from parallel workers and logged"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
+        with TemporaryDirectory(dir=".") as dirname:
+            reader = io_app.load_aligned(format="fasta", moltype="dna")
+            min_length = sample_app.min_length(10)
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            writer = io_app.write_db(outpath)
+            process = reader + min_length + writer
+            process.apply_to(
+                dstore,
+                parallel=True,
+                par_kw=dict(max_workers=1),
+                max_in_flight=2,
+                profile=True,
+                show_progress=False,
+            )
+            table = process.profile_table()
+            self.assertEqual(
+                table.tolist("app"), ["load_aligned", "min_length", "write_db"]
+            )
+            self.assertEqual(table.tolist("calls"), [3, 3, 3])
+            # profiling was only on for the run
+            self.assertFalse(any(app.profiling for app in process._composed()))
+            log = process.data_store.logs[0].read()
+            self.assertIn("PROFILE", log)
+            process.data_store.close()
+
+    def test_apply_to_profile_restores(self):
+        """profiling is restored after apply_to, even if it fails"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=2)
+        reader = io_app.load_aligned(format="fasta", moltype="dna")
+        min_length = sample_app.min_length(10)
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            process = reader + min_length + io_app.write_db(outpath)
+            process.apply_to(dstore, profile=True, logger=False, show_progress=False)
+            self.assertEqual(process.profile_table().tolist("calls"), [2, 2, 2])
+            reader(dstore[0])
+            self.assertEqual(process.profile_table().tolist("calls"), [2, 2, 2])
+            process.data_store.close()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            reader = io_app.load_aligned(format="fasta", moltype="dna")
+            writer = io_app.write_db(outpath)
+            process = reader + writer
+            with patch.object(writer, "_log_outcome", side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    process.apply_to(dstore, profile=True, show_progress=False)
+            self.assertFalse(reader.profiling or writer.profiling)
+            writer.data_store.close()
+
 
 class TestNotCompletedResult(TestCase):
     def test_err_result(self):
@@ -10,10 +10,12 @@ from cogent3.app.data_store import (
     OVERWRITE,
     DataStoreMember,
     ReadOnlyDirectoryDataStore,
+    ReadOnlySqliteDataStore,
     ReadOnlyTinyDbDataStore,
     ReadOnlyZippedDataStore,
     SingleReadDataStore,
     WritableDirectoryDataStore,
+    WritableSqliteDataStore,
     WritableTinyDbDataStore,
     WritableZippedDataStore,
 )
@@ -677,6 +679,273 @@ class TinyDBDataStoreTests(TestCase):
             dstore.close()
 
 
+class SqliteDataStoreTests(TestCase):
+    basedir = "data"
+    ReadClass = ReadOnlySqliteDataStore
+    WriteClass = WritableSqliteDataStore
+
+    def setUp(self):
+        dstore = ReadOnlyDirectoryDataStore(self.basedir, suffix="fasta")
+        data = {m.name: m.read() for m in dstore}
+        self.data = data
+
+    def _make_dstore(self, dirname, **kwargs):
+        path = os.path.join(dirname, self.basedir)
+        dstore = self.WriteClass(path, if_exists="overwrite", **kwargs)
+        for id_, data in self.data.items():
+            identifier = dstore.make_relative_identifier(id_)
+            dstore.write(identifier, data)
+        return dstore
+
+    def test_len(self):
+        """len sqlite data store correct"""
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            self.assertEqual(len(dstore), len(self.data))
+            self.assertTrue(dstore.source.endswith(".sqlitedb"))
+            dstore.close()
+            dstore = self.ReadClass(dstore.source)
+            self.assertEqual(len(dstore), len(self.data))
+            dstore.close()
+
+    def test_contains(self):
+        """contains operation works for sqlite data store"""
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            got = dstore.get_member("brca1.json")
+            self.assertTrue(got in dstore)
+            got.parent = "abcd"
+            self.assertTrue(got not in dstore)
+            self.assertTrue("brca1.json" in dstore)
+            self.assertTrue("some/path/brca1.json" in dstore)
+            self.assertFalse("brca2.json" in dstore)
+            dstore.close()
+
+    def test_write_existing(self):
+        """writing an existing identifier returns the existing member"""
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            expect = dstore.get_member("brca1.json")
+            got = dstore.write("brca1.json", "something else")
+            self.assertEqual(got.id, expect.id)
+            self.assertEqual(len(dstore), len(self.data))
+            dstore.close()
+
+    def test_add_file(self):
+        """adding file to sqlite data store makes unique names"""
+        with TemporaryDirectory(dir=".") as dirname:
+            log_path = os.path.join(dirname, "some.log")
+            with open(log_path, "w") as out:
+                out.write("some text")
+
+            dstore = self._make_dstore(dirname)
+            dstore.add_file(log_path, keep_suffix=True, cleanup=False)
+            dstore.add_file(log_path, keep_suffix=True, cleanup=True)
+            self.assertTrue("some.log" in dstore)
+            self.assertTrue("some-1.log" in dstore)
+            self.assertFalse(os.path.exists(log_path))
+            self.assertEqual(len(dstore.logs), 2)
+            self.assertEqual(dstore.get_member("some.log").read(), "some text")
+            dstore.close()
+
+    def test_get_member(self):
+        """get member works on sqlite data store"""
+        with TemporaryDirectory(dir=".") as dirname:
+            keys = list(self.data)
+            dstore = self._make_dstore(dirname)
+            identifier = dstore.make_relative_identifier(keys[0])
+            got = dstore.get_member(identifier)
+            self.assertEqual(got.name, identifier)
+            self.assertEqual(got.read(), self.data[keys[0]])
+            self.assertIs(dstore.get_member("missing.json"), None)
+            dstore.close()
+
+    def test_iter_filter(self):
+        """iteration and filtering of members"""
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            members = [m for m in dstore]
+            self.assertEqual(members, dstore.members)
+            # members are in order of insertion
+            expect = [dstore.make_relative_identifier(k) for k in self.data]
+            self.assertEqual(members, expect)
+            matches = dstore.filtered("*brca1*")
+            self.assertGreater(len(matches), 2)
+            dstore.close()
+            dstore = self.ReadClass(dstore.source, limit=2)
+            self.assertEqual(dstore.members, expect[:2])
+            dstore.close()
+
+    def test_pickleable_roundtrip(self):
+        """pickling of data stores should be reversible"""
+        from pickle import dumps, loads
+
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname, compress="zlib")
+            dstore.commit()  # make sure written to disk
+            re_dstore = loads(dumps(dstore))
+            self.assertEqual(re_dstore.compress, "zlib")
+            got = re_dstore[0].read()
+            re_dstore.close()
+            self.assertEqual(str(dstore), str(re_dstore))
+            self.assertEqual(got, dstore[0].read())
+            dstore.close()
+
+    def test_batched_commits(self):
+        """writes are committed every write_cache_size records and on close"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            dstore.write_cache_size = 3
+            keys = list(self.data)[:4]
+            for k in keys:
+                dstore.write(dstore.make_relative_identifier(k), self.data[k])
+            reader = self.ReadClass(dstore.source)
+            # only the first batch visible to another connection
+            self.assertEqual(len(reader), 3)
+            reader.close()
+            dstore.close()
+            reader = self.ReadClass(dstore.source)
+            self.assertEqual(len(reader), 4)
+            self.assertFalse(reader.locked)
+            reader.close()
+
+    def test_dropped_without_close(self):
+        """writes are committed and the lock removed if close isn't called"""
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            source = dstore.source
+            del dstore
+            reader = self.ReadClass(source)
+            self.assertEqual(len(reader), len(self.data))
+            self.assertFalse(reader.locked)
+            reader.close()
+
+            # at interpreter exit, finalizers run before __del__
+            dstore = self._make_dstore(dirname)
+            dstore._finish()
+            reader = self.ReadClass(source)
+            self.assertEqual(len(reader), len(self.data))
+            self.assertFalse(reader.locked)
+            reader.close()
+            dstore.close()
+            dstore.close()
+            del dstore
+
+    def test_compression(self):
+        """records are compressed, and decompressed on reading"""
+        import sqlite3
+
+        for compress in ("zlib", "ZLIB", None):
+            with TemporaryDirectory(dir=".") as dirname:
+                dstore = self._make_dstore(dirname, compress=compress)
+                expect = {
+                    dstore.make_relative_identifier(k): v for k, v in self.data.items()
+                }
+                dstore.close()
+                dstore = self.ReadClass(dstore.source)
+                got = {m.name: m.read() for m in dstore}
+                self.assertEqual(got, expect)
+                dstore.close()
+                db = sqlite3.connect(dstore.source)
+                methods = {r[0] for r in db.execute("SELECT compression FROM records")}
+                db.close()
+                self.assertEqual(methods, {(compress or "").lower()})
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            with self.assertRaises(ValueError):
+                self.WriteClass(path, if_exists="overwrite", compress="gzip")
+
+    def test_write_incomplete(self):
+        """write an incomplete result to sqlite"""
+        from cogent3.app.composable import NotCompleted
+
+        keys = list(self.data)
+        incomplete = [
+            keys.pop(0),
+            NotCompleted("FAIL", "somefunc", "checking", source="testing.txt"),
+        ]
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            id_ = dstore.make_relative_identifier(incomplete[0])
+            dstore.write_incomplete(id_, incomplete[1])
+            for k in keys:
+                id_ = dstore.make_relative_identifier(k)
+                dstore.write(id_, self.data[k])
+            dstore.close()
+
+            # all records are contained
+            dstore = self.ReadClass(path)
+            for k in self.data:
+                id_ = f"{k.split('.')[0]}.json"
+                self.assertTrue(id_ in dstore)
+
+            # but len(dstore) reflects only members with completed==True
+            self.assertEqual(len(dstore), len(keys))
+            self.assertIn("1x incomplete", repr(dstore))
+            got = dstore.incomplete[0].read()
+            self.assertTrue("notcompleted" in got["type"].lower())
+            dstore.close()
+
+    def test_summary_methods(self):
+        """produce a table"""
+        from cogent3.app.composable import NotCompleted
+
+        keys = list(self.data)
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            id_ = dstore.make_relative_identifier(keys.pop(0))
+            dstore.write_incomplete(
+                id_, NotCompleted("FAIL", "somefunc", "checking", source="testing.txt")
+            )
+            for k in keys:
+                id_ = dstore.make_relative_identifier(k)
+                dstore.write(id_, self.data[k])
+            dstore.add_file("data" + os.sep + "scitrack.log", cleanup=False)
+            got = dstore.describe
+            self.assertEqual(got.shape, (3, 2))
+            self.assertEqual(got[0, "number"], len(keys))
+            got = dstore.summary_logs
+            self.assertEqual(got.shape, (1, 6))
+            got = dstore.summary_incomplete
+            self.assertEqual(got.shape, (1, 5))
+            dstore.close()
+
+    def test_dblock(self):
+        """locking/unlocking of db"""
+        from cogent3.app.data_store import _sqlite_lockid
+        from pathlib import Path
+
+        with TemporaryDirectory(dir=".") as dirname:
+            dstore = self._make_dstore(dirname)
+            self.assertTrue(dstore.locked)
+            self.assertEqual(_sqlite_lockid(dstore.source), os.getpid())
+            dstore.unlock(force=True)
+            # now introduce an artificial lock
+            dstore.db.execute("INSERT INTO lock (pid) VALUES (123)")
+            dstore.commit()
+            self.assertTrue(dstore.locked)
+            self.assertEqual(_sqlite_lockid(dstore.source), 123)
+            # now calling _source_create_delete with overwrite should have no
+            # effect
+            dstore._source_create_delete("overwrite", False)
+            path = Path(dstore.source)
+            self.assertTrue(path.exists())
+            # unlocking with wrong pid has no effect
+            dstore.unlock()
+            self.assertTrue(dstore.locked)
+            # but we can force it
+            dstore.unlock(force=True)
+            self.assertFalse(dstore.locked)
+            dstore.close()
+            # and now a call to _source_create_delete will delete
+            dstore._source_create_delete("overwrite", False)
+            self.assertFalse(path.exists())
+
+
 class SingleReadStoreTests(TestCase):
     basedir = f"data{os.sep}brca1.fasta"
     Class = SingleReadDataStore
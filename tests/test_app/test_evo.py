@@ -1,4 +1,5 @@
 from os.path import dirname, join
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main
 from unittest.mock import MagicMock
 
@@ -6,6 +7,7 @@ from numpy.testing import assert_allclose, assert_raises
 
 from cogent3 import load_aligned_seqs, make_aligned_seqs, make_tree
 from cogent3.app import evo as evo_app
+from cogent3.app.data_store import WritableDirectoryDataStore
 from cogent3.app.result import hypothesis_result
 from cogent3.evolve.models import get_model
 from cogent3.util.deserialise import deserialise_object
@@ -666,6 +668,89 @@ class TestBootstrap(TestCase):
         result = strapper(aln)
         self.assertIsInstance(result, evo_app.bootstrap_result)
 
+    def _get_hyp_aln(self):
+        aln = load_aligned_seqs(join(data_dir, "brca1.fasta"), moltype="dna")
+        aln = aln.take_seqs(aln.names[:3])
+        aln = aln.omit_gap_pos(allowed_gap_frac=0)[:300]
+        opt_args = dict(max_evaluations=20, limit_action="ignore")
+        m1 = evo_app.model("F81", opt_args=opt_args)
+        m2 = evo_app.model("HKY85", opt_args=opt_args)
+        return evo_app.hypothesis(m1, m2), aln
+
+    def test_bstrap_checkpoint(self):
+        """replicates are written to, and resumed from, a checkpoint"""
+        hyp, aln = self._get_hyp_aln()
+        with TemporaryDirectory(dir=".") as dirname:
+            path = join(dirname, "checkpoint")
+            dstore = WritableDirectoryDataStore(path, suffix="json", create=True)
+            strapper = evo_app.bootstrap(hyp, num_reps=2, checkpoint=dstore)
+            result = strapper(aln)
+            self.assertEqual(len(dstore), 2)
+            names = [m.name for m in dstore]
+            self.assertTrue(all(n.startswith("brca1-") for n in names))
+            self.assertTrue(any(n.endswith("-rep1.json") for n in names))
+
+            # replicates already in the checkpoint are not fitted again
+            dstore = WritableDirectoryDataStore(path, suffix="json", if_exists="ignore")
+            strapper = evo_app.bootstrap(hyp, num_reps=3, checkpoint=dstore)
+            got = strapper(aln)
+            self.assertEqual(len(dstore), 3)
+            assert_allclose(got.null_dist[:2], result.null_dist)
+            self.assertEqual(len(got.null_dist), 3)
+
+            # a different hypothesis does not reuse those replicates
+            opt_args = dict(max_evaluations=20, limit_action="ignore")
+            m3 = evo_app.model("GN", opt_args=opt_args)
+            strapper = evo_app.bootstrap(
+                evo_app.hypothesis(m3, hyp._alts[0]), num_reps=2, checkpoint=dstore
+            )
+            strapper(aln)
+            self.assertEqual(len(dstore), 5)
+
+    def test_bstrap_checkpoint_no_source(self):
+        """alignments without a source are checkpointed by their sequences"""
+        hyp, aln = self._get_hyp_aln()
+        aln.info.source = None
+        with TemporaryDirectory(dir=".") as dirname:
+            path = join(dirname, "checkpoint")
+            dstore = WritableDirectoryDataStore(path, suffix="json", create=True)
+            strapper = evo_app.bootstrap(hyp, num_reps=2, checkpoint=dstore)
+            result = strapper(aln)
+            self.assertEqual(len(dstore), 2)
+            got = strapper(aln)
+            self.assertEqual(len(dstore), 2)
+            assert_allclose(got.null_dist, result.null_dist)
+
+    def test_bstrap_precision(self):
+        """bootstrap stops once the p-value estimate is precise enough"""
+        hyp, aln = self._get_hyp_aln()
+        strapper = evo_app.bootstrap(hyp, num_reps=5, precision=0.5, min_reps=2)
+        result = strapper(aln)
+        self.assertEqual(len(result.null_dist), 2)
+        # the standard error of a p-value estimate from 2 replicates
+        p, stderr = evo_app._p_value_stderr(1.0, [0.0, 2.0])
+        self.assertEqual(p, 2 / 3)
+        assert_allclose(stderr, (p * (1 - p) / 2) ** 0.5)
+
+    def test_bstrap_parallel_checkpoint(self):
+        """checkpointing and early stopping with worker processes"""
+        hyp, aln = self._get_hyp_aln()
+        with TemporaryDirectory(dir=".") as dirname:
+            path = join(dirname, "checkpoint")
+            dstore = WritableDirectoryDataStore(path, suffix="json", create=True)
+            strapper = evo_app.bootstrap(
+                hyp,
+                num_reps=4,
+                parallel=True,
+                checkpoint=dstore,
+                precision=0.5,
+                min_reps=2,
+                par_kw=dict(max_workers=1, max_in_flight=1),
+            )
+            result = strapper(aln)
+            self.assertEqual(len(result.null_dist), 2)
+            self.assertEqual(len(dstore), 2)
+
 
 if __name__ == "__main__":
     main()
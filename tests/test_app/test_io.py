@@ -16,10 +16,18 @@ from numpy.testing import assert_allclose
 from cogent3 import DNA
 from cogent3.app import align as align_app
 from cogent3.app import io as io_app
+from cogent3.app import sample as sample_app
 from cogent3.app.composable import NotCompleted
-from cogent3.app.data_store import WritableZippedDataStore
+from cogent3.app.data_store import (
+    ReadOnlySqliteDataStore,
+    WritableZippedDataStore,
+)
 from cogent3.app.io import write_db
-from cogent3.core.alignment import ArrayAlignment, SequenceCollection
+from cogent3.core.alignment import (
+    ArrayAlignment,
+    IndexedSequenceCollection,
+    SequenceCollection,
+)
 from cogent3.core.profile import PSSM, MotifCountsArray, MotifFreqsArray
 from cogent3.evolve.fast_distance import DistanceMatrix
 from cogent3.maths.util import safe_log
@@ -143,6 +151,46 @@ class TestIo(TestCase):
         got = fasta_loader(seqs)
         self.assertIsInstance(got, NotCompleted)
 
+    def test_load_unaligned_lazy(self):
+        """lazy load_unaligned reads sequences on access"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = join(dirname, "brca1.fasta")
+            expect = io_app.load_unaligned(moltype="dna")(
+                join(self.basedir, "brca1.fasta")
+            )
+            expect.write(path)
+            loader = io_app.load_unaligned(moltype="dna", lazy=True)
+            got = loader(path)
+            self.assertIsInstance(got, IndexedSequenceCollection)
+            self.assertEqual(got.info.source, path)
+            self.assertEqual(got.names, expect.names)
+            self.assertEqual(
+                got.take_seqs(["Human", "Rhesus"]).to_dict(),
+                expect.take_seqs(["Human", "Rhesus"]).to_dict(),
+            )
+            # compressed files, or those with unsupported line endings, are
+            # loaded normally
+            got = loader(join(self.basedir, "brca1.fasta"))
+            self.assertNotIsInstance(got, IndexedSequenceCollection)
+            self.assertEqual(got.to_dict(), expect.to_dict())
+            got = loader(join(self.basedir, "formattest.fasta.gz"))
+            self.assertNotIsInstance(got, IndexedSequenceCollection)
+            self.assertIsInstance(got, SequenceCollection)
+            # no index is written alongside the input
+            self.assertEqual(os.listdir(dirname), ["brca1.fasta"])
+
+    def test_load_unaligned_lazy_names(self):
+        """lazy and eager loading give the same names"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = join(dirname, "labels.fasta")
+            with open(path, "w") as outfile:
+                outfile.write(">a first\nACGT\n>b  second\nAC-T\n")
+            expect = io_app.load_unaligned(moltype="dna")(path)
+            got = io_app.load_unaligned(moltype="dna", lazy=True)(path)
+            self.assertIsInstance(got, IndexedSequenceCollection)
+            self.assertEqual(got.names, expect.names)
+            self.assertEqual(got.to_dict(), expect.to_dict())
+
     def test_write_seqs(self):
         """correctly writes sequences out"""
         fasta_paths = list(io_app.findall(self.basedir, suffix=".fasta", limit=2))
@@ -217,6 +265,69 @@ class TestIo(TestCase):
             dstore.close()
             self.assertEqual(got, data)
 
+    def test_write_db_load_db_sqlite(self):
+        """correctly write/load from a compressed sqlite data store"""
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = join(dirname, "delme.sqlitedb")
+            writer = write_db(outpath, create=True, if_exists="ignore", compress="zlib")
+            data = dict(a=[1, 2], b="string")
+            writer(data, identifier=join("blah", "delme.json"))
+            self.assertTrue(writer.job_done(join("blah", "delme.json")))
+            writer.data_store.close()
+            dstore = io_app.get_data_store(outpath, suffix="json")
+            self.assertIsInstance(dstore, ReadOnlySqliteDataStore)
+            reader = io_app.load_db()
+            got = reader(dstore[0])
+            dstore.close()
+            self.assertEqual(got, data)
+            # compression requires sqlite
+            with self.assertRaises(ValueError):
+                write_db(join(dirname, "other"), create=True, compress="zlib")
+
+    def test_write_db_load_db_binary(self):
+        """correctly write/load binary serialised records in a sqlite data store"""
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = join(dirname, "delme.sqlitedb")
+            writer = write_db(
+                outpath, create=True, if_exists="ignore", serialiser="binary"
+            )
+            table = Table(header=["a", "b"], rows=[[0.1 * i, i] for i in range(20)])
+            writer(table, identifier="table.json")
+            writer(dict(a=[1, 2], b="string"), identifier="dict.json")
+            writer.data_store.close()
+            dstore = io_app.get_data_store(outpath, suffix="json")
+            reader = io_app.load_db()
+            got = reader(dstore.get_member("table.json"))
+            self.assertIsInstance(got, Table)
+            self.assertEqual(got.to_dict(), table.to_dict())
+            got = reader(dstore.get_member("dict.json"))
+            self.assertEqual(got, dict(a=[1, 2], b="string"))
+            dstore.close()
+            # binary serialisation requires sqlite
+            with self.assertRaises(ValueError):
+                write_db(join(dirname, "other"), create=True, serialiser="binary")
+
+    def test_apply_to_write_db_binary(self):
+        """binary records are checksummed, as logged by apply_to"""
+        dstore = io_app.get_data_store(self.basedir, suffix="fasta", limit=4)
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = join(os.getcwd(), dirname, "delme.sqlitedb")
+            reader = io_app.load_aligned(moltype="dna")
+            min_length = sample_app.min_length(100)
+            writer = write_db(outpath, serialiser="binary")
+            process = reader + min_length + writer
+            got = process.apply_to(dstore, show_progress=False)
+            self.assertEqual(len(got), 4)
+            written = io_app.get_data_store(outpath, suffix="json")
+            self.assertEqual(len(written) + len(written.incomplete), 4)
+            for member in written:
+                self.assertEqual(len(member.md5), 32)
+                self.assertIsInstance(member.read(), dict)
+            log = written.logs[0].read()
+            self.assertEqual(log.count("output md5sum"), len(written))
+            self.assertFalse(written.locked)
+            written.close()
+
     def test_load_db_failure_json_file(self):
         """informative load_db error message when given a json file path"""
         # todo this test has a trapped exception about being unable to delete
@@ -523,6 +634,12 @@ class TestIo(TestCase):
             # but OK for write_db
             w = io_app.write_db(outdir, create=True, if_exists="skip")
             w.data_store.close()
+            # same for sqlitedb
+            outdir = join(dirname, "delme.sqlitedb")
+            with self.assertRaises(ValueError):
+                io_app.write_json(outdir, create=True, if_exists="skip")
+            w = io_app.write_db(outdir, create=True, if_exists="skip")
+            w.data_store.close()
 
     def test_write_db_parallel(self):
         """writing with overwrite in parallel should reset db"""
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+import os
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy
+
+from cogent3 import load_aligned_seqs, make_aligned_seqs
+from cogent3.core import alignment as alignment_module
+from cogent3.core.alignment import AlignmentI
+from cogent3.core.binary_alignment import (
+    load_binary_alignment,
+    write_binary_alignment,
+)
+from cogent3.parse.sequence import FromFilenameParser
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+base_path = os.path.dirname(os.path.dirname(__file__))
+data_path = os.path.join(base_path, "data")
+
+
+class BinaryAlignmentTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "brca1.c3aln")
+        self.aln = load_aligned_seqs(
+            os.path.join(data_path, "brca1.fasta"), moltype="dna"
+        )
+        self.aln.write(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_roundtrip(self):
+        """alignment written as binary loads identically"""
+        for mmap in (True, False):
+            got = load_aligned_seqs(self.path, mmap=mmap)
+            self.assertEqual(got.names, self.aln.names)
+            self.assertEqual(got.moltype, self.aln.moltype)
+            self.assertEqual(got.to_dict(), self.aln.to_dict())
+            self.assertEqual(isinstance(got.array_seqs, numpy.memmap), mmap)
+
+    def test_write_records(self):
+        """records are written one at a time from a parser"""
+        path = os.path.join(self.tmpdir.name, "from_records.c3aln")
+        records = FromFilenameParser(os.path.join(data_path, "brca1.fasta"))
+        shape = write_binary_alignment(records, path, moltype="dna")
+        self.assertEqual(shape, (self.aln.num_seqs, len(self.aln)))
+        got = load_binary_alignment(path)
+        self.assertEqual(got.to_dict(), self.aln.to_dict())
+
+    def test_write_invalid(self):
+        """raises ValueError for invalid characters or unequal lengths"""
+        path = os.path.join(self.tmpdir.name, "bad.c3aln")
+        with self.assertRaises(ValueError):
+            write_binary_alignment([("a", "ACGT"), ("b", "AC")], path, moltype="dna")
+        with self.assertRaises(ValueError):
+            write_binary_alignment([("a", "ACGT"), ("b", "ACG!")], path, moltype="dna")
+
+    def test_incompatible_moltype(self):
+        """raises ValueError if moltype alphabet differs from stored"""
+        with self.assertRaises(ValueError):
+            load_binary_alignment(self.path, moltype="protein")
+
+    def test_mmap_requires_binary(self):
+        """mmap=True with a text format raises ValueError"""
+        with self.assertRaises(ValueError):
+            load_aligned_seqs(os.path.join(data_path, "brca1.fasta"), mmap=True)
+
+    def test_info_not_modified(self):
+        """a provided info is copied, not modified"""
+        info = {"key": "value"}
+        got = load_binary_alignment(self.path, info=info)
+        self.assertEqual(info, {"key": "value"})
+        self.assertEqual(got.info["key"], "value")
+        self.assertEqual(got.info.source, self.path)
+
+    def test_label_to_name(self):
+        """label_to_name is applied to the stored names"""
+        for mmap in (True, False):
+            got = load_aligned_seqs(
+                self.path, mmap=mmap, label_to_name=lambda x: x.upper()
+            )
+            self.assertEqual(got.names, [n.upper() for n in self.aln.names])
+            self.assertEqual(isinstance(got.array_seqs, numpy.memmap), mmap)
+
+    def test_unsupported_kw(self):
+        """raises ValueError for arguments the binary format ignores"""
+        with self.assertRaises(ValueError):
+            load_aligned_seqs(self.path, parser_kw=dict(strict=False))
+        with self.assertRaises(ValueError):
+            load_aligned_seqs(self.path, name_order=self.aln.names)
+
+    def test_mmap_methods(self):
+        """methods on a memory mapped alignment match in memory results"""
+        mapped = load_aligned_seqs(self.path, mmap=True)
+        aln = self.aln
+        self.assertEqual(mapped[10:50].to_dict(), aln[10:50].to_dict())
+        self.assertEqual(
+            mapped.take_positions([0, 3, 9]).to_dict(),
+            aln.take_positions([0, 3, 9]).to_dict(),
+        )
+        numpy.testing.assert_equal(
+            mapped.counts_per_pos(motif_length=3).array,
+            aln.counts_per_pos(motif_length=3).array,
+        )
+        numpy.testing.assert_allclose(
+            mapped.entropy_per_pos(), aln.entropy_per_pos(), equal_nan=True
+        )
+        self.assertEqual(
+            mapped.omit_gap_pos(0.1).to_dict(), aln.omit_gap_pos(0.1).to_dict()
+        )
+
+
+class ArrayAlignmentChunkedTests(TestCase):
+    """ArrayAlignment methods that work on blocks of positions"""
+
+    def setUp(self):
+        self.chunk = alignment_module._POSITION_CHUNK_ELEMENTS
+        # forces many blocks
+        alignment_module._POSITION_CHUNK_ELEMENTS = 7
+        self.alns = [
+            load_aligned_seqs(os.path.join(data_path, "brca1.fasta"), moltype="dna")[
+                :200
+            ],
+            make_aligned_seqs(
+                data={"a": "ACG-NTTR", "b": "AC-TTAC-", "c": "------AA"}, moltype="dna",
+            ),
+            make_aligned_seqs(
+                data={"a": "ACDEF-GH", "b": "ACX-EFGH"}, moltype="protein"
+            ),
+        ]
+
+    def tearDown(self):
+        alignment_module._POSITION_CHUNK_ELEMENTS = self.chunk
+
+    def test_counts_per_pos(self):
+        """matches the generic AlignmentI implementation"""
+        for aln in self.alns:
+            for motif_length in (1, 2, 3):
+                for flag in (False, True):
+                    kwargs = dict(
+                        motif_length=motif_length,
+                        include_ambiguity=flag,
+                        allow_gap=flag,
+                    )
+                    got = aln.counts_per_pos(**kwargs)
+                    expect = AlignmentI.counts_per_pos(aln, **kwargs)
+                    self.assertEqual(got.motifs, expect.motifs)
+                    numpy.testing.assert_equal(got.array, expect.array)
+
+    def test_omit_gap_pos(self):
+        """matches the generic AlignmentI implementation"""
+        for aln in self.alns:
+            for motif_length in (1, 3):
+                for frac in (0, 0.5, 0.999999):
+                    got = aln.omit_gap_pos(frac, motif_length=motif_length)
+                    expect = AlignmentI.omit_gap_pos(
+                        aln, frac, motif_length=motif_length
+                    )
+                    if expect is None:
+                        self.assertIs(got, None)
+                    else:
+                        self.assertEqual(got.to_dict(), expect.to_dict())
+
+    def test_take_positions(self):
+        """matches the generic AlignmentI implementation"""
+        for aln in self.alns:
+            for negate in (False, True):
+                got = aln.take_positions([0, 2, 3], negate=negate)
+                expect = AlignmentI.take_positions(aln, [0, 2, 3], negate=negate)
+                self.assertEqual(got.to_dict(), expect.to_dict())
+                self.assertEqual(got.names, expect.names)
+
+
+if __name__ == "__main__":
+    main()
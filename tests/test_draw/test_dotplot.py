@@ -1,6 +1,10 @@
 from unittest import TestCase, main
+from unittest.mock import patch
 
 from cogent3 import DNA, load_aligned_seqs, make_unaligned_seqs
+from cogent3.align import pycompare
+from cogent3.align.align import dotplot
+from cogent3.align.pycompare import seeded_dotplot, word_hits
 from cogent3.core.alignment import Aligned, ArrayAlignment
 from cogent3.draw.dotplot import (
     Dotplot,
@@ -40,6 +44,63 @@ class TestUtilFunctions(TestCase):
         self.assertTrue(not_gap(m[0]))
         self.assertFalse(not_gap(m[5]))
 
+    def test_word_hits(self):
+        """positions of all identical words are returned"""
+        pos1, pos2 = word_hits(b"ACGACG", b"TACGA", 3)
+        got = sorted(zip(pos1.tolist(), pos2.tolist()))
+        self.assertEqual(got, [(0, 1), (1, 2), (3, 1)])
+        pos1, pos2 = word_hits(b"AC", b"ACGT", 3)
+        self.assertEqual(len(pos1), 0)
+
+    def test_seeded_dotplot(self):
+        """seeded dotplot matches exhaustive dotplot if seeds are short enough"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+        seq1 = str(aln.get_seq("Human")[:600])
+        seq2 = str(aln.get_seq("Mouse")[:600])
+        for window, threshold, min_gap, band in [
+            (20, 15, 0, None),
+            (10, 10, 0, None),
+            (10, 8, 5, 40),
+        ]:
+            expect = dotplot(
+                seq1, seq2, window, threshold, min_gap, band, show_progress=False
+            )
+            # the default seed is a run that any such window includes
+            got = seeded_dotplot(
+                seq1, seq2, window, threshold, min_gap, band, show_progress=False
+            )
+            self.assertTrue(len(expect) > 0)
+            self.assertEqual(sorted(got), sorted(expect))
+
+        # longer seeds only find a subset
+        expect = dotplot(seq1, seq2, 20, 15, show_progress=False)
+        for seed_length in (12, "auto"):
+            got = seeded_dotplot(
+                seq1, seq2, 20, 15, seed_length=seed_length, show_progress=False
+            )
+            self.assertTrue(0 < len(got) <= len(expect))
+        self.assertEqual(seeded_dotplot("AAAA", "CCCC", 3, 2), [])
+
+    def test_seeded_dotplot_max_hits(self):
+        """the default seed is lengthened to bound the number of word hits"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+        seq1 = str(aln.get_seq("Human")[:600])
+        seq2 = str(aln.get_seq("Mouse")[:600])
+        with patch.object(pycompare, "MAX_SEED_HITS", 5000), patch.object(
+            pycompare, "word_hits", wraps=word_hits
+        ) as hits:
+            got = seeded_dotplot(seq1, seq2, 20, 15, show_progress=False)
+        (args, kw) = hits.call_args
+        seed_length = args[2]
+        # the exact seed, of length 3, has more hits
+        self.assertGreater(seed_length, 3)
+        self.assertLessEqual(len(word_hits(*args)[0]), 5000)
+        expect = seeded_dotplot(
+            seq1, seq2, 20, 15, seed_length=seed_length, show_progress=False
+        )
+        self.assertEqual(got, expect)
+        self.assertTrue(len(got) > 0)
+
     def test_convert_input(self):
         """converts data for dotplotting"""
         m, seq = DNA.make_seq("ACGGT--A").parse_out_gaps()
@@ -136,6 +197,23 @@ class TestUtilFunctions(TestCase):
         self.assertEqual(len(dp.seq1), 4)
         self.assertEqual(len(dp.seq2), 3)
 
+    def test_dotplot_seed_length(self):
+        """the default seed_length gives the exhaustive comparison"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+        seqs = aln.take_seqs(["Human", "Mouse"])[:300].degap()
+        for seed_length in (None, 1):
+            dp = seqs.dotplot(
+                "Human", "Mouse", window=10, threshold=8, seed_length=seed_length
+            )
+            seq1, seq2 = str(dp.seq1), str(dp.seq2)
+            expect = dotplot(seq1, seq2, 10, 8, show_progress=False)
+            self.assertEqual(dp._fwd, _convert_coords_for_scatter(expect))
+        # automatic seeds find a subset
+        auto = seqs.dotplot(
+            "Human", "Mouse", window=10, threshold=8, seed_length="auto"
+        )
+        self.assertTrue(0 < len(auto._fwd[0]) <= len(dp._fwd[0]))
+
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 import os
+import tempfile
 import warnings
 
 from unittest import TestCase, main
+from unittest.mock import patch
 
 import numpy
 
@@ -16,6 +18,7 @@ from cogent3 import (
     make_aligned_seqs,
     make_unaligned_seqs,
 )
+from cogent3.cluster.UPGMA import upgma
 from cogent3.evolve._pairwise_distance import (
     _fill_diversity_matrix as pyx_fill_diversity_matrix,
 )
@@ -28,13 +31,17 @@ from cogent3.evolve.fast_distance import (
     ParalinearPair,
     PercentIdentityPair,
     TN93Pair,
+    _TilePairStats,
     _calculators,
     _fill_diversity_matrix,
+    _get_row_tiles,
     _hamming,
     _jc69_from_matrix,
+    _kmer_codes,
     _tn93_from_matrix,
     available_distances,
     get_distance_calculator,
+    get_kmer_distances,
     get_moltype_index_array,
     seq_to_indices,
 )
@@ -551,6 +558,173 @@ class TestPair(TestCase):
         self.assertTrue((present, "seq1") in pwds)
         self.assertFalse((missing, "seq1") in pwds)
 
+    def test_batched_matches_pairwise(self):
+        """vectorised evaluation matches the pair-by-pair evaluation"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype=DNA)
+        aln = aln.take_seqs(aln.names[:12])
+        # add a duplicate and a sequence without valid positions in common
+        data = aln.to_dict()
+        data["dupe"] = data[aln.names[3]]
+        data["gappy"] = "-" * len(aln)
+        aln = make_aligned_seqs(data=data, moltype=DNA)
+        for name in ("hamming", "percent", "jc69", "tn93", "logdet", "paralinear"):
+            batched = get_distance_calculator(name, moltype=DNA, alignment=aln)
+            # a tiny memory budget forces multiple blocks
+            batched.run(show_progress=False, block_bytes=1)
+            pairwise = get_distance_calculator(name, moltype=DNA, alignment=aln)
+            pairwise._batch_func = None
+            pairwise.run(show_progress=False)
+            self.assertEqual(batched.duplicated, pairwise.duplicated)
+            self.assertEqual(list(batched._dists), list(pairwise._dists))
+            for key, expect in pairwise._dists.items():
+                got = batched._dists[key]
+                for g, e in zip(got, expect):
+                    if e is None:
+                        self.assertIs(g, None)
+                    else:
+                        assert_allclose(g, e, err_msg=f"{name} {key}")
+
+        # default block size gives the same result
+        calc = JC69Pair(DNA, alignment=aln)
+        calc.run(show_progress=False)
+        pairwise = JC69Pair(DNA, alignment=aln)
+        pairwise._batch_func = None
+        pairwise.run(show_progress=False)
+        assert_equal(calc.dists.array, pairwise.dists.array)
+
+    def test_batched_invalid_raises(self):
+        """vectorised evaluation raises ArithmeticError for invalid pairs"""
+        aln = make_aligned_seqs(
+            data={"a": "ACGT", "b": "CATG", "c": "ACGT"}, moltype=DNA
+        )
+        calc = JC69Pair(DNA, alignment=aln, invalid_raises=True)
+        with self.assertRaises(ArithmeticError):
+            calc.run(show_progress=False)
+
+    def test_row_tiles(self):
+        """row tiles cover the upper triangle without overlap"""
+        for num_seqs, num_tiles in [(2, 4), (10, 3), (55, 16), (100, 1)]:
+            tiles = _get_row_tiles(num_seqs, num_tiles)
+            rows = [i for start, end in tiles for i in range(start, end)]
+            self.assertEqual(rows, list(range(num_seqs - 1)))
+            self.assertLessEqual(len(tiles), num_tiles)
+
+    def test_tile_pair_stats(self):
+        """tiles computed from a memory mapped array match serial result"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype=DNA)
+        expect = TN93Pair(DNA, alignment=aln)
+        expect.run(show_progress=False)
+        calc = TN93Pair(DNA, alignment=aln)
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, "seqs.npy")
+            numpy.save(path, calc.indexed_seqs)
+            func = _TilePairStats(path, 4, calc._batch_func, calc._func_args)
+            results = [func(t) for t in _get_row_tiles(aln.num_seqs, 5)]
+        stats = numpy.concatenate([r[2] for r in results], axis=1)
+        index1 = numpy.concatenate([r[0] for r in results])
+        index2 = numpy.concatenate([r[1] for r in results])
+        names = aln.names
+        for i, j, dist in zip(index1, index2, stats[2]):
+            key = names[i], names[j]
+            if key in expect._dists:
+                assert_allclose(expect._dists[key].dist, dist)
+
+    def test_parallel_run(self):
+        """distances computed by worker processes match serial result"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype=DNA)
+        expect = TN93Pair(DNA, alignment=aln)
+        expect.run(show_progress=False)
+        calc = TN93Pair(DNA, alignment=aln)
+        # parallel.imap requires fewer workers than cpus
+        with patch("multiprocessing.cpu_count", return_value=4):
+            calc.run(show_progress=False, parallel=True, par_kw=dict(max_workers=2))
+        assert_allclose(calc.dists.array, expect.dists.array)
+        self.assertEqual(calc.duplicated, expect.duplicated)
+
+    def test_parallel_without_batch_warns(self):
+        """parallel is ignored with a warning for pair by pair evaluation"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype=DNA)
+        aln = aln.take_seqs(aln.names[:5])
+        expect = TN93Pair(DNA, alignment=aln)
+        expect.run(show_progress=False)
+        calc = TN93Pair(DNA, alignment=aln)
+        calc._batch_func = None
+        with self.assertWarns(UserWarning):
+            calc.run(show_progress=False, parallel=True)
+        assert_allclose(calc.dists.array, expect.dists.array)
+
+    def test_kmer_codes(self):
+        """k-mers with non-canonical states are excluded"""
+        char_to_index = get_moltype_index_array(DNA)
+        indices = seq_to_indices("ACGNTTTT", char_to_index)
+        got = _kmer_codes(indices, 2, 4)
+        # TT, CG and AC given the TCAG order of DNA states
+        self.assertEqual(got.tolist(), [0, 7, 9])
+        self.assertEqual(len(_kmer_codes(indices[:1], 2, 4)), 0)
+
+    def test_kmer_distances(self):
+        """k-mer distances are alignment free and track divergence"""
+        seqs = make_unaligned_seqs(
+            data={
+                "a": "ACGGTCAGTTACCGATAGGCTAGCAT",
+                "b": "ACGGTCAGTTACCGATAGGCTAGCAT",
+                "c": "ACGGTC--AGTTACCGTTAGGCTAGCAT",
+                "d": "TTTTTTTTTTTTTTTTTTTTTTTTTTTT",
+            },
+            moltype=DNA,
+        )
+        dists = get_kmer_distances(seqs, k=4)
+        self.assertIsInstance(dists, DistanceMatrix)
+        self.assertEqual(dists["a", "b"], 0)
+        self.assertEqual(dists["a", "c"], dists["c", "a"])
+        self.assertTrue(0 < dists["a", "c"] < dists["a", "d"])
+        self.assertEqual(dists["a", "d"], 1)
+        # gaps are ignored, so the aligned form gives the same distances
+        aln = load_aligned_seqs("data/brca1.fasta", moltype=DNA)
+        aln = aln.take_seqs(aln.names[:5])
+        got = get_kmer_distances(aln)
+        expect = get_kmer_distances(aln.degap())
+        assert_allclose(got.array, expect.array)
+
+        # profiles formed a block at a time give the same distances
+        with patch("cogent3.evolve.fast_distance.KMER_PROFILE_CELLS", 50):
+            blocked = get_kmer_distances(aln)
+        assert_allclose(blocked.array, got.array)
+
+    def test_kmer_distances_no_kmers(self):
+        """sequences without k-mers are at distance 1 from all others"""
+        seqs = make_unaligned_seqs(
+            data={
+                "a": "ACGGTCAGTTACCGATAGGCTAGCAT",
+                "b": "ACGGTCAGTTACCGTTAGGCTAGCAT",
+                "c": "ACG",
+                "d": "N" * 10,
+            },
+            moltype=DNA,
+        )
+        dists = get_kmer_distances(seqs, k=4)
+        self.assertFalse(numpy.isnan(dists.array).any())
+        for name in "abd":
+            self.assertEqual(dists["c", name], 1)
+        self.assertEqual(dists["d", "a"], 1)
+        self.assertTrue(0 < dists["a", "b"] < 1)
+        tree = upgma(dists)
+        lengths = [edge.length for edge in tree.get_edge_vector(include_root=False)]
+        self.assertFalse(numpy.isnan(lengths).any())
+
+    def test_kmer_distances_large_k(self):
+        """long k-mers do not need a profile of every possible k-mer"""
+        seqs = make_unaligned_seqs(
+            data={"a": "ACGGTCAGTTACCGATAGGCTAGCAT", "b": "ACGGTCAGTTACCGAT"},
+            moltype=DNA,
+        )
+        dists = get_kmer_distances(seqs, k=12)
+        self.assertEqual(dists["a", "b"], 0)
+        with self.assertRaises(ValueError):
+            get_kmer_distances(seqs, k=32)
+        with self.assertRaises(ValueError):
+            get_kmer_distances(seqs, k=0)
+
 
 class TestGetDisplayCalculators(TestCase):
     def test_get_calculator(self):
@@ -12,6 +12,7 @@ tests to do:
 """
 import json
 import os
+import pickle
 import warnings
 
 import numpy
@@ -26,7 +27,13 @@ from cogent3 import (
     make_aligned_seqs,
     make_tree,
 )
-from cogent3.evolve import ns_substitution_model, predicate, substitution_model
+from cogent3.evolve import (
+    likelihood_tree,
+    ns_substitution_model,
+    predicate,
+    substitution_model,
+)
+from cogent3.evolve.likelihood_tree import _LikelihoodTreeEdge, get_log_scale
 from cogent3.evolve.models import (
     CNFGTR,
     GN,
@@ -498,6 +505,32 @@ NineBande    root    1.00  1.00
         lf.set_param_rule("beta", bin="high", value=10.0)
         simulated_alignment = lf.simulate_alignment(100)
 
+    def test_simulate_states(self):
+        """simulate many alignments as an array of states"""
+        lf = self._makeLikelihoodFunction()
+        self._setLengthsAndBetas(lf)
+        names, states = lf.simulate_states(5, 30, seed=1)
+        self.assertEqual(set(names), set(self.data.names))
+        self.assertEqual(states.shape, (5, len(names), 30))
+        self.assertTrue(states.max() < len(lf.motifs))
+        # reproducible from the seed
+        numpy.testing.assert_equal(lf.simulate_states(5, 30, seed=1)[1], states)
+        names, states = lf.simulate_states(2, exclude_internal=False)
+        self.assertIn("root", names)
+        self.assertEqual(states.shape, (2, 8, len(self.data)))
+
+        # patchy site classes draw from both bins
+        lf = self.submodel.make_likelihood_function(
+            self.tree, bins=["low", "high"], sites_independent=False
+        )
+        lf.set_param_rule("beta", bin="low", value=0.01)
+        lf.set_param_rule("beta", bin="high", value=100.0)
+        names, states = lf.simulate_states(10, 100, seed=1)
+        self.assertEqual(states.shape, (10, len(self.tree.get_tip_names()), 100))
+        bdist = lf.get_param_value("bdist")
+        bins = bdist.emit_many(10, 100, numpy.random.RandomState(1))
+        self.assertEqual(set(bins.ravel().tolist()), {0, 1})
+
     def test_simulate_alignment2(self):
         "Simulate alignment with dinucleotide model"
         al = make_aligned_seqs(data={"a": "ggaatt", "c": "cctaat"})
@@ -746,6 +779,124 @@ NineBande      root    1.0000    1.0000
         lf.set_alignment(self.data)
         self.assertRaises(Exception, lf.get_rate_matrix_for_edge, "NineBande")
 
+    def test_stacked_psubs(self):
+        """psubs computed for all edges together match individual ones"""
+        lf = self._makeLikelihoodFunction()
+        lf.set_param_rule("length", edge="Human", init=0.3)
+        lf.set_param_rule("length", edge="Mouse", init=0.01)
+        calc = lf.make_calculator()
+        x = numpy.array(calc.get_value_array())
+        calc(x * 1.2)  # a new rate matrix, so all psubs are updated
+        lf.update_from_calculator(calc)
+        for edge in self.tree.get_edge_vector(include_root=False):
+            Q = lf.get_rate_matrix_for_edge(edge.name, calibrated=True)
+            length = lf.get_param_value("length", edge=edge.name)
+            P = lf.get_psub_for_edge(edge.name)
+            self.assertFloatEqual(expm(Q.array)(length), P.array)
+
+    def test_rescaled_likelihoods(self):
+        """rescaling partial likelihoods does not change results"""
+        threshold = _LikelihoodTreeEdge._scaling_threshold
+        results = []
+        for kw in ({}, dict(bins=2)):
+            for always in (False, True):
+                if always:
+                    _LikelihoodTreeEdge._scaling_threshold = 1.0
+                try:
+                    lf = self._makeLikelihoodFunction(**kw)
+                    results.append(
+                        (
+                            lf.get_log_likelihood(),
+                            lf.get_full_length_likelihoods(),
+                            lf.get_G_statistic(),
+                        )
+                    )
+                finally:
+                    _LikelihoodTreeEdge._scaling_threshold = threshold
+
+        for (unscaled, scaled) in (results[:2], results[2:]):
+            for (expect, got) in zip(unscaled, scaled):
+                assert_allclose(got, expect)
+
+    def test_no_underflow(self):
+        """likelihoods too small for a float are handled"""
+        names = ["s%d" % i for i in range(600)]
+        rng = numpy.random.RandomState(1)
+        seqs = {n: "".join(rng.choice(list("ACGT"), 10)) for n in names}
+        aln = make_aligned_seqs(data=seqs, moltype="dna")
+        lf = get_model("HKY85").make_likelihood_function(make_tree(tip_names=names))
+        lf.set_alignment(aln)
+        lnL = lf.get_log_likelihood()
+        # each site likelihood is far below the smallest float
+        log_lhs = lf.get_full_length_log_likelihoods()
+        self.assertTrue((log_lhs < numpy.log(numpy.finfo(float).tiny)).all())
+        assert_allclose(log_lhs.sum(), lnL)
+
+    def test_rescaled_only_when_needed(self):
+        """only rows of partial likelihoods that may underflow are rescaled"""
+        lf = self._makeLikelihoodFunction()
+        # a small tree has nothing rescaled
+        self.assertIsNone(get_log_scale(lf.get_param_value("lh")))
+
+        edge = lf.get_param_value("lht")
+        plhs = numpy.array([[0.5, 0.25, 0, 0], [0, 0, 0, 0], [2.0 ** -300, 0, 0, 0]])
+        self.assertIsNone(edge._rescale(plhs[:2].copy(), None))
+        log_scale = edge._rescale(plhs, None)
+        assert_allclose(log_scale, [0, 0, -299 * numpy.log(2)])
+        assert_allclose(plhs[2], [0.5, 0, 0, 0])
+
+    def test_single_precision(self):
+        """single precision partial likelihoods give a close lnL"""
+        for kw in ({}, dict(bins=2)):
+            expect = self._makeLikelihoodFunction(**kw)
+            lf = self._makeLikelihoodFunction(precision="single", **kw)
+            self.assertEqual(lf.get_param_value("lh", bin="bin0").dtype, numpy.float32)
+            assert_allclose(
+                lf.get_log_likelihood(), expect.get_log_likelihood(), rtol=1e-6
+            )
+            assert_allclose(
+                lf.get_full_length_likelihoods(),
+                expect.get_full_length_likelihoods(),
+                rtol=1e-5,
+            )
+        rd = lf.to_rich_dict()
+        self.assertEqual(rd["likelihood_construction"]["precision"], "single")
+        with self.assertRaises(ValueError):
+            self._makeLikelihoodFunction(precision="half")
+
+    def test_threads(self):
+        """dividing site patterns between threads does not change results"""
+        min_sites = likelihood_tree.MIN_SITES_PER_THREAD
+        threshold = _LikelihoodTreeEdge._scaling_threshold
+        likelihood_tree.MIN_SITES_PER_THREAD = 2
+        try:
+            for always in (False, True):
+                if always:
+                    # all sites are rescaled
+                    _LikelihoodTreeEdge._scaling_threshold = 1.0
+                for kw in ({}, dict(precision="single"), dict(bins=2)):
+                    expect = self._makeLikelihoodFunction(**kw)
+                    lf = self._makeLikelihoodFunction(threads=3, **kw)
+                    lht = lf.get_param_value("lht")
+                    self.assertEqual(len(lht._site_blocks()), 3)
+                    assert_allclose(lf.lnL, expect.lnL)
+                # the root total, summed over blocks of sites
+                lht = lf.get_param_value("lht")
+                lhs = numpy.random.random((len(lht.counts), 4))
+                mprobs = numpy.full(4, 0.25)
+                assert_allclose(
+                    lht.get_total_log_likelihood(lhs, mprobs),
+                    expect.get_param_value("lht").get_total_log_likelihood(
+                        lhs, mprobs
+                    ),
+                )
+        finally:
+            likelihood_tree.MIN_SITES_PER_THREAD = min_sites
+            _LikelihoodTreeEdge._scaling_threshold = threshold
+
+        with self.assertRaises(ValueError):
+            self._makeLikelihoodFunction(threads=0)
+
     def test_get_all_psubs_discrete(self):
         """should work for discrete time models"""
         sm = get_model("BH")
@@ -807,6 +958,90 @@ NineBande      root    1.0000    1.0000
             lf = sm.make_likelihood_function(t)
             lf.set_alignment(al)
 
+    def test_get_log_likelihoods(self):
+        """stacked evaluation of alignments matches separate evaluation"""
+        lf = self._makeLikelihoodFunction()
+        self._setLengthsAndBetas(lf)
+        lnL = lf.lnL
+        alns = [self.data[:30], self.data[30:100], self.data[100:]]
+        got = lf.get_log_likelihoods(alns)
+        expect = []
+        for aln in alns:
+            other = self._makeLikelihoodFunction()
+            self._setLengthsAndBetas(other)
+            other.set_alignment(aln)
+            expect.append(other.lnL)
+        assert_allclose(got, expect)
+        # the likelihood function is unchanged
+        assert_allclose(lf.lnL, lnL)
+        # codon models with lengths not divisible by 3
+        sm = CNFGTR()
+        lf = sm.make_likelihood_function(self.tree)
+        lf.set_alignment(self.data[:30])
+        alns = [self.data[:31], self.data[33:65]]
+        got = lf.get_log_likelihoods(alns)
+        expect = []
+        for aln in alns:
+            other = sm.make_likelihood_function(self.tree)
+            other.set_alignment(aln[: len(aln) // 3 * 3])
+            other.set_motif_probs(lf.get_motif_probs())
+            expect.append(other.lnL)
+        assert_allclose(got, expect)
+        # the bin HMM links sites
+        sm = get_model("HKY85", ordered_param="rate", distribution="gamma")
+        lf = sm.make_likelihood_function(self.tree, bins=2, sites_independent=False)
+        lf.set_alignment(self.data)
+        with self.assertRaises(ValueError):
+            lf.get_log_likelihoods([self.data[:30]])
+
+    def test_gradient(self):
+        """analytic edge length derivatives match numerical ones"""
+        lf = self._makeLikelihoodFunction()
+        lf.set_param_rule("length", value=0.2, edge="Human", is_constant=True)
+        lf.set_param_rule("length", edge="Mouse", init=0.3)
+        calc = lf.make_calculator()
+        self.assertIsNotNone(calc.partial_derivatives)
+        x = numpy.array(calc.get_value_array())
+        calc(x * 1.1)
+        got = calc.gradient()
+        calc.partial_derivatives = None
+        expect = calc.gradient()
+        assert_allclose(got, expect, rtol=1e-4, atol=1e-3)
+        # not supported for site heterogeneity
+        lf = self._makeLikelihoodFunction(bins=2)
+        self.assertIsNone(lf.make_calculator().partial_derivatives)
+
+    def test_optimise_lbfgs(self):
+        """quasi-Newton local optimisation matches Powell"""
+        lf = self._makeLikelihoodFunction()
+        lf.optimise(local=True, show_progress=False)
+        other = self._makeLikelihoodFunction()
+        other.optimise(local=True, local_method="lbfgs", show_progress=False)
+        assert_allclose(other.lnL, lf.lnL, rtol=1e-6)
+
+    def test_optimise_from_starts(self):
+        """optimising from several starts returns their end points"""
+        lf = self._makeLikelihoodFunction()
+        lf.optimise(local=True, show_progress=False)
+        other = self._makeLikelihoodFunction()
+        end_points = other.optimise(starts=3, seed=1, show_progress=False)
+        self.assertEqual(len(end_points), 3)
+        best = max(fval for (fval, x, evals) in end_points)
+        self.assertGreaterEqual(other.lnL, best)
+        assert_allclose(other.lnL, lf.lnL, rtol=1e-6)
+        self.assertIsNone(lf.optimise(local=True, show_progress=False))
+        with self.assertRaises(ValueError):
+            other.optimise(starts=2, filename="checkpoint.pickle")
+
+        # calculators, and so the work from each start, can be sent to
+        # worker processes
+        calc = other.make_calculator(compiled=True)
+        x = numpy.array(calc.get_value_array())
+        expect = calc(x * 1.1)
+        calc = pickle.loads(pickle.dumps(calc))
+        assert_allclose(calc.testfunction(), expect)
+        assert_allclose(calc(x), other.lnL)
+
     def test_get_param_rules(self):
         """correctly return rules that can be used to reconstruct a lf"""
         lf = self.submodel.make_likelihood_function(self.tree)
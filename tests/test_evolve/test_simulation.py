@@ -5,8 +5,14 @@ Jukes Cantor model using a four taxon tree with very different branch lengths,
  and a Kimura two (really one) parameter model.
 
 The test is to reestimate the parameter values as accurately as possible."""
+from unittest import TestCase, main
+
+import numpy
+
 from cogent3 import make_tree
 from cogent3.evolve import substitution_model
+from cogent3.evolve.simulate import evolve_states, picks, random_states
+from cogent3.maths.markov import SiteClassTransitionMatrix
 
 
 __author__ = "Peter Maxwell and Gavin Huttley"
@@ -74,3 +80,51 @@ def _est_simulations():
     new_lf.optimise(local=True)
     new_lf.set_name("Estimated Kappa model")
     print(new_lf)
+
+
+class VectorisedSimulationTests(TestCase):
+    def setUp(self):
+        self.random_state = numpy.random.RandomState(7)
+
+    def test_picks(self):
+        """states are picked from the rows of cumulative probabilities"""
+        cumulative = numpy.array([[0.5, 0.5, 1.0], [0.0, 0.0, 1.0]])
+        rows = numpy.array([0, 0, 0, 1, 1])
+        uniforms = numpy.array([0.0, 0.49, 0.5, 0.0, 0.999999])
+        got = picks(cumulative, rows, uniforms)
+        self.assertEqual(got.tolist(), [0, 0, 2, 2, 2])
+
+    def test_random_states(self):
+        """frequencies of random states match the probabilities"""
+        probs = [0.1, 0.0, 0.6, 0.3]
+        states = random_states(probs, (10, 10000), self.random_state)
+        self.assertEqual(states.shape, (10, 10000))
+        freqs = numpy.bincount(states.ravel(), minlength=4) / states.size
+        numpy.testing.assert_allclose(freqs, probs, atol=0.01)
+
+    def test_evolve_states(self):
+        """each site uses the psub of its bin and the row of its state"""
+        identity = numpy.identity(4)
+        to_g = numpy.zeros((4, 4))
+        to_g[:, 2] = 1.0
+        parent = numpy.tile(numpy.arange(4), (3, 5))
+        site_bins = numpy.array([0, 1] * 10)
+        got = evolve_states([identity, to_g], parent, site_bins, self.random_state)
+        self.assertEqual(got.shape, parent.shape)
+        numpy.testing.assert_equal(got[:, ::2], parent[:, ::2])
+        self.assertTrue((got[:, 1::2] == 2).all())
+
+    def test_emit_many(self):
+        """site class series follow the transition matrix"""
+        never = SiteClassTransitionMatrix(0.0, [0.5, 0.5])
+        series = never.emit_many(100, 20, self.random_state)
+        self.assertEqual(series.shape, (100, 20))
+        self.assertTrue((series == series[:, :1]).all())
+        self.assertTrue(0.3 < series[:, 0].mean() < 0.7)
+        always = SiteClassTransitionMatrix(1.0, [0.2, 0.8])
+        series = always.emit_many(100, 100, self.random_state)
+        self.assertTrue(0.75 < series.mean() < 0.85)
+
+
+if __name__ == "__main__":
+    main()
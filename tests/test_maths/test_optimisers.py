@@ -9,7 +9,11 @@ from unittest import TestCase, main
 
 import numpy
 
-from cogent3.maths.optimisers import MaximumEvaluationsReached, maximise
+from cogent3.maths.optimisers import (
+    MaximumEvaluationsReached,
+    maximise,
+    maximise_from_starts,
+)
 
 
 __author__ = "Peter Maxwell and Gavin Huttley"
@@ -87,11 +91,59 @@ class OptimiserTestCase(TestCase):
         # Global minimum not the nearest one
         self._test_optimisation(local=True, target=2)
 
+    def test_local_lbfgs(self):
+        # quasi-Newton local optimiser, numerical gradient
+        self._test_optimisation(local=True, target=2, local_method="lbfgs")
+        # maximum is beyond the upper bound
+        self._test_optimisation(
+            local=True,
+            xinit=0.5,
+            target=1,
+            bounds=([0.0], [1.0]),
+            local_method="lbfgs",
+        )
+
+    def test_local_lbfgs_gradient(self):
+        # quasi-Newton local optimiser, with a gradient function
+        def gradient(x):
+            return -0.1 * (12 * x ** 3 + 24 * x ** 2 - 96 * x)
+
+        self._test_optimisation(
+            local=True, target=2, local_method="lbfgs", gradient=gradient
+        )
+        self.assertRaises(
+            ValueError, self._test_optimisation, local=True, local_method="newton"
+        )
+
     def test_limited(self):
         self.assertRaises(
             MaximumEvaluationsReached, self._test_optimisation, max_evaluations=5
         )
 
+    def test_limited_lbfgs_gradient(self):
+        # gradient calls count against max_evaluations
+        f, last, evals = MakeF()
+        calls = [0]
+
+        def gradient(x):
+            calls[0] += 1
+            return -0.1 * (12 * x ** 3 + 24 * x ** 2 - 96 * x)
+
+        with self.assertRaises(MaximumEvaluationsReached) as context:
+            quiet(
+                maximise,
+                f,
+                [1.0],
+                ([-10], [10]),
+                local=True,
+                local_method="lbfgs",
+                gradient=gradient,
+                max_evaluations=3,
+            )
+        self.assertLessEqual(context.exception.args[0], 3)
+        # one more evaluation, restoring the best x
+        self.assertLessEqual(evals[0] + calls[0], 4)
+
     # def test_limited_warning(self):
     #     """optimiser warning if max_evaluations exceeded"""
     #     self._test_optimisation(max_evaluations=5, limit_action='warn')
@@ -121,6 +173,48 @@ class OptimiserTestCase(TestCase):
         if os.path.exists(filename):
             os.remove(filename)
 
+    def test_from_starts(self):
+        """optimising from several starts returns every end point"""
+        f, last, evals = MakeF()
+        x, end_points = maximise_from_starts(
+            f, [[1.0], [-3.0], [5.0]], ([-10], [10]), show_progress=False
+        )
+        self.assertEqual(x, last[0])
+        self.assertTrue(abs(x[0] + 4) < 0.0001, x)
+        self.assertEqual(len(end_points), 3)
+        ends = [x[0] for (fval, x, evals) in end_points]
+        numpy.testing.assert_allclose(ends, [2, -4, 2], atol=0.01)
+        for (fval, x, evals) in end_points:
+            self.assertEqual(fval, f(x))
+            self.assertGreater(evals, 1)
+
+        # annealing chains find the global maximum from a local one
+        x, end_points = quiet(
+            maximise_from_starts,
+            f,
+            [[2.0], [2.0]],
+            ([-10], [10]),
+            method="tempering",
+            seed=1,
+        )
+        self.assertTrue(abs(x[0] + 4) < 0.0001, x)
+        self.assertEqual(len(end_points), 2)
+
+        # the evaluations from each start, and of polishing, are limited
+        with self.assertWarns(UserWarning):
+            x, end_points = maximise_from_starts(
+                f,
+                [[1.0], [-3.0]],
+                ([-10], [10]),
+                max_evaluations=5,
+                show_progress=False,
+            )
+        self.assertEqual([evals for (fval, x, evals) in end_points], [5, 5])
+        self.assertEqual(x, last[0])
+
+        with self.assertRaises(ValueError):
+            maximise_from_starts(f, [[1.0]], method="newton")
+
 
 if __name__ == "__main__":
     main()
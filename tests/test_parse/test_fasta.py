@@ -3,9 +3,15 @@
 """
 import os
 
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main
 
+from numpy.testing import assert_equal
+
+from cogent3 import load_aligned_seqs, load_unaligned_seqs, make_aligned_seqs
 from cogent3.core.info import Info
+from cogent3.core.moltype import DNA
 from cogent3.core.sequence import DnaSequence
 from cogent3.core.sequence import ProteinSequence as Protein
 from cogent3.core.sequence import Sequence
@@ -17,6 +23,8 @@ from cogent3.parse.fasta import (
     NcbiFastaLabelParser,
     NcbiFastaParser,
     RichLabel,
+    iter_fasta_indices,
+    iter_fasta_records,
 )
 from cogent3.parse.record import RecordError
 
@@ -135,6 +143,111 @@ class MinimalFastaParserTests(GenericFastaTest):
         self.assertTrue("Human" in seqs)
 
 
+class IterFastaRecordsTests(GenericFastaTest):
+    """Tests of the chunked iter_fasta_records and iter_fasta_indices"""
+
+    def _check_all_chunk_sizes(self, lines, **kwargs):
+        text = "\n".join(lines)
+        expect = list(MinimalFastaParser(lines, **kwargs))
+        for chunk_size in (1, 2, 3, 7, 1000):
+            got = list(
+                iter_fasta_records(StringIO(text), chunk_size=chunk_size, **kwargs)
+            )
+            self.assertEqual(got, expect)
+            got = list(
+                iter_fasta_records(
+                    BytesIO(text.encode("utf-8")), chunk_size=chunk_size, **kwargs
+                )
+            )
+            self.assertEqual([(l, s.decode("utf-8")) for l, s in got], expect)
+
+    def test_matches_line_parser(self):
+        """records identical to those from parsing lines, for any chunk size"""
+        for lines in (
+            self.empty,
+            self.oneseq,
+            self.multiline,
+            self.threeseq,
+            [">a>b", "AC>G", "", "#comment", ">c", "T T", ">d", "G"],
+        ):
+            self._check_all_chunk_sizes(lines)
+        self._check_all_chunk_sizes(self.twogood, strict=False)
+
+    def test_indented_labels(self):
+        """label lines with leading whitespace start a record"""
+        for lines in ([">a", "AC", "  >b", "GT"], ["  >a", "AC", "\t>b", "GT"]):
+            self._check_all_chunk_sizes(lines)
+            for strict in (True, False):
+                text = StringIO("\n".join(lines))
+                got = list(iter_fasta_records(text, strict=strict))
+                self.assertEqual(got, [("a", "AC"), ("b", "GT")])
+
+        path = os.path.join(data_path, "brca1.fasta")
+        with open(path) as infile:
+            data = infile.read()
+        with TemporaryDirectory() as dirname:
+            indented = os.path.join(dirname, "indented.fasta")
+            with open(indented, "w") as outfile:
+                outfile.write("  " + data.replace("\n>", "\n >"))
+            got = load_unaligned_seqs(indented, moltype="dna")
+        expect = load_unaligned_seqs(path, moltype="dna")
+        self.assertEqual(got.to_dict(), expect.to_dict())
+
+    def test_strict(self):
+        """raises RecordError for missing labels or sequences if strict"""
+        for lines in (self.twogood, self.nolabels, self.labels):
+            text = "\n".join(lines)
+            with self.assertRaises(RecordError):
+                list(iter_fasta_records(StringIO(text), chunk_size=3))
+
+    def test_carriage_returns(self):
+        """handles files with carriage return line endings"""
+        data = b">a\r\nAC\r\nGT\r\n>b\rTT\r"
+        got = list(iter_fasta_records(BytesIO(data), chunk_size=4))
+        self.assertEqual(got, [("a", b"ACGT"), ("b", b"TT")])
+
+    def test_indices(self):
+        """sequences converted to alphabet indices"""
+        alphabet = DNA.alphabets.degen_gapped
+        data = StringIO(">a\nacgt\n>b\nN-RT\n")
+        got = list(iter_fasta_indices(data, alphabet, chunk_size=5))
+        self.assertEqual([l for l, _ in got], ["a", "b"])
+        assert_equal(got[0][1], alphabet.to_indices("ACGT"))
+        assert_equal(got[1][1], alphabet.to_indices("N-RT"))
+        self.assertEqual(got[0][1].dtype, alphabet.array_type)
+        with self.assertRaises(KeyError):
+            list(iter_fasta_indices(StringIO(">a\nAC!T\n"), alphabet))
+
+    def test_load_aligned_seqs(self):
+        """load_aligned_seqs fast path matches the line based parser"""
+        path = os.path.join(data_path, "brca1.fasta")
+        got = load_aligned_seqs(path, moltype="dna")
+        with open(path) as infile:
+            expect = make_aligned_seqs(
+                list(MinimalFastaParser(infile.readlines())), moltype="dna"
+            )
+        self.assertEqual(got.names, expect.names)
+        self.assertEqual(got.to_dict(), expect.to_dict())
+
+    def test_load_aligned_seqs_case_and_errors(self):
+        """fast path upper cases and raises KeyError as for sequence objects"""
+        data = ">a\nacgt\n>b\nACnT\n"
+        with TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, "lower.fasta")
+            with open(path, "w") as outfile:
+                outfile.write(data)
+            for moltype in ("dna", "bytes", "text"):
+                got = load_aligned_seqs(path, moltype=moltype)
+                self.assertEqual(got.to_dict(), {"a": "ACGT", "b": "ACNT"})
+
+            with open(path, "w") as outfile:
+                outfile.write(">a\nAC!T\n>b\nACGT\n")
+            with self.assertRaises(KeyError):
+                load_aligned_seqs(path, moltype="dna")
+            got = load_aligned_seqs(path, moltype="bytes")
+            self.assertEqual(got.to_dict(), {"a": "AC!T", "b": "ACGT"})
+
+
 class FastaParserTests(GenericFastaTest):
     """Tests of FastaParser: returns sequence objects."""
 
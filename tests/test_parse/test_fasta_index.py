@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Unit tests for faidx style indexed FASTA access.
+"""
+import os
+import pickle
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from cogent3 import load_unaligned_seqs
+from cogent3.core.alignment import IndexedSequenceCollection, SequenceCollection
+from cogent3.parse.fasta_index import (
+    IndexedFasta,
+    read_fasta_index,
+    write_fasta_index,
+)
+from cogent3.util.deserialise import deserialise_object
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+base_path = os.path.dirname(os.path.dirname(__file__))
+data_path = os.path.join(base_path, "data")
+
+_fasta = ">s1\nACGTA\nCG-TA\nAC\n>s2\nTTTT\n>s3\r\nG-G\r\n"
+
+
+class IndexedFastaTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "seqs.fasta")
+        with open(self.path, "w", newline="") as outfile:
+            outfile.write(_fasta)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_write_read_index(self):
+        """index records match the samtools faidx layout"""
+        records = write_fasta_index(self.path)
+        self.assertEqual(records, read_fasta_index(self.path + ".fai"))
+        self.assertEqual(
+            [tuple(r) for r in records],
+            [("s1", 12, 4, 5, 6), ("s2", 4, 23, 4, 5), ("s3", 3, 33, 3, 5)],
+        )
+
+    def test_get_seq(self):
+        """reads whole sequences and slices"""
+        index = IndexedFasta(self.path)
+        self.assertEqual(index.names, ["s1", "s2", "s3"])
+        self.assertEqual(index["s1"], "ACGTACG-TAAC")
+        self.assertEqual(index["s3"], "G-G")
+        expect = "ACGTACG-TAAC"
+        for start in range(len(expect)):
+            for end in range(start, len(expect) + 2):
+                self.assertEqual(index.get_seq("s1", start, end), expect[start:end])
+        self.assertEqual(index.get_seq("s1", -3), expect[-3:])
+        # pickling drops the open file
+        index = pickle.loads(pickle.dumps(index))
+        self.assertEqual(index["s2"], "TTTT")
+        index.close()
+
+    def test_invalid(self):
+        """raises ValueError for files that cannot be indexed"""
+        for data in (">a\nACG\nA\nACG\n", ">a\nAC\n\nAC\n", ">a\nA\n>a\nC\n"):
+            with open(self.path, "w") as outfile:
+                outfile.write(data)
+            with self.assertRaises(ValueError):
+                write_fasta_index(self.path)
+        with self.assertRaises(ValueError):
+            IndexedFasta(os.path.join(data_path, "formattest.fasta.gz"))
+
+    def test_no_build(self):
+        """raises ValueError if index absent and build is False"""
+        with self.assertRaises(ValueError):
+            IndexedFasta(self.path, build=False)
+
+    def test_index_file_opt_in(self):
+        """an index file is only written if requested, and is reused"""
+        index = IndexedFasta(self.path)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["seqs.fasta"])
+        index_path = os.path.join(self.tmpdir.name, "cache.fai")
+        IndexedFasta(self.path, index_path=index_path, write_index=True)
+        self.assertTrue(os.path.exists(index_path))
+        got = IndexedFasta(self.path, index_path=index_path, build=False)
+        self.assertEqual(got._records, index._records)
+        IndexedFasta(self.path, write_index=True)
+        self.assertTrue(os.path.exists(self.path + ".fai"))
+
+    def test_full_labels(self):
+        """names are whole labels, as for the FASTA parser"""
+        with open(self.path, "w") as outfile:
+            outfile.write(">s1 first seq\nACGT\n> s2\tsecond \nTT\n")
+        index = IndexedFasta(self.path)
+        self.assertEqual(index.names, ["s1 first seq", "s2\tsecond"])
+        expect = load_unaligned_seqs(self.path, moltype="dna")
+        self.assertEqual(index.names, expect.names)
+        self.assertEqual(index["s2\tsecond"], "TT")
+
+    def test_close(self):
+        """the file is closed on exiting a context, and reopened on reading"""
+        with IndexedFasta(self.path) as index:
+            self.assertEqual(index["s2"], "TTTT")
+            opened = index._file
+        self.assertTrue(opened.closed)
+        self.assertIsNone(index._file)
+        self.assertEqual(index["s3"], "G-G")
+        opened = index._file
+        del index
+        self.assertTrue(opened.closed)
+
+
+class IndexedSequenceCollectionTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "seqs.fasta")
+        with open(self.path, "w") as outfile:
+            outfile.write(_fasta)
+        self.expect = load_unaligned_seqs(self.path, moltype="dna")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lazy_load(self):
+        """sequences only read when accessed"""
+        seqs = load_unaligned_seqs(self.path, moltype="dna", lazy=True)
+        self.assertIsInstance(seqs, IndexedSequenceCollection)
+        self.assertEqual(seqs.names, self.expect.names)
+        self.assertEqual(len(seqs), len(self.expect))
+        self.assertEqual(seqs.info.source, self.path)
+        self.assertEqual(len(seqs.named_seqs._cache), 0)
+        self.assertEqual(seqs.to_dict(), self.expect.to_dict())
+
+    def test_take_seqs(self):
+        """selected sequences are the only ones read"""
+        seqs = load_unaligned_seqs(self.path, moltype="dna", lazy=True)
+        got = seqs.take_seqs(["s3", "s1"])
+        self.assertIsInstance(got, IndexedSequenceCollection)
+        self.assertEqual(got.names, ["s3", "s1"])
+        self.assertEqual(got.to_dict(), self.expect.take_seqs(["s3", "s1"]).to_dict())
+        self.assertEqual(set(got.named_seqs._cache), {"s1", "s3"})
+        self.assertEqual(len(seqs.named_seqs._cache), 0)
+        self.assertEqual(seqs.take_seqs("s1", negate=True).names, ["s2", "s3"])
+        with self.assertRaises(KeyError):
+            seqs.take_seqs(["s4"])
+
+    def test_degap(self):
+        """degap is applied on reading"""
+        seqs = load_unaligned_seqs(self.path, moltype="dna", lazy=True)
+        got = seqs.degap()
+        self.assertEqual(got.to_dict(), self.expect.degap().to_dict())
+        self.assertEqual(len(got), 11)
+
+    def test_label_to_name(self):
+        """label_to_name applied to names in the index"""
+        seqs = load_unaligned_seqs(
+            self.path, moltype="dna", lazy=True, label_to_name=str.upper
+        )
+        self.assertEqual(seqs.names, ["S1", "S2", "S3"])
+        self.assertEqual(str(seqs.get_seq("S2")), "TTTT")
+
+    def test_close(self):
+        """closing the collection closes the indexed file"""
+        seqs = load_unaligned_seqs(self.path, moltype="dna", lazy=True)
+        subset = seqs.take_seqs(["s1"])
+        self.assertEqual(str(subset.get_seq("s1")), "ACGTACG-TAAC")
+        index = seqs.named_seqs._index
+        self.assertIsNotNone(index._file)
+        subset.close()
+        self.assertIsNone(index._file)
+        self.assertEqual(str(seqs.get_seq("s2")), "TTTT")
+        seqs.close()
+        self.assertIsNone(index._file)
+
+    def test_serialisable(self):
+        """round trips as a SequenceCollection"""
+        seqs = load_unaligned_seqs(self.path, moltype="dna", lazy=True)
+        got = deserialise_object(seqs.to_json())
+        self.assertIsInstance(got, SequenceCollection)
+        self.assertEqual(got.to_dict(), self.expect.to_dict())
+
+    def test_lazy_requires_fasta(self):
+        """raises ValueError for non-FASTA files"""
+        with self.assertRaises(ValueError):
+            load_unaligned_seqs(
+                os.path.join(data_path, "primates_brca1.fasta.gz"), lazy=True
+            )
+        with self.assertRaises(ValueError):
+            load_unaligned_seqs(
+                os.path.join(data_path, "interleaved.phylip"), lazy=True
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
 from unittest import TestCase, main
 
-from cogent3.recalculation.definition import CalcDefn, ParamDefn
+import numpy
+
+from cogent3 import make_aligned_seqs, make_tree
+from cogent3.evolve.models import get_model
+from cogent3.maths.optimisers import ParameterOutOfBoundsError
+from cogent3.recalculation.calculation import _nbytes
+from cogent3.recalculation.definition import (
+    CalcDefn,
+    CalculationDefn,
+    ParamDefn,
+)
 from cogent3.recalculation.scope import (
     InvalidDimensionError,
     InvalidScopeError,
@@ -161,6 +171,174 @@ class RecalculationTest(TestCase):
         # so don't use 'xtol=0.0', that's just to make the doctest work.
         gz = pc.graphviz()
 
+    def test_batch_calc(self):
+        """cells of a Defn with batch_calc are updated in one call"""
+        calls = []
+
+        class DoubleDefn(CalculationDefn):
+            name = "double"
+
+            def calc(self, x):
+                return 2 * x
+
+            def batch_calc(self, args_list):
+                calls.append(len(args_list))
+                return [2 * x for (x,) in args_list]
+
+        a = ParamDefn("A", dimensions=["category"])
+        double = DoubleDefn(a)
+        top = CalcDefn(sum_args, name="top")(
+            *double.across_dimension("category", ["x", "y", "z"])
+        )
+        pc = top.make_likelihood_function()
+        pc.assign_all("A", value=2.0, independent=True)
+        f = pc.make_calculator()
+        self.assertEqual(f.get_value_array(), [2.0, 2.0, 2.0])
+        calls.clear()
+        self.assertEqual(f([1.0, 3.0, 5.0]), 18.0)
+        self.assertEqual(calls, [3])
+        calls.clear()
+        self.assertEqual(f.change([(1, 4.0)]), 20.0)
+        self.assertEqual(calls, [])
+
+    def _cached_calculator(self, calls, **kw):
+        class SquareDefn(CalculationDefn):
+            name = "square"
+            cached = True
+
+            def calc(self, x):
+                calls.append(x)
+                return numpy.array([x * x])
+
+        a = ParamDefn("A", dimensions=["category"])
+        square = SquareDefn(a)
+        top = CalcDefn(lambda *args: float(sum(args)), name="top")(
+            *square.across_dimension("category", ["x", "y"])
+        )
+        pc = top.make_likelihood_function()
+        pc.assign_all("A", value=1.0, independent=True)
+        return pc.make_calculator(**kw)
+
+    def test_cached(self):
+        """values of cached cells are reused when their inputs recur"""
+        calls = []
+        f = self._cached_calculator(calls)
+        self.assertEqual(f([2.0, 3.0]), 13.0)
+        self.assertEqual(f([4.0, 3.0]), 25.0)
+        self.assertEqual(f([6.0, 3.0]), 45.0)
+        calls.clear()
+        # too far back to undo, but x=2.0 is in the cache and y didn't change
+        self.assertEqual(f([2.0, 3.0]), 13.0)
+        self.assertEqual(calls, [])
+        self.assertEqual(f.cache_hits, 1)
+        self.assertEqual(f([5.0, 3.0]), 34.0)
+        self.assertEqual(calls, [5.0])
+
+    def test_cache_limit(self):
+        """the cache holds no more than cache_bytes, dropping the oldest"""
+        calls = []
+        f = self._cached_calculator(calls, cache_bytes=0)
+        for x in (2.0, 4.0, 6.0):
+            f([x, 3.0])
+        calls.clear()
+        f([2.0, 3.0])
+        self.assertEqual(calls, [2.0])
+        self.assertEqual(f.cache_hits, 0)
+
+        nbytes = numpy.array([1.0]).nbytes
+        f = self._cached_calculator(calls, cache_bytes=3 * nbytes)
+        for x in (2.0, 4.0, 6.0, 8.0):
+            f([x, 3.0])
+        calls.clear()
+        # only the three most recently used values are held
+        f([4.0, 3.0])
+        f([2.0, 3.0])
+        self.assertEqual(calls, [2.0])
+
+    def test_cache_limit_codon(self):
+        """the cache counts all the arrays of a codon exponentiator"""
+        aln = make_aligned_seqs(
+            data={"a": "ATGAAACCC", "b": "ATGAAGCCC", "c": "ATGAAACCT"}, moltype="dna"
+        )
+        lf = get_model("CNFGTR").make_likelihood_function(make_tree(tip_names="abc"))
+        lf.set_alignment(aln)
+        Qd = lf.get_param_value("Qd")
+        arrays = [Qd.Q, Qd.roots, Qd.ev, Qd.evI]
+        self.assertGreaterEqual(_nbytes(Qd), sum(a.nbytes for a in arrays))
+
+        f = lf.make_calculator(cache_bytes=3 * _nbytes(Qd))
+        omega = [p.name for p in f.opt_pars].index("omega")
+        x = f.get_value_array()
+        for value in (0.5, 1.5, 2.0, 2.5, 3.0):
+            x[omega] = value
+            f(x)
+        # only three exponentiators fit
+        self.assertEqual(len(f._cache), 3)
+        self.assertLessEqual(f._cache_size, f.cache_bytes)
+
+    def test_compiled(self):
+        """compiled evaluation plans give the same results"""
+
+        class DoubleDefn(CalculationDefn):
+            name = "double"
+
+            def calc(self, x):
+                return 2 * x
+
+            def batch_calc(self, args_list):
+                return [2 * x for (x,) in args_list]
+
+        def curve(x, y, *args):
+            if x > 10:
+                raise ParameterOutOfBoundsError
+            return 0 - (x ** 2 + y ** 2) + sum(args)
+
+        a = ParamDefn("A", dimensions=["category"])
+        double = DoubleDefn(a)
+        mid = CalcDefn(sum_args, name="mid")(
+            *double.across_dimension("category", ["x", "y", "z"])
+        )
+        top = CalcDefn(curve)(
+            ParamDefn("X"),
+            ParamDefn("Y"),
+            mid,
+            a.select_from_dimension("category", "x"),
+        )
+        pc = top.make_likelihood_function()
+        pc.assign_all("A", value=2.0, independent=True)
+        plain = pc.make_calculator()
+        compiled = pc.make_calculator(compiled=True)
+        self.assertTrue(compiled.compiled)
+        for values in ([1.0, 2.0, 1.0, 3.0, 5.0], [3.0, 2.0, 1.0, 3.0, 5.0]):
+            self.assertEqual(compiled(values), plain(values))
+        self.assertEqual(compiled.change([(2, 4.0)]), plain.change([(2, 4.0)]))
+        self.assertEqual(compiled.change([(3, 4.0)]), plain.change([(3, 4.0)]))
+        # an out of bounds step is cancelled
+        before = compiled.testfunction()
+        with self.assertRaises(ParameterOutOfBoundsError):
+            compiled.change([(4, 11.0)])
+        self.assertEqual(compiled.testfunction(), before)
+
+        calls = []
+        f = self._cached_calculator(calls)
+        f.compile()
+        for x in (2.0, 4.0, 6.0):
+            f([x, 3.0])
+        calls.clear()
+        self.assertEqual(f([2.0, 3.0]), 13.0)
+        self.assertEqual(calls, [])
+
+        # optimisation by a parameter controller uses a compiled calculator
+        top = CalcDefn(curve)(ParamDefn("X"), ParamDefn("Y"))
+        pc = top.make_likelihood_function()
+        f = pc.optimise(local=True, show_progress=False, return_calculator=True)
+        self.assertTrue(f.compiled)
+        self.assertAlmostEqual(pc.get_param_value("X"), 0.0)
+
+
+def sum_args(*args):
+    return sum(args)
+
 
 if __name__ == "__main__":
     main()
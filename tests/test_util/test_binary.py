@@ -0,0 +1,88 @@
+import json
+
+from unittest import TestCase, main
+
+import numpy
+
+from numpy.testing import assert_allclose
+
+from cogent3 import make_aligned_seqs, make_table
+from cogent3.util.binary import MAGIC, from_binary, is_binary, to_binary
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+
+class TestBinary(TestCase):
+    def test_roundtrip_builtins(self):
+        """decoding matches json roundtrip"""
+        data = {
+            "floats": [0.1 * i for i in range(20)],
+            "ints": list(range(-10, 10)),
+            "matrix": [[0.5, 1.5, 2.5]] * 10,
+            "ragged": [[0.5], [1.5, 2.5]],
+            "mixed": [1, 2.0, "a", None, True, False] * 3,
+            "short": [1.0, 2.0],
+            "nested": {"a": {"b": [{"c": 2 ** 70}]}},
+            1: "int key",
+            "tuple": (1, 2),
+            "empty": [[]],
+            "text": "é" * 300,
+        }
+        got = from_binary(to_binary(data))
+        expect = json.loads(json.dumps(data))
+        self.assertEqual(got, expect)
+        for key in ("floats", "ints", "matrix"):
+            self.assertEqual(
+                [type(v) for v in numpy.array(got[key]).flatten().tolist()],
+                [type(v) for v in numpy.array(expect[key]).flatten().tolist()],
+            )
+
+    def test_numpy(self):
+        """arrays roundtrip with dtype and shape, scalars become builtins"""
+        data = {
+            "f": numpy.arange(12.0).reshape(3, 4),
+            "i": numpy.arange(5, dtype=numpy.int32),
+            "b": numpy.array([True, False]),
+            "s": numpy.float64(2.5),
+            "n": numpy.int64(3),
+        }
+        got = from_binary(to_binary(data))
+        for key in "fib":
+            self.assertEqual(got[key].dtype, data[key].dtype)
+            assert_allclose(got[key], data[key])
+        self.assertEqual(got["s"], 2.5)
+        self.assertIsInstance(got["n"], int)
+        # top level array
+        got = from_binary(to_binary(numpy.arange(4)))
+        assert_allclose(got, numpy.arange(4))
+
+    def test_rich_dict(self):
+        """objects with to_rich_dict are encoded"""
+        aln = make_aligned_seqs(data={"a": "ACGT", "b": "AC-T"}, array_align=True)
+        table = make_table(header=["a", "b"], rows=[[0.1 * i, i] for i in range(20)])
+        for obj in (aln, table):
+            data = to_binary(obj)
+            self.assertTrue(is_binary(data))
+            self.assertEqual(from_binary(data), json.loads(obj.to_json()))
+
+    def test_is_binary(self):
+        """correctly identifies encoded data"""
+        self.assertTrue(is_binary(to_binary("abc")))
+        self.assertFalse(is_binary(b'{"a": 1}'))
+        self.assertFalse(is_binary(MAGIC.decode("latin-1")))
+        with self.assertRaises(ValueError):
+            from_binary(b'{"a": 1}')
+        with self.assertRaises(ValueError):
+            from_binary(to_binary([0.5] * 20)[:-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ from cogent3 import (
 from cogent3.app.result import model_result
 from cogent3.core import alignment, moltype
 from cogent3.evolve.models import get_model
+from cogent3.util.binary import to_binary
 from cogent3.util.deserialise import deserialise_object
 from cogent3.util.unit_test import TestCase, main
 
@@ -331,6 +332,31 @@ class TestDeserialising(TestCase):
             else:
                 assert_allclose(dist, got_dict[a, b])
 
+    def test_roundtrip_binary(self):
+        """deserialise_object handles bytes and files from to_binary"""
+        _data = {
+            "Human": "ATGCGGCTCGCGGAGGCCGCGCTCGCGGAG",
+            "Mouse": "ATGCCCGGCGCCAAGGCAGCGCTGGCGGAG",
+            "Opossum": "ATGCCAGTGAAAGTGGCGGCGGTGGCTGAG",
+        }
+        aln = make_aligned_seqs(data=_data, moltype="dna", array_align=True)
+        tree = make_tree(tip_names=aln.names)
+        lf = get_model("HKY85").make_likelihood_function(tree)
+        lf.set_alignment(aln)
+        result = model_result(name="test")
+        result[1] = lf
+        got = deserialise_object(to_binary(result))
+        self.assertEqual(got.lnL, result.lnL)
+        assert_allclose(got.lf.lnL, lf.lnL)
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = f"{dirname}/aln.c3b"
+            with open(path, "wb") as outfile:
+                outfile.write(to_binary(aln))
+            got = deserialise_object(path)
+            self.assertIsInstance(got, alignment.ArrayAlignment)
+            self.assertEqual(got.to_dict(), aln.to_dict())
+
     def test_deserialise_python_builtins(self):
         """any object that does not contain a type key is returned as is"""
         data = dict(a=123, b="text")
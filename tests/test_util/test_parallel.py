@@ -56,6 +56,18 @@ class ParallelTests(TestCase):
         self.assertEqual(result1[0], result2[0])
         self.assertNotEqual(result1, result2)
 
+    def test_as_completed(self):
+        """yields every (index, result) with bounded submission"""
+        index = [2, 3, 4, 5, 6, 7, 8, 9, 10]
+        expect = [get_ranint(i) for i in index]
+        got = list(
+            parallel.as_completed(
+                get_ranint, iter(index), max_workers=1, max_in_flight=2
+            )
+        )
+        self.assertEqual(sorted(i for i, _ in got), list(range(len(index))))
+        self.assertEqual([r for _, r in sorted(got)], expect)
+
     @skipIf(sys.version_info[1] < 7, "method exclusive to Python 3.7 and above")
     def test_is_master_process(self):
         """